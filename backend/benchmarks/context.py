@@ -0,0 +1,64 @@
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Per-section input tokens for content generation with project context, inline
+# (PROJECT_CONTEXT_CACHE=off) vs through the context cache (the fake model's
+# local stand-in for Gemini cached content). For each project size every section
+# is generated once against one shared context snapshot; "uncached" is what
+# each call sends beyond the cached part and stays flat when caching works.
+#
+#   python benchmarks/context.py --sections 5,20,50 --words 200
+
+def _project(sections: int, words: int) -> dict:
+    body = " ".join(f"word{i}" for i in range(words))
+    return {
+        "id": "bench",
+        "title": "Context benchmark",
+        "topic": "Context caching",
+        "type": "word",
+        "style_guide": "Formal, third person, short paragraphs.",
+        "items": [
+            {"id": str(i), "title": f"Section {i}", "type": "section", "order": i, "content": body if i % 2 else ""}
+            for i in range(sections)
+        ],
+    }
+
+def _tokens(metrics, kind: str) -> float:
+    return sum(v for (name, labels), v in metrics._counters.items() if name == "ai_tokens_total" and dict(labels).get("kind") == kind)
+
+async def _run(project: dict, mode: str) -> dict:
+    from config import settings
+    from services import ai, metrics, project_context
+    settings.PROJECT_CONTEXT_CACHE = mode
+    project_context._handles.clear()
+    metrics.reset()
+    context = project_context.build(project)
+    started = time.perf_counter()
+    await asyncio.gather(*(ai.generate_content(project['topic'], item['title'], project['type'], True, context) for item in project['items']))
+    elapsed = time.perf_counter() - started
+    calls = len(project['items'])
+    prompt, cached = _tokens(metrics, "prompt"), _tokens(metrics, "cached")
+    return {"prompt": prompt / calls, "uncached": (prompt - cached) / calls, "seconds": elapsed}
+
+def main():
+    parser = argparse.ArgumentParser(description="Project context caching benchmark")
+    parser.add_argument("--sections", default="5,20,50", help="comma-separated section counts")
+    parser.add_argument("--words", type=int, default=200, help="words per written section (every other section is written)")
+    parser.add_argument("--ai-latency", type=float, default=0.05)
+    args = parser.parse_args()
+
+    os.environ.update({"AI_BACKEND": "fake", "AI_FAKE_LATENCY": str(args.ai_latency), "AI_CACHE_ENABLED": "false", "PROJECT_CONTEXT_MAX_CHARS": "1000000"})
+    print(f"{'sections':>8} {'mode':<7} {'prompt/section':>15} {'uncached/section':>17} {'seconds':>8}")
+    for sections in [int(s) for s in args.sections.split(",")]:
+        project = _project(sections, args.words)
+        for mode in ("off", "auto"):
+            r = asyncio.run(_run(project, mode))
+            print(f"{sections:>8} {'inline' if mode == 'off' else 'cached':<7} {r['prompt']:>15.0f} {r['uncached']:>17.0f} {r['seconds']:>8.2f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+import argparse
+import multiprocessing
+import os
+import resource
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Peak RSS of a single export per deck size, comparing the old in-memory path
+# (BytesIO + getvalue, as the worker used to return bytes) against writing the
+# package straight to a file. Each run happens in a fresh process so peaks don't
+# carry over. Images are generated locally, no network or API keys needed.
+#
+#   python benchmarks/export_memory.py --sizes 10,50,200 --image-every 2
+
+def _rss_mb() -> float:
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+def _make_images(count: int, size: int) -> dict:
+    from io import BytesIO
+    from PIL import Image
+    images = {}
+    for i in range(count):
+        # Noise compresses badly, so this approximates photo-sized JPEGs
+        image = Image.frombytes("RGB", (size, size * 3 // 4), os.urandom(size * size * 3 // 4 * 3))
+        out = BytesIO()
+        image.save(out, format="JPEG", quality=85)
+        images[f"bench://image/{i}"] = out.getvalue()
+    return images
+
+def _project(slides: int, image_every: int, images: dict) -> dict:
+    urls = list(images)
+    content = "\n".join(f"- Point {n} with **bold** detail" for n in range(6))
+    items = []
+    for i in range(slides):
+        item = {"id": str(i), "title": f"Slide {i}", "content": content, "type": "slide", "order": i}
+        if image_every and i % image_every == 0 and urls:
+            item["image_url"] = urls[(i // image_every) % len(urls)]
+        items.append(item)
+    return {"title": "Benchmark", "topic": "Memory", "type": "powerpoint", "items": items}
+
+def _run(mode: str, slides: int, image_every: int, distinct_images: int, image_size: int, result):
+    from services.export import export_to_pptx
+    images = _make_images(min(distinct_images, slides), image_size)
+    project = _project(slides, image_every, images)
+    baseline = _rss_mb()
+    started = time.perf_counter()
+    if mode == "memory":
+        data = export_to_pptx(project, images).getvalue()
+        size = len(data)
+    else:
+        with tempfile.TemporaryFile() as f:
+            export_to_pptx(project, images, out=f)
+            size = f.tell()
+    result.put({
+        "seconds": time.perf_counter() - started,
+        "file_mb": size / (1024 * 1024),
+        "baseline_mb": baseline,
+        "peak_mb": _rss_mb(),
+    })
+
+def main():
+    parser = argparse.ArgumentParser(description="Peak RSS per PPTX export size")
+    parser.add_argument("--sizes", default="10,50,200", help="comma-separated slide counts")
+    parser.add_argument("--image-every", type=int, default=2, help="put an image on every Nth slide (0 = none)")
+    parser.add_argument("--distinct-images", type=int, default=50, help="number of different images to cycle through")
+    parser.add_argument("--image-size", type=int, default=1600, help="image width in pixels")
+    args = parser.parse_args()
+
+    ctx = multiprocessing.get_context("spawn")
+    print(f"{'slides':>6} {'mode':>7} {'file MB':>8} {'base MB':>8} {'peak MB':>8} {'delta MB':>9} {'secs':>6}")
+    for slides in (int(s) for s in args.sizes.split(",")):
+        for mode in ("memory", "file"):
+            result = ctx.Queue()
+            proc = ctx.Process(target=_run, args=(mode, slides, args.image_every, args.distinct_images, args.image_size, result))
+            proc.start()
+            r = result.get()
+            proc.join()
+            print(f"{slides:>6} {mode:>7} {r['file_mb']:>8.1f} {r['baseline_mb']:>8.1f} {r['peak_mb']:>8.1f} "
+                  f"{r['peak_mb'] - r['baseline_mb']:>9.1f} {r['seconds']:>6.2f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+import argparse
+import json
+import random
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import BytesIO
+from urllib.parse import urlparse, parse_qs
+
+# Local stand-in for the Freepik resources API, for exercising the real HTTP
+# client (services/freepik.py) without an API key or network:
+#
+#   python benchmarks/freepik_stub.py --port 8900 --latency 0.2 --failure-rate 0.05
+#   FREEPIK_API_URL=http://127.0.0.1:8900/v1/resources FREEPIK_API_KEY=stub uvicorn main:app
+#
+# GET /v1/resources answers in Freepik's response shape with `limit` results whose
+# URLs point back at this server (/images/<n>.png); GET /stats returns request counts.
+
+class StubState:
+    def __init__(self, latency: float, failure_rate: float, results: int):
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.results = results
+        self.lock = threading.Lock()
+        self.searches = 0
+        self.image_requests = 0
+        self.failures = 0
+        self._image = None
+
+    def image(self) -> bytes:
+        if self._image is None:
+            from PIL import Image
+            out = BytesIO()
+            Image.new("RGB", (800, 600), (30, 120, 90)).save(out, format="PNG")
+            self._image = out.getvalue()
+        return self._image
+
+def make_handler(state: StubState):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1" # keep-alive, like the real API
+
+        def _send(self, status: int, body: bytes, content_type: str):
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _json(self, status: int, data):
+            self._send(status, json.dumps(data).encode("utf-8"), "application/json")
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            if url.path == "/stats":
+                with state.lock:
+                    return self._json(200, {"searches": state.searches, "image_requests": state.image_requests, "failures": state.failures})
+            if url.path.startswith("/images/"):
+                with state.lock:
+                    state.image_requests += 1
+                return self._send(200, state.image(), "image/png")
+            if url.path != "/v1/resources":
+                return self._json(404, {"message": "Not found"})
+
+            with state.lock:
+                state.searches += 1
+            if not self.headers.get("x-freepik-api-key"):
+                return self._json(401, {"message": "Missing x-freepik-api-key"})
+            if state.latency:
+                time.sleep(state.latency)
+            if state.failure_rate and random.random() < state.failure_rate:
+                with state.lock:
+                    state.failures += 1
+                return self._json(503, {"message": "Injected stub failure"})
+
+            params = parse_qs(url.query)
+            term = params.get("term", [""])[0]
+            limit = min(int(params.get("limit", ["1"])[0]), state.results)
+            host = f"http://{self.headers.get('Host') or '127.0.0.1'}"
+            data = [{
+                "id": i,
+                "title": f"{term} {i}",
+                "image": {"source": {"url": f"{host}/images/{zlib.crc32(term.encode()) % 10000}-{i}.png"}},
+            } for i in range(limit)]
+            self._json(200, {"data": data, "meta": {"current_page": 1, "per_page": limit}})
+
+        def log_message(self, *args):
+            pass
+
+    return Handler
+
+def start(port: int = 0, latency: float = 0.0, failure_rate: float = 0.0, results: int = 10):
+    # Starts the stub on a daemon thread; returns (server, state). port=0 picks a free port.
+    state = StubState(latency, failure_rate, results)
+    server = ThreadingHTTPServer(("127.0.0.1", port), make_handler(state))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, state
+
+def main():
+    parser = argparse.ArgumentParser(description="Local Freepik API stub")
+    parser.add_argument("--port", type=int, default=8900)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds added to every search")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="fraction of searches answered with 503")
+    parser.add_argument("--results", type=int, default=10, help="maximum results per search")
+    args = parser.parse_args()
+    server, _ = start(args.port, args.latency, args.failure_rate, args.results)
+    print(f"Freepik stub listening on http://127.0.0.1:{server.server_port}/v1/resources")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+if __name__ == "__main__":
+    main()
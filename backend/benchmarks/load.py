@@ -0,0 +1,240 @@
+import argparse
+import asyncio
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Load test for the API with Gemini, Freepik and Firestore replaced by local fakes
+# (AI_BACKEND=fake, FREEPIK_BACKEND=fake, STORAGE_BACKEND=sqlite in a temp dir).
+# Each scenario is driven by --concurrency clients for --requests requests and
+# reports RPS, p50/p95/p99 latency and errors. The app runs in-process, so the
+# event-loop lag (how late a 10 ms ticker wakes up) shows when a handler blocks.
+#
+#   python benchmarks/load.py --concurrency 50 --requests 500 --ai-latency 0.5
+#   python benchmarks/load.py --scenarios list_projects,export --projects 200
+#   python benchmarks/load.py --scenarios generate_content --ai-quota 600 --rpm-limit 550
+#
+# --freepik stub swaps the in-process Freepik fake for benchmarks/freepik_stub.py,
+# so the real HTTP client (pooling, timeouts, result cache) is measured too.
+# Pass --url to hit an already running server instead (configure its fakes via
+# env vars; event-loop lag is only measured in-process).
+
+SCENARIOS = ["create_project", "generate_content", "generate_chart", "generate_image", "refine", "list_projects", "get_project", "export"]
+
+def _configure(args, workdir: str):
+    # Must run before the app (and config) is imported
+    os.environ.update({
+        "AI_BACKEND": "fake",
+        "AI_FAKE_LATENCY": str(args.ai_latency),
+        "AI_FAKE_FAILURE_RATE": str(args.failure_rate),
+        "AI_FAKE_RPM": str(args.ai_quota),
+        "AI_RPM_LIMIT": str(args.rpm_limit),
+        "AI_CACHE_ENABLED": "true" if args.ai_cache else "false",
+        "FREEPIK_BACKEND": "fake",
+        "FREEPIK_FAKE_LATENCY": str(args.freepik_latency),
+        "FREEPIK_FAKE_FAILURE_RATE": str(args.failure_rate),
+        "FIREBASE_CREDENTIALS_PATH": os.path.join(workdir, "missing.json"),
+        "STORAGE_BACKEND": "sqlite",
+        "LOCAL_DB_PATH": os.path.join(workdir, "bench.db"),
+        "ASSET_DIR": os.path.join(workdir, "assets"),
+        "EXPORT_CACHE_DIR": os.path.join(workdir, "exports"),
+    })
+
+def _serve_image(workdir: str) -> str:
+    # Local image host for the fake Freepik results, so exports never touch the network
+    from PIL import Image
+    image_dir = os.path.join(workdir, "images")
+    os.makedirs(image_dir)
+    Image.new("RGB", (1200, 900), (40, 90, 160)).save(os.path.join(image_dir, "image.png"))
+
+    class Handler(SimpleHTTPRequestHandler):
+        def __init__(self, *a, **kw):
+            super().__init__(*a, directory=image_dir, **kw)
+
+        def log_message(self, *a):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f"http://127.0.0.1:{server.server_port}/image.png"
+
+class LagMonitor:
+    # Measures how late the event loop runs a task scheduled every `interval` seconds
+    def __init__(self, interval: float = 0.01):
+        self.interval = interval
+        self.samples = []
+        self._task = None
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            expected = loop.time() + self.interval
+            await asyncio.sleep(self.interval)
+            self.samples.append(max(0.0, loop.time() - expected))
+
+    def start(self):
+        self.samples = []
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> list:
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        return self.samples
+
+def _percentile(values, pct: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(pct / 100 * (len(values) - 1))))]
+
+async def _seed(client, count: int) -> list:
+    projects = []
+    for i in range(count):
+        kind = "powerpoint" if i % 2 else "word"
+        r = await client.post("/projects/", json={"title": f"Bench {i}", "type": kind, "topic": f"Topic {i}"})
+        r.raise_for_status()
+        projects.append(r.json())
+    return projects
+
+def _request(name: str, client, projects: list, n: int):
+    project = projects[n % len(projects)]
+    item = random.choice(project['items'])
+    body = {"project_id": project['id'], "item_id": item['id'], "prompt": f"Expand point {n}"}
+    if name == "create_project":
+        return client.post("/projects/", json={"title": f"Load {n}", "type": "powerpoint", "topic": f"Topic {n}"})
+    if name == "generate_content":
+        return client.post("/generate/content", json=body)
+    if name == "generate_chart":
+        return client.post("/generate/chart", json=body)
+    if name == "generate_image":
+        return client.post("/generate/image-prompt", json=body)
+    if name == "refine":
+        return client.post("/generate/refine", json={"text": f"Draft paragraph {n}", "instruction": "Make it concise"})
+    if name == "list_projects":
+        return client.get("/projects/")
+    if name == "get_project":
+        return client.get(f"/projects/{project['id']}")
+    if name == "export":
+        return client.get(f"/projects/{project['id']}/export")
+    raise ValueError(f"Unknown scenario {name}")
+
+async def _run_scenario(name: str, client, projects: list, total: int, concurrency: int, lag: LagMonitor) -> dict:
+    latencies = []
+    errors = 0
+    counter = iter(range(total))
+
+    async def worker():
+        nonlocal errors
+        for n in counter:
+            started = time.perf_counter()
+            try:
+                r = await _request(name, client, projects, n)
+                if r.status_code >= 400:
+                    errors += 1
+            except Exception:
+                errors += 1
+            latencies.append(time.perf_counter() - started)
+
+    if lag:
+        lag.start()
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    lag_samples = await lag.stop() if lag else []
+    return {
+        "scenario": name,
+        "requests": total,
+        "errors": errors,
+        "rps": total / elapsed if elapsed else 0.0,
+        "p50": _percentile(latencies, 50),
+        "p95": _percentile(latencies, 95),
+        "p99": _percentile(latencies, 99),
+        "lag_p99": _percentile(lag_samples, 99) if lag else None,
+        "lag_max": max(lag_samples, default=0.0) if lag else None,
+    }
+
+def _print(results: list):
+    print(f"{'scenario':<17} {'reqs':>6} {'errs':>5} {'rps':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'lag p99':>8} {'lag max':>8}")
+    for r in results:
+        lag = (f"{r['lag_p99'] * 1000:>8.1f} {r['lag_max'] * 1000:>8.1f}" if r['lag_p99'] is not None else f"{'-':>8} {'-':>8}")
+        print(f"{r['scenario']:<17} {r['requests']:>6} {r['errors']:>5} {r['rps']:>8.1f} "
+              f"{r['p50'] * 1000:>8.1f} {r['p95'] * 1000:>8.1f} {r['p99'] * 1000:>8.1f} {lag}")
+
+async def main(args):
+    import httpx
+    if args.url:
+        client = httpx.AsyncClient(base_url=args.url, timeout=120, headers={"Authorization": f"Bearer {args.token}"} if args.token else {})
+        lag = None
+        shutdown = None
+    else:
+        from main import app
+        from services import export_worker
+        client = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench", timeout=120)
+        lag = LagMonitor()
+        shutdown = export_worker.shutdown
+
+    try:
+        projects = await _seed(client, args.projects)
+        # Give every project some content so exports and listings carry realistic payloads
+        for project in projects:
+            for item in project['items']:
+                await client.post("/generate/content", json={"project_id": project['id'], "item_id": item['id']})
+        if args.warmup:
+            await _run_scenario(args.scenarios[0], client, projects, args.warmup, args.concurrency, None)
+        results = []
+        for name in args.scenarios:
+            results.append(await _run_scenario(name, client, projects, args.requests, args.concurrency, lag))
+        _print(results)
+    finally:
+        await client.aclose()
+        if shutdown:
+            shutdown()
+
+def _parse_args():
+    parser = argparse.ArgumentParser(description="Load test the API against local fakes")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS), help=f"comma-separated, from: {', '.join(SCENARIOS)}")
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--requests", type=int, default=200, help="requests per scenario")
+    parser.add_argument("--warmup", type=int, default=0, help="untimed requests before the first scenario")
+    parser.add_argument("--projects", type=int, default=10, help="projects seeded before the run")
+    parser.add_argument("--ai-latency", type=float, default=0.2, help="fake Gemini latency in seconds")
+    parser.add_argument("--freepik-latency", type=float, default=0.1, help="fake Freepik latency in seconds")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="fraction of fake Gemini/Freepik calls that fail")
+    parser.add_argument("--ai-quota", type=int, default=0, help="fake Gemini requests-per-minute quota (429s above it); 0 = none")
+    parser.add_argument("--rpm-limit", type=float, default=0, help="AI_RPM_LIMIT for the scheduler; 0 = none")
+    parser.add_argument("--freepik", choices=["fake", "stub"], default="fake", help="in-process fake or the local HTTP stub")
+    parser.add_argument("--ai-cache", action="store_true", help="leave the AI response cache on")
+    parser.add_argument("--url", help="benchmark a running server instead of the in-process app")
+    parser.add_argument("--token", help="Firebase ID token for --url runs")
+    args = parser.parse_args()
+    args.scenarios = [s for s in args.scenarios.split(",") if s]
+    unknown = set(args.scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(sorted(unknown))}")
+    return args
+
+if __name__ == "__main__":
+    args = _parse_args()
+    with tempfile.TemporaryDirectory() as workdir:
+        if not args.url:
+            _configure(args, workdir)
+            if args.freepik == "stub":
+                from freepik_stub import start
+                stub, _ = start(latency=args.freepik_latency, failure_rate=args.failure_rate)
+                os.environ.update({
+                    "FREEPIK_BACKEND": "api",
+                    "FREEPIK_API_KEY": "stub",
+                    "FREEPIK_API_URL": f"http://127.0.0.1:{stub.server_port}/v1/resources",
+                })
+            else:
+                os.environ["FREEPIK_FAKE_IMAGE_URL"] = _serve_image(workdir)
+        asyncio.run(main(args))
@@ -0,0 +1,87 @@
+import argparse
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Microbenchmarks for the markdown compiler, the DOCX/PPTX renderers and the
+# exporters across document sizes. compile_markdown is timed cold (IR cache
+# cleared) and cached; the parse_markdown_to_* rows render already compiled
+# blocks, which is what every export after the first pays per item. Exporters
+# are timed cold (fragment and IR caches cleared) and warm (every item already
+# rendered once), without images or network.
+#
+#   python benchmarks/micro.py --sizes 10,50,200 --repeat 5
+
+def _content(paragraphs: int) -> str:
+    lines = []
+    for i in range(paragraphs):
+        lines.append(f"## Heading {i}" if i % 10 == 0 else f"Paragraph {i} with **bold**, *italic* and plain text that runs on for a while.")
+        lines.append(f"- Bullet {i} with **emphasis**")
+        lines.append(f"  - Nested bullet {i}")
+        lines.append(f"{i % 5 + 1}. Numbered step {i}")
+    return "\n".join(lines)
+
+def _project(kind: str, items: int) -> dict:
+    content = _content(5)
+    return {
+        "title": "Benchmark",
+        "topic": "Micro",
+        "type": kind,
+        "items": [{"id": str(i), "title": f"Item {i}", "content": content, "type": "slide", "order": i} for i in range(items)],
+    }
+
+def _time(fn, repeat: int, setup=None) -> dict:
+    # setup() runs untimed before each sample; its return value is passed to fn
+    samples = []
+    for _ in range(repeat):
+        arg = setup() if setup else None
+        started = time.perf_counter()
+        fn(arg)
+        samples.append(time.perf_counter() - started)
+    return {"min": min(samples), "median": statistics.median(samples)}
+
+def _report(name: str, size: int, result: dict):
+    print(f"{name:<24} {size:>6} {result['min'] * 1000:>10.2f} {result['median'] * 1000:>10.2f}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Parser and exporter microbenchmarks")
+    parser.add_argument("--sizes", default="10,50,200", help="comma-separated paragraph / item counts")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+    sizes = [int(s) for s in args.sizes.split(",")]
+
+    from docx import Document
+    from pptx import Presentation
+    from services.export import parse_markdown_to_docx, parse_markdown_to_pptx, export_to_docx, export_to_pptx
+    from services import export_fragments, markdown_ir
+
+    print(f"{'benchmark':<24} {'size':>6} {'min ms':>10} {'median ms':>10}")
+    for size in sizes:
+        text = _content(size)
+        _report("compile_markdown cold", size, _time(lambda _: markdown_ir.compile_markdown(text), args.repeat, markdown_ir._cache.clear))
+        _report("compile_markdown cached", size, _time(lambda _: markdown_ir.compile_markdown(text), args.repeat))
+        _report("parse_markdown_to_docx", size, _time(lambda doc: parse_markdown_to_docx(doc, text), args.repeat, Document))
+
+        def text_frame():
+            prs = Presentation()
+            return prs.slides.add_slide(prs.slide_layouts[1]).placeholders[1].text_frame
+        _report("parse_markdown_to_pptx", size, _time(lambda tf: parse_markdown_to_pptx(tf, text), args.repeat, text_frame))
+
+    def clear():
+        export_fragments.cache._entries.clear()
+        markdown_ir._cache.clear()
+    for size in sizes:
+        docx_project = _project("word", size)
+        pptx_project = _project("powerpoint", size)
+        _report("export_to_docx cold", size, _time(lambda _: export_to_docx(docx_project), args.repeat, clear))
+        export_to_docx(docx_project)
+        _report("export_to_docx warm", size, _time(lambda _: export_to_docx(docx_project), args.repeat))
+        _report("export_to_pptx cold", size, _time(lambda _: export_to_pptx(pptx_project, {}), args.repeat, clear))
+        export_to_pptx(pptx_project, {})
+        _report("export_to_pptx warm", size, _time(lambda _: export_to_pptx(pptx_project, {}), args.repeat))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Cold-start report for the API process. Each sample is a fresh interpreter that
+# runs `import main` (what uvicorn does before serving) and optionally preloads
+# warm-up components afterwards (services/warmup.py). One extra run under
+# `python -X importtime` breaks the import down by top-level package (self time
+# summed over the package's modules), so a heavy SDK creeping back into the
+# import path shows up by name.
+#
+#   python benchmarks/startup.py --repeat 5 --top 15
+#   python benchmarks/startup.py --ai-backend gemini --preload ai,export
+
+_SAMPLE = """
+import json, time
+started = time.perf_counter()
+import main
+imported = time.perf_counter() - started
+from services import warmup
+print(json.dumps({"import": imported, "preload": warmup.preload(%r)}))
+"""
+
+def _env(args, tmp: str) -> dict:
+    env = dict(os.environ)
+    env.update({
+        "AI_BACKEND": args.ai_backend,
+        "STORAGE_BACKEND": "sqlite",
+        "LOCAL_DB_PATH": os.path.join(tmp, "startup.db"),
+        "ASSET_DIR": os.path.join(tmp, "assets"),
+        "FIREBASE_CREDENTIALS_PATH": os.path.join(tmp, "no-credentials.json"),
+        "AI_CACHE_ENABLED": "false",
+    })
+    return env
+
+def _sample(env: dict, preload: str) -> dict:
+    out = subprocess.run([sys.executable, "-c", _SAMPLE % preload], cwd=BACKEND_DIR, env=env, capture_output=True, text=True, check=True)
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+def _importtime(env: dict) -> tuple:
+    # -> (total seconds for `import main`, {top-level package: self seconds})
+    out = subprocess.run([sys.executable, "-X", "importtime", "-c", "import main"], cwd=BACKEND_DIR, env=env, capture_output=True, text=True, check=True)
+    packages = {}
+    total = 0.0
+    for line in out.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        module = name.strip()
+        package = module.split(".")[0]
+        packages[package] = packages.get(package, 0.0) + int(self_us) / 1e6
+        if module == "main":
+            total = int(cumulative_us) / 1e6
+    return total, packages
+
+def main():
+    parser = argparse.ArgumentParser(description="API cold-start and import-time report")
+    parser.add_argument("--repeat", type=int, default=5, help="fresh interpreters to time")
+    parser.add_argument("--top", type=int, default=15, help="packages to list in the import breakdown")
+    parser.add_argument("--preload", default="", help="warm-up components to load after import, e.g. ai,export or all")
+    parser.add_argument("--ai-backend", default="fake", choices=("fake", "gemini"), help="gemini imports the real SDK in the ai component (no call is made)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        env = _env(args, tmp)
+        samples = [_sample(env, args.preload) for _ in range(args.repeat)]
+        total, packages = _importtime(env)
+
+    imports = [s['import'] for s in samples]
+    print(f"import main: min {min(imports) * 1000:.0f} ms, median {statistics.median(imports) * 1000:.0f} ms over {len(imports)} runs")
+    for name in samples[0]['preload']:
+        times = [s['preload'][name] for s in samples]
+        print(f"  preload {name:<10} median {statistics.median(times) * 1000:>8.0f} ms")
+
+    print(f"\n-X importtime: import main {total * 1000:.0f} ms (includes the tracing overhead)")
+    print(f"{'package':<28} {'self ms':>9} {'share':>7}")
+    for package, seconds in sorted(packages.items(), key=lambda p: p[1], reverse=True)[:args.top]:
+        print(f"{package:<28} {seconds * 1000:>9.1f} {seconds / total * 100 if total else 0:>6.1f}%")
+
+if __name__ == "__main__":
+    main()
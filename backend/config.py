@@ -6,7 +6,88 @@ load_dotenv()
 class Settings:
     FIREBASE_CREDENTIALS_PATH = os.getenv("FIREBASE_CREDENTIALS_PATH", "serviceAccountKey.json")
     GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
+    GEMINI_MODEL = os.getenv("GEMINI_MODEL", "gemini-2.0-flash")
     FREEPIK_API_KEY = os.getenv("FREEPIK_API_KEY")
+    FREEPIK_BACKEND = os.getenv("FREEPIK_BACKEND", "api") # "api" or "fake" (offline, for tests and load runs)
+    FREEPIK_API_URL = os.getenv("FREEPIK_API_URL", "https://api.freepik.com/v1/resources") # Point at benchmarks/freepik_stub.py for local runs
+    FREEPIK_TIMEOUT_SECONDS = float(os.getenv("FREEPIK_TIMEOUT_SECONDS", "10"))
+    FREEPIK_MAX_CONNECTIONS = int(os.getenv("FREEPIK_MAX_CONNECTIONS", "20"))
+    FREEPIK_CANDIDATES = int(os.getenv("FREEPIK_CANDIDATES", "5")) # Results fetched per query
+    FREEPIK_CACHE_MAX_ENTRIES = int(os.getenv("FREEPIK_CACHE_MAX_ENTRIES", "1024"))
+    FREEPIK_CACHE_TTL_SECONDS = float(os.getenv("FREEPIK_CACHE_TTL_SECONDS", "3600"))
+    FREEPIK_FAKE_LATENCY = float(os.getenv("FREEPIK_FAKE_LATENCY", "0"))
+    FREEPIK_FAKE_FAILURE_RATE = float(os.getenv("FREEPIK_FAKE_FAILURE_RATE", "0"))
+    FREEPIK_FAKE_IMAGE_URL = os.getenv("FREEPIK_FAKE_IMAGE_URL") # URL the fake returns; unset means "no results"
     ALLOWED_ORIGINS = ["http://localhost:5173", "http://localhost:3000"]
+    AUTH_CACHE_TTL_SECONDS = float(os.getenv("AUTH_CACHE_TTL_SECONDS", "600"))
+    AUTH_CACHE_MAX_ENTRIES = int(os.getenv("AUTH_CACHE_MAX_ENTRIES", "10000"))
+
+    # Startup: components to load before serving / right after (services/warmup.py).
+    # Comma-separated from firebase, storage, auth, ai, images, export; "all" for every one.
+    STARTUP_PRELOAD = os.getenv("STARTUP_PRELOAD", "")
+    STARTUP_BACKGROUND_PRELOAD = os.getenv("STARTUP_BACKGROUND_PRELOAD", "firebase,storage,auth,ai")
+
+    # Project storage
+    STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "auto") # "auto", "firestore" or "sqlite"
+    LOCAL_DB_PATH = os.getenv("LOCAL_DB_PATH", "local.db")
+    PROJECTS_PAGE_SIZE = int(os.getenv("PROJECTS_PAGE_SIZE", "24")) # Default page of GET /projects/
+    PROJECTS_PAGE_MAX = int(os.getenv("PROJECTS_PAGE_MAX", "100"))
+
+    # AI service
+    AI_BACKEND = os.getenv("AI_BACKEND", "gemini") # "gemini" or "fake" (offline, for tests)
+    AI_TIMEOUT_SECONDS = float(os.getenv("AI_TIMEOUT_SECONDS", "60"))
+    AI_MAX_CONCURRENCY = int(os.getenv("AI_MAX_CONCURRENCY", "8"))
+    AI_FAKE_LATENCY = float(os.getenv("AI_FAKE_LATENCY", "0"))
+    AI_FAKE_FAILURE_RATE = float(os.getenv("AI_FAKE_FAILURE_RATE", "0"))
+    AI_FAKE_RPM = int(os.getenv("AI_FAKE_RPM", "0")) # Simulated quota for the fake model; 0 = unlimited
+    AI_RPM_LIMIT = float(os.getenv("AI_RPM_LIMIT", "0")) # Requests per minute admitted per worker; 0 = unlimited
+    AI_TPM_LIMIT = float(os.getenv("AI_TPM_LIMIT", "0")) # Tokens per minute admitted per worker; 0 = unlimited
+    AI_TPM_OUTPUT_ESTIMATE = int(os.getenv("AI_TPM_OUTPUT_ESTIMATE", "500")) # Reply tokens assumed before usage is known
+    AI_PRIORITY_MAX_WAIT_SECONDS = float(os.getenv("AI_PRIORITY_MAX_WAIT_SECONDS", "30")) # Queued longer than this, any class goes next
+    AI_MAX_RETRIES = int(os.getenv("AI_MAX_RETRIES", "3")) # Per call, for 429s, 5xx and timeouts
+    AI_RETRY_BASE_DELAY_SECONDS = float(os.getenv("AI_RETRY_BASE_DELAY_SECONDS", "1"))
+    AI_RETRY_MAX_DELAY_SECONDS = float(os.getenv("AI_RETRY_MAX_DELAY_SECONDS", "30"))
+    AI_RETRY_BUDGET_RATIO = float(os.getenv("AI_RETRY_BUDGET_RATIO", "0.2")) # Retries earned per call
+    AI_RETRY_BUDGET_MIN = float(os.getenv("AI_RETRY_BUDGET_MIN", "10")) # Retries available at startup
+    AI_RETRY_BUDGET_MAX = float(os.getenv("AI_RETRY_BUDGET_MAX", "50"))
+    AI_JSON_MAX_RETRIES = int(os.getenv("AI_JSON_MAX_RETRIES", "2")) # Re-asks with the validation errors when JSON output is invalid
+    AI_JSON_BATCH_ITEMS = int(os.getenv("AI_JSON_BATCH_ITEMS", "10")) # Outline items per multi-artifact call
+    AI_CACHE_ENABLED = os.getenv("AI_CACHE_ENABLED", "true").lower() == "true"
+    AI_CACHE_MAX_ENTRIES = int(os.getenv("AI_CACHE_MAX_ENTRIES", "1024"))
+    AI_CACHE_TTL_SECONDS = float(os.getenv("AI_CACHE_TTL_SECONDS", "86400"))
+    AI_CACHE_SQLITE_PATH = os.getenv("AI_CACHE_SQLITE_PATH") # Optional persistent tier, e.g. "ai_cache.db"
+    GENERATE_MAX_PARALLEL = int(os.getenv("GENERATE_MAX_PARALLEL", "6"))
+    PROJECT_CONTEXT_CACHE = os.getenv("PROJECT_CONTEXT_CACHE", "auto") # "auto" (Gemini cached content / fake stand-in) or "off" (inline prefix)
+    PROJECT_CONTEXT_TTL_SECONDS = float(os.getenv("PROJECT_CONTEXT_TTL_SECONDS", "900"))
+    PROJECT_CONTEXT_MIN_TOKENS = int(os.getenv("PROJECT_CONTEXT_MIN_TOKENS", "4096")) # Smaller contexts go inline; Gemini rejects tiny caches
+    PROJECT_CONTEXT_MAX_CHARS = int(os.getenv("PROJECT_CONTEXT_MAX_CHARS", "24000")) # Written sections included in the context
+    PROJECT_CONTEXT_SECTION_CHARS = int(os.getenv("PROJECT_CONTEXT_SECTION_CHARS", "1500"))
+    REFINE_CHUNK_CHARS = int(os.getenv("REFINE_CHUNK_CHARS", "2000")) # /generate/refine splits longer text at paragraph breaks
+    REFINE_MAX_PARALLEL = int(os.getenv("REFINE_MAX_PARALLEL", "6"))
+    FILL_MAX_PARALLEL = int(os.getenv("FILL_MAX_PARALLEL", "8")) # Background fill after create_project(fill_content=true)
+    FILL_JOB_TTL_SECONDS = float(os.getenv("FILL_JOB_TTL_SECONDS", "900"))
+
+    # Image selection
+    IMAGE_PROVIDER_GRACE_SECONDS = float(os.getenv("IMAGE_PROVIDER_GRACE_SECONDS", "3")) # How long a fallback result waits for Freepik
+
+    # Metrics
+    METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() == "true"
+    METRICS_OTEL_ENABLED = os.getenv("METRICS_OTEL_ENABLED", "false").lower() == "true" # Needs opentelemetry-api/sdk installed
+
+    # Export
+    EXPORT_WORKERS = int(os.getenv("EXPORT_WORKERS", "2")) # Processes in the render pool
+    EXPORT_MAX_CONCURRENCY = int(os.getenv("EXPORT_MAX_CONCURRENCY", "2"))
+    EXPORT_MAX_QUEUE = int(os.getenv("EXPORT_MAX_QUEUE", "16"))
+    EXPORT_JOB_TTL_SECONDS = float(os.getenv("EXPORT_JOB_TTL_SECONDS", "900"))
+    MARKDOWN_IR_CACHE_SIZE = int(os.getenv("MARKDOWN_IR_CACHE_SIZE", "4096")) # Compiled item contents per process
+    EXPORT_FRAGMENT_CACHE_SIZE = int(os.getenv("EXPORT_FRAGMENT_CACHE_SIZE", "2000")) # Per-item fragments per export process
+    EXPORT_CACHE_DIR = os.getenv("EXPORT_CACHE_DIR", "rendered_exports")
+    EXPORT_CACHE_MAX_BYTES = int(os.getenv("EXPORT_CACHE_MAX_BYTES", str(1024 * 1024 * 1024)))
+    EXPORT_IMAGE_WORKERS = int(os.getenv("EXPORT_IMAGE_WORKERS", "8"))
+    EXPORT_IMAGE_TIMEOUT_SECONDS = float(os.getenv("EXPORT_IMAGE_TIMEOUT_SECONDS", "10"))
+    EXPORT_IMAGE_MAX_BYTES = int(os.getenv("EXPORT_IMAGE_MAX_BYTES", str(10 * 1024 * 1024)))
+    ASSET_DIR = os.getenv("ASSET_DIR", "asset_cache")
+    ASSET_CACHE_MAX_BYTES = int(os.getenv("ASSET_CACHE_MAX_BYTES", str(512 * 1024 * 1024)))
+    ASSET_MAX_DIMENSION = int(os.getenv("ASSET_MAX_DIMENSION", "1920")) # 0 keeps originals
 
 settings = Settings()
@@ -1,7 +1,12 @@
-from fastapi import FastAPI
+import time
+_import_started = time.perf_counter()
+from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
+from starlette.datastructures import MutableHeaders
 from config import settings
 from routers import projects, generate
+from services import metrics
 
 app = FastAPI(title="AI Document Platform")
 
@@ -13,11 +18,81 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-from services.firebase import initialize_firebase
+class RequestMetricsMiddleware:
+    # Pure ASGI rather than @app.middleware("http"): that sees a response once its headers are
+    # sent, so SSE/NDJSON streams would be timed to their first byte. Here the timer stops when
+    # the last body chunk is sent (or the request fails / the client goes away).
+    # Route templates (e.g. /projects/{project_id}) keep label cardinality bounded.
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        token = metrics.start_request()
+        metrics.add_gauge("http_requests_in_flight", 1)
+        started = time.perf_counter()
+        status = 500
+
+        async def send_with_timing(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                spans = metrics.request_spans()
+                if spans:
+                    MutableHeaders(scope=message).append("Server-Timing", metrics.server_timing(spans))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            metrics.finish_request(token)
+            route = scope.get("route")
+            path = route.path if route is not None else "unmatched"
+            method = scope["method"]
+            metrics.add_gauge("http_requests_in_flight", -1)
+            metrics.inc("http_requests_total", method=method, route=path, status=status)
+            metrics.observe("http_request_duration_seconds", time.perf_counter() - started, method=method, route=path)
+
+app.add_middleware(RequestMetricsMiddleware)
+
+import asyncio
+from services import export_worker, freepik, content_pipeline, warmup
 
 @app.on_event("startup")
 async def startup_event():
-    initialize_firebase()
+    # Heavy SDKs are imported on first use (see services/warmup.py). STARTUP_PRELOAD is
+    # loaded before the app accepts requests; the background set runs on a thread so a
+    # slow import or certificate fetch never delays startup.
+    if settings.STARTUP_PRELOAD:
+        print(f"Preloaded before serving: {await asyncio.to_thread(warmup.preload, settings.STARTUP_PRELOAD)}")
+    app.state.preload = asyncio.create_task(asyncio.to_thread(warmup.preload, settings.STARTUP_BACKGROUND_PRELOAD))
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    export_worker.shutdown()
+    content_pipeline.shutdown()
+    await freepik.close()
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def read_metrics():
+    return metrics.render()
+
+@app.get("/warmup")
+def read_warmup():
+    return warmup.status()
+
+@app.post("/warmup")
+async def run_warmup(components: str = "all"):
+    # e.g. POST /warmup?components=ai,export from a readiness probe; -> seconds each load took
+    try:
+        warmup.parse(components)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    timings = await asyncio.to_thread(warmup.preload, components)
+    return {"timings": timings, **warmup.status()}
 
 @app.get("/")
 def read_root():
@@ -25,3 +100,5 @@ def read_root():
 
 app.include_router(projects.router)
 app.include_router(generate.router)
+
+warmup.record_import_time(time.perf_counter() - _import_started)
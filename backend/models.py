@@ -1,4 +1,4 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, model_validator
 from typing import List, Optional, Literal
 from datetime import datetime
 
@@ -24,9 +24,10 @@ class ProjectBase(BaseModel):
     type: Literal["word", "powerpoint"]
     topic: str
     description: Optional[str] = None
+    style_guide: Optional[str] = None # Tone/format rules included in the context of every section generation
 
 class ProjectCreate(ProjectBase):
-    pass
+    fill_content: bool = False # Draft every section in the background after returning the outline
 
 class Project(ProjectBase):
     id: str
@@ -35,11 +36,60 @@ class Project(ProjectBase):
     updated_at: datetime
     items: List[ContentItem] = []
 
+class ProjectSummary(BaseModel):
+    # Dashboard listing entry; the items are only loaded by GET /projects/{id}
+    id: str
+    title: str
+    type: Literal["word", "powerpoint"]
+    topic: str
+    item_count: int
+    updated_at: datetime
+
+class ProjectPage(BaseModel):
+    projects: List[ProjectSummary]
+    next_cursor: Optional[str] = None # Pass as ?cursor= for the next page; None on the last page
+
 class GenerateRequest(BaseModel):
     project_id: str
-    item_id: Optional[str] = None # If None, generate all? Or maybe specific endpoint
+    item_id: Optional[str] = None # Use /generate/content/all to fill every empty item
     prompt: Optional[str] = None # For refinement
+    regenerate: bool = False # Bypass the AI response cache
+
+class BatchGenerateRequest(BaseModel):
+    project_id: str
+    max_parallel: Optional[int] = None # Capped at GENERATE_MAX_PARALLEL
+    regenerate: bool = False
 
 class RefineRequest(BaseModel):
     text: str
     instruction: str
+    regenerate: bool = False
+    project_id: Optional[str] = None # When set with item_id, the streamed result is saved to the item
+    item_id: Optional[str] = None
+    selection_start: Optional[int] = None # Character range of `text` to refine (/refine only); the rest is kept as-is
+    selection_end: Optional[int] = None
+
+class ArtifactsRequest(BaseModel):
+    project_id: str
+    item_id: Optional[str] = None # None fills every section/slide of the project
+    artifacts: List[Literal["content", "chart", "image"]] = ["content"]
+    regenerate: bool = False
+
+# Structured AI output (validated JSON from services/ai.py)
+
+class ChartSeries(BaseModel):
+    name: str
+    values: List[float]
+
+class ChartData(BaseModel):
+    type: Literal["bar", "pie", "line"]
+    title: str
+    categories: List[str]
+    series: List[ChartSeries]
+
+    @model_validator(mode="after")
+    def check_lengths(self):
+        for s in self.series:
+            if len(s.values) != len(self.categories):
+                raise ValueError(f"series '{s.name}' has {len(s.values)} values for {len(self.categories)} categories")
+        return self
@@ -1,155 +1,310 @@
-from fastapi import APIRouter, HTTPException, Depends
-from models import GenerateRequest, RefineRequest
-from services.ai import generate_content, refine_content, generate_chart_data, generate_image_prompt, generate_image_keywords
-from services.freepik import search_image
-from services.firebase import get_db
-from routers.projects import get_current_user, MOCK_DB
+import asyncio
+import json
+from fastapi import APIRouter, HTTPException, Depends, BackgroundTasks
+from fastapi.responses import StreamingResponse
+from config import settings
+from models import GenerateRequest, BatchGenerateRequest, RefineRequest, ArtifactsRequest
+from services import ai
+from services.ai import generate_content, refine_content, stream_content, stream_refine, generate_chart_data, generate_item_artifacts, generate_outline_artifacts
+from services.images import select_image
+from services.refine import refine_range
+from services.assets import get_asset_store, prefetch_images
+from services.repository import get_async_repository
+from services import content_pipeline, ai_scheduler, project_context
+from routers.projects import get_current_user
 
 router = APIRouter(prefix="/generate", tags=["generate"])
 
-@router.post("/content")
-async def generate_item_content(request: GenerateRequest, user: dict = Depends(get_current_user)):
-    # Fetch project to get context
-    db = get_db()
-    project_data = None
-    if db:
-        doc = db.collection("projects").document(request.project_id).get()
-        if doc.exists:
-            project_data = doc.to_dict()
-    else:
-        project = MOCK_DB.get(request.project_id)
-        if project:
-            project_data = project.dict()
-            
+def _sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+async def _load_project(project_id: str) -> dict:
+    project_data = await get_async_repository().get_project(project_id)
     if not project_data:
         raise HTTPException(status_code=404, detail="Project not found")
+    return project_data
+
+async def _load_own_project(project_id: str, user: dict) -> dict:
+    project_data = await _load_project(project_id)
+    if project_data['user_id'] != user['uid']:
+        raise HTTPException(status_code=403, detail="Not authorized")
+    return project_data
 
-    # Find the item
-    target_item = None
+async def _load_project_item(project_id: str, item_id: str, user: dict):
+    project_data = await _load_own_project(project_id, user)
     for item in project_data['items']:
-        if item['id'] == request.item_id:
-            target_item = item
-            break
-            
-    if not target_item:
-        raise HTTPException(status_code=404, detail="Item not found")
-
-    # Generate
-    content = await generate_content(project_data['topic'], target_item['title'], project_data['type'])
+        if item['id'] == item_id:
+            return project_data, item
+    raise HTTPException(status_code=404, detail="Item not found")
+
+async def _stream_to_item(chunks, project_id: str, target_item: dict):
+    # Forwards each chunk as an SSE "delta" event and saves the full text once the stream completes.
+    # A failed stream ends with an "error" event instead of "done" and nothing is saved; the
+    # client discards the deltas it already received.
+    parts = []
+    try:
+        async for chunk in chunks:
+            parts.append(chunk)
+            yield _sse("delta", {"text": chunk})
+    except Exception:
+        yield _sse("error", {"detail": "Generation failed", "partial": bool(parts)})
+        return
+    content = ''.join(parts)
+    if target_item is not None:
+        await get_async_repository().update_item(project_id, target_item['id'], {"content": content})
+    yield _sse("done", {"content": content})
+
+@router.post("/content")
+async def generate_item_content(request: GenerateRequest, user: dict = Depends(get_current_user)):
+    # Fetch project to get context
+    project_data, target_item = await _load_project_item(request.project_id, request.item_id, user)
+
+    # Generate with the project's outline and the other written sections as context
+    context = project_context.build(project_data, shared=False, exclude_item_id=target_item['id'])
+    content = await generate_content(project_data['topic'], target_item['title'], project_data['type'], request.regenerate, context)
     
-    # Update DB
-    target_item['content'] = content
-    if db:
-        db.collection("projects").document(request.project_id).set(project_data)
-    else:
-        # MOCK_DB is already updated because project_data is a ref or we update it back
-        # In dict case, we need to put it back
-        MOCK_DB[request.project_id] = project_data # Simplified for mock
+    # Update only this item
+    await get_async_repository().update_item(request.project_id, target_item['id'], {"content": content})
 
     return {"content": content}
 
+@router.post("/content/all")
+async def generate_all_content(request: BatchGenerateRequest, user: dict = Depends(get_current_user)):
+    # Fills every empty section/slide concurrently and streams one NDJSON line per finished item.
+    # Failed items get an "error" line, are left empty and are picked up again by the next run.
+    project_data = await _load_own_project(request.project_id, user)
+
+    pending = [
+        item for item in project_data['items']
+        if item['type'] in ("section", "slide") and not item.get('content')
+    ]
+    max_parallel = min(request.max_parallel or settings.GENERATE_MAX_PARALLEL, settings.GENERATE_MAX_PARALLEL)
+    semaphore = asyncio.Semaphore(max(1, max_parallel))
+    context = project_context.build(project_data) # One snapshot (and context cache) for the whole batch
+
+    async def fill(item):
+        async with semaphore:
+            with ai_scheduler.priority("bulk"):
+                try:
+                    content = await generate_content(project_data['topic'], item['title'], project_data['type'], request.regenerate, context, fallback=False)
+                except Exception:
+                    return item['id'], None
+        return item['id'], content
+
+    async def stream():
+        tasks = [asyncio.create_task(fill(item)) for item in pending]
+        results = {}
+        failed = 0
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                item_id, content = await next_done
+                if content is None:
+                    failed += 1
+                    yield json.dumps({"item_id": item_id, "error": "Content generation failed"}) + "\n"
+                    continue
+                results[item_id] = {"content": content}
+                yield json.dumps({"item_id": item_id, "content": content}) + "\n"
+            yield json.dumps({"done": True, "generated": len(results), "failed": failed, "total": len(pending)}) + "\n"
+        finally:
+            for task in tasks:
+                task.cancel()
+            # One batched write touching only the generated items; items finished before a disconnect
+            # are kept (shielded: after a disconnect every await in here is cancelled again)
+            await asyncio.shield(get_async_repository().update_items(request.project_id, results))
+
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
+
+@router.post("/content/stream")
+async def stream_item_content(request: GenerateRequest, user: dict = Depends(get_current_user)):
+    project_data, target_item = await _load_project_item(request.project_id, request.item_id, user)
+    chunks = stream_content(project_data['topic'], target_item['title'], project_data['type'], request.regenerate, project_context.build(project_data, shared=False, exclude_item_id=target_item['id']))
+    return StreamingResponse(
+        _stream_to_item(chunks, request.project_id, target_item),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 @router.post("/refine")
 async def refine_text(request: RefineRequest):
-    refined = await refine_content(request.text, request.instruction)
-    return {"refined": refined}
+    # A selection, or text longer than REFINE_CHUNK_CHARS, is refined in paragraph chunks concurrently;
+    # diff lists the changed spans with their offsets in the original text
+    selected = request.selection_start is not None or request.selection_end is not None
+    if selected or len(request.text) > settings.REFINE_CHUNK_CHARS:
+        return await refine_range(request.text, request.instruction, request.selection_start, request.selection_end, request.regenerate)
+    refined = await refine_content(request.text, request.instruction, request.regenerate)
+    diff = [{"start": 0, "end": len(request.text), "original": request.text, "refined": refined}] if refined != request.text else []
+    return {"refined": refined, "diff": diff, "chunks": 1, "failed": 0}
+
+@router.post("/refine/stream")
+async def stream_refine_text(request: RefineRequest, user: dict = Depends(get_current_user)):
+    project_data = target_item = None
+    if request.project_id and request.item_id:
+        project_data, target_item = await _load_project_item(request.project_id, request.item_id, user)
+    chunks = stream_refine(request.text, request.instruction, request.regenerate)
+    return StreamingResponse(
+        _stream_to_item(chunks, request.project_id, target_item),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
 
 @router.post("/chart")
 async def generate_chart(request: GenerateRequest, user: dict = Depends(get_current_user)):
     # Fetch project context
-    db = get_db()
-    project_data = None
-    if db:
-        doc = db.collection("projects").document(request.project_id).get()
-        if doc.exists:
-            project_data = doc.to_dict()
-    else:
-        project = MOCK_DB.get(request.project_id)
-        if project:
-            project_data = project.dict()
-
-    if not project_data:
-        raise HTTPException(status_code=404, detail="Project not found")
+    project_data, target_item = await _load_project_item(request.project_id, request.item_id, user)
 
-    # Find item
-    target_item = None
-    for item in project_data['items']:
-        if item['id'] == request.item_id:
-            target_item = item
-            break
+    chart_data = await generate_chart_data(project_data['topic'], target_item['title'], request.prompt, request.regenerate)
     
-    if not target_item:
-        raise HTTPException(status_code=404, detail="Item not found")
-
-    chart_data = await generate_chart_data(project_data['topic'], target_item['title'], request.prompt)
-    
-    # Update DB
-    target_item['type'] = 'chart'
-    target_item['chart_data'] = chart_data
-    
-    if db:
-        db.collection("projects").document(request.project_id).set(project_data)
-    else:
-        MOCK_DB[request.project_id] = project_data
+    # Update only this item
+    await get_async_repository().update_item(request.project_id, target_item['id'], {"type": "chart", "chart_data": chart_data})
 
     return {"chart_data": chart_data}
 
+def _image_fields(item: dict, selection: dict, prompt: str = None) -> dict:
+    if item['type'] == 'slide':
+        return {"image_url": selection['image_url'], "image_prompt": prompt}
+    return {"type": "image_prompt", "image_prompt": prompt or selection['query'], "image_url": selection['image_url']}
+
 @router.post("/image-prompt")
-async def generate_image(request: GenerateRequest, user: dict = Depends(get_current_user)):
+async def generate_image(request: GenerateRequest, background_tasks: BackgroundTasks, user: dict = Depends(get_current_user)):
     # Fetch project context
-    db = get_db()
-    project_data = None
-    if db:
-        doc = db.collection("projects").document(request.project_id).get()
-        if doc.exists:
-            project_data = doc.to_dict()
-    else:
-        project = MOCK_DB.get(request.project_id)
-        if project:
-            project_data = project.dict()
+    project_data, target_item = await _load_project_item(request.project_id, request.item_id, user)
 
-    if not project_data:
-        raise HTTPException(status_code=404, detail="Project not found")
+    # Keywords are extracted once and Freepik races the Unsplash fallback (see services/images.py).
+    # On regenerate, Freepik skips the current picture and takes the next cached candidate.
+    exclude = (target_item.get('image_url'),) if request.regenerate else ()
+    selection = await select_image(project_data['topic'], target_item['title'], request.prompt, request.regenerate, exclude)
+    image_url = selection['image_url']
 
-    # Find item
-    target_item = None
-    for item in project_data['items']:
-        if item['id'] == request.item_id:
-            target_item = item
-            break
-    
-    if not target_item:
-        raise HTTPException(status_code=404, detail="Item not found")
+    # Update only this item
+    # Do NOT change type if it's a slide, just add image_url
+    await get_async_repository().update_item(request.project_id, target_item['id'], _image_fields(target_item, selection, request.prompt))
 
-    # Generate keywords for Freepik (or use prompt directly)
-    # keywords = await generate_image_keywords(project_data['topic'], target_item['title'], request.prompt)
-    # image_url = f"https://source.unsplash.com/1600x900/?{keywords.replace(' ', ',')}"
-    
-    # Use Freepik
-    search_query = request.prompt
-    if not search_query:
-        # Fallback to keywords if no prompt
-        search_query = await generate_image_keywords(project_data['topic'], target_item['title'])
-        
-    image_url = search_image(search_query)
-    
-    if not image_url:
-        # Fallback to Unsplash if Freepik fails or returns no results
-        keywords = await generate_image_keywords(project_data['topic'], target_item['title'], request.prompt)
-        image_url = f"https://source.unsplash.com/1600x900/?{keywords.replace(' ', ',')}"
+    # Download the picked image into the asset store after responding, so exports read it from disk
+    if image_url:
+        background_tasks.add_task(get_asset_store().get_or_fetch, image_url)
 
-    # Update DB
-    # Do NOT change type if it's a slide, just add image_url
-    if target_item['type'] == 'slide':
-        target_item['image_url'] = image_url
-        target_item['image_prompt'] = request.prompt
-    else:
-        target_item['type'] = 'image_prompt'
-        target_item['image_prompt'] = request.prompt or search_query 
-        target_item['image_url'] = image_url
-    
-    if db:
-        db.collection("projects").document(request.project_id).set(project_data)
+    return {"image_prompt": request.prompt, "image_url": image_url}
+
+@router.post("/images")
+async def generate_all_images(request: BatchGenerateRequest, background_tasks: BackgroundTasks, user: dict = Depends(get_current_user)):
+    # Picks images for every slide that has none (all of them on regenerate) in one call,
+    # streams one NDJSON line per slide and downloads the picks into the asset store afterwards
+    project_data = await _load_own_project(request.project_id, user)
+
+    pending = [
+        item for item in project_data['items']
+        if item['type'] in ("slide", "image_prompt") and (request.regenerate or not item.get('image_url'))
+    ]
+    max_parallel = min(request.max_parallel or settings.GENERATE_MAX_PARALLEL, settings.GENERATE_MAX_PARALLEL)
+    semaphore = asyncio.Semaphore(max(1, max_parallel))
+    results = {}
+
+    async def pick(item):
+        async with semaphore:
+            exclude = (item.get('image_url'),) if request.regenerate else ()
+            with ai_scheduler.priority("bulk"):
+                selection = await select_image(project_data['topic'], item['title'], item.get('image_prompt'), request.regenerate, exclude)
+        return item, selection
+
+    async def stream():
+        tasks = [asyncio.create_task(pick(item)) for item in pending]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                item, selection = await next_done
+                if selection['image_url']:
+                    results[item['id']] = _image_fields(item, selection, item.get('image_prompt'))
+                yield json.dumps({"item_id": item['id'], **selection}) + "\n"
+            yield json.dumps({"done": True, "resolved": len(results), "total": len(pending)}) + "\n"
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.shield(get_async_repository().update_items(request.project_id, results))
+
+    def warm_assets():
+        # Runs after the stream finishes, with whatever was picked
+        prefetch_images(fields['image_url'] for fields in results.values())
+
+    background_tasks.add_task(warm_assets)
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
+
+# Request artifact -> fields produced by the structured AI call
+_ARTIFACT_OUTPUTS = {"content": ("content",), "chart": ("chart",), "image": ("image_prompt", "image_keywords")}
+
+@router.post("/artifacts")
+async def generate_artifacts(request: ArtifactsRequest, background_tasks: BackgroundTasks, user: dict = Depends(get_current_user)):
+    # Content, chart and image for one item (or every item of the project) from a single
+    # structured Gemini call per item/batch instead of one call per artifact
+    project_data = await _load_own_project(request.project_id, user)
+    if request.item_id:
+        items = [item for item in project_data['items'] if item['id'] == request.item_id]
+        if not items:
+            raise HTTPException(status_code=404, detail="Item not found")
     else:
-        MOCK_DB[request.project_id] = project_data
+        items = sorted((i for i in project_data['items'] if i['type'] in ("section", "slide")), key=lambda x: x['order'])
+    outputs = tuple(field for artifact in dict.fromkeys(request.artifacts) for field in _ARTIFACT_OUTPUTS[artifact])
+    if not items or not outputs:
+        return {"items": []}
 
-    return {"image_prompt": request.prompt, "image_url": image_url}
+    try:
+        if len(items) == 1:
+            generated = [await generate_item_artifacts(project_data['topic'], items[0]['title'], project_data['type'], outputs, items[0].get('image_prompt'), request.regenerate)]
+        else:
+            generated = await generate_outline_artifacts(project_data['topic'], project_data['type'], [i['title'] for i in items], outputs, request.regenerate)
+    except Exception as e:
+        print(f"AI Error (Artifacts): {e}")
+        raise HTTPException(status_code=502, detail="AI returned no valid output")
+
+    semaphore = asyncio.Semaphore(settings.GENERATE_MAX_PARALLEL)
+
+    async def to_fields(item, artifacts):
+        fields = {}
+        if 'content' in artifacts:
+            fields['content'] = artifacts['content']
+        if 'chart' in artifacts:
+            # Stored next to the item's own content: it stays a section/slide and the
+            # export draws the chart beside its text
+            fields['chart_data'] = artifacts['chart']
+        if 'image_keywords' in artifacts:
+            async with semaphore:
+                exclude = (item.get('image_url'),) if request.regenerate else ()
+                selection = await select_image(project_data['topic'], item['title'], None, request.regenerate, exclude, artifacts['image_keywords'])
+            fields.update(image_prompt=artifacts['image_prompt'], image_url=selection['image_url'])
+        return item['id'], fields
+
+    updates = dict(await asyncio.gather(*(to_fields(item, artifacts) for item, artifacts in zip(items, generated))))
+    await get_async_repository().update_items(request.project_id, updates)
+
+    image_urls = [fields['image_url'] for fields in updates.values() if fields.get('image_url')]
+    if image_urls:
+        background_tasks.add_task(prefetch_images, image_urls)
+    return {"items": [{"item_id": item_id, **fields} for item_id, fields in updates.items()]}
+
+def _get_fill(project_id: str, user: dict) -> dict:
+    job = content_pipeline.get_fill(project_id)
+    if not job or job['user_id'] != user['uid']:
+        raise HTTPException(status_code=404, detail="No content fill for this project")
+    return job
+
+@router.get("/fill/{project_id}")
+async def get_fill_progress(project_id: str, user: dict = Depends(get_current_user)):
+    return content_pipeline.fill_status(_get_fill(project_id, user))
+
+@router.get("/fill/{project_id}/events")
+async def stream_fill_progress(project_id: str, user: dict = Depends(get_current_user)):
+    job = _get_fill(project_id, user)
+
+    async def events():
+        async for event, data in content_pipeline.subscribe(job):
+            yield _sse(event, data)
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+@router.get("/cache/stats")
+async def cache_stats():
+    if ai.response_cache is None:
+        return {"enabled": False}
+    return {"enabled": True, **ai.response_cache.stats()}
+
+@router.get("/scheduler/stats")
+async def scheduler_stats():
+    return {**ai_scheduler.scheduler.stats(), "project_contexts": project_context.stats()}
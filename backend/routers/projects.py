@@ -1,25 +1,25 @@
-from fastapi import APIRouter, HTTPException, Depends, Header
-from models import Project, ProjectCreate, ContentItem
-from services.firebase import get_db, verify_token
+from fastapi import APIRouter, HTTPException, Depends, Header, Query
+from config import settings
+from models import Project, ProjectCreate, ContentItem, ProjectPage
+from services.firebase import verify_token_cached
+from services.repository import get_async_repository
 from services.ai import generate_outline
-from typing import List
+import asyncio
+import os
 import uuid
-from services.export import export_to_docx, export_to_pptx
-from fastapi.responses import StreamingResponse
+from services import export_worker, export_cache, content_pipeline
+from fastapi.responses import Response, FileResponse
 from datetime import datetime
 
 router = APIRouter(prefix="/projects", tags=["projects"])
 
-# Mock DB for development if Firebase is missing
-MOCK_DB = {}
-
 async def get_current_user(authorization: str = Header(None)):
     if not authorization:
         # For dev/testing without auth
         return {"uid": "test_user"}
     
     token = authorization.split(" ")[1]
-    user = verify_token(token)
+    user = await verify_token_cached(token)
     if not user:
         raise HTTPException(status_code=401, detail="Invalid token")
     return user
@@ -46,91 +46,112 @@ async def create_project(project_in: ProjectCreate, user: dict = Depends(get_cur
         created_at=datetime.now(),
         updated_at=datetime.now(),
         items=items,
-        **project_in.dict()
+        **project_in.dict(exclude={"fill_content"})
     )
     
-    db = get_db()
-    if db:
-        db.collection("projects").document(project_id).set(new_project.dict())
-    else:
-        MOCK_DB[project_id] = new_project
-
+    await get_async_repository().create_project(new_project.dict())
+    if project_in.fill_content:
+        # Progress: GET /generate/fill/{project_id} (poll) or /generate/fill/{project_id}/events (SSE)
+        content_pipeline.start_fill(new_project.dict())
     return new_project
 
-@router.get("/", response_model=List[Project])
-async def list_projects(user: dict = Depends(get_current_user)):
-    db = get_db()
-    if db:
-        docs = db.collection("projects").where("user_id", "==", user['uid']).stream()
-        return [Project(**doc.to_dict()) for doc in docs]
-    else:
-        return [p for p in MOCK_DB.values() if p.user_id == user['uid']]
+@router.get("/export/stats")
+async def export_stats():
+    return export_worker.stats()
+
+@router.get("/", response_model=ProjectPage)
+async def list_projects(limit: int = Query(None, ge=1), cursor: str = None, user: dict = Depends(get_current_user)):
+    # Summaries only, newest first; open a project with GET /projects/{id} for its items
+    limit = min(limit or settings.PROJECTS_PAGE_SIZE, settings.PROJECTS_PAGE_MAX)
+    try:
+        summaries, next_cursor = await get_async_repository().list_projects(user['uid'], limit, cursor)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return ProjectPage(projects=summaries, next_cursor=next_cursor)
 
 @router.get("/{project_id}", response_model=Project)
 async def get_project(project_id: str, user: dict = Depends(get_current_user)):
-    db = get_db()
-    if db:
-        doc = db.collection("projects").document(project_id).get()
-        if not doc.exists:
-            raise HTTPException(status_code=404, detail="Project not found")
-        project = Project(**doc.to_dict())
-    else:
-        project = MOCK_DB.get(project_id)
-        if not project:
-            raise HTTPException(status_code=404, detail="Project not found")
-            
+    project_data = await get_async_repository().get_project(project_id)
+    if not project_data:
+        raise HTTPException(status_code=404, detail="Project not found")
+    project = Project(**project_data)
+
     if project.user_id != user['uid']:
         raise HTTPException(status_code=403, detail="Not authorized")
     return project
 
 @router.get("/{project_id}/export")
-async def export_project(project_id: str, user: dict = Depends(get_current_user)):
-    # Reuse get_project logic or call it
-    # For simplicity, just fetch again
-    db = get_db()
-    if db:
-        doc = db.collection("projects").document(project_id).get()
-        if not doc.exists:
-            raise HTTPException(status_code=404, detail="Project not found")
-        project_data = doc.to_dict()
-    else:
-        project = MOCK_DB.get(project_id)
-        if not project:
-            raise HTTPException(status_code=404, detail="Project not found")
-        project_data = project.dict()
+async def export_project(project_id: str, user: dict = Depends(get_current_user), if_none_match: str = Header(None)):
+    project_data = await get_async_repository().get_project(project_id)
+    if not project_data:
+        raise HTTPException(status_code=404, detail="Project not found")
 
     if project_data['user_id'] != user['uid']:
         raise HTTPException(status_code=403, detail="Not authorized")
 
-    if project_data['type'] == 'word':
-        buffer = export_to_docx(project_data)
-        filename = f"{project_data['title']}.docx"
-        media_type = "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
-    else:
-        buffer = export_to_pptx(project_data)
-        filename = f"{project_data['title']}.pptx"
-        media_type = "application/vnd.openxmlformats-officedocument.presentationml.presentation"
-
-    return StreamingResponse(
-        buffer, 
-        media_type=media_type, 
-        headers={"Content-Disposition": f"attachment; filename={filename}"}
+    # Unchanged projects are served from the rendered-export cache; the ETag is the project revision
+    revision = await asyncio.to_thread(export_cache.revision, project_data) # Asset store lookups per image
+    etag = f'"{revision}"'
+    cache_headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if if_none_match and etag in [tag.strip() for tag in if_none_match.split(",")]:
+        return Response(status_code=304, headers=cache_headers)
+
+    filename, media_type = export_worker.export_metadata(project_data)
+    try:
+        path, _ = await export_worker.export_file(project_data, revision)
+    except export_worker.ExportQueueFull:
+        raise HTTPException(status_code=429, detail="Too many exports in progress, try again shortly")
+
+    return FileResponse(path, media_type=media_type, filename=filename, headers=cache_headers)
+
+@router.post("/{project_id}/export/jobs")
+async def create_export_job(project_id: str, user: dict = Depends(get_current_user)):
+    # Queued variant for large decks: poll the job, then fetch /download when it is done
+    project_data = await get_async_repository().get_project(project_id)
+    if not project_data:
+        raise HTTPException(status_code=404, detail="Project not found")
+
+    if project_data['user_id'] != user['uid']:
+        raise HTTPException(status_code=403, detail="Not authorized")
+
+    try:
+        job = export_worker.submit_export_job(project_data, user['uid'])
+    except export_worker.ExportQueueFull:
+        raise HTTPException(status_code=429, detail="Too many exports in progress, try again shortly")
+    return export_worker.job_status(job)
+
+def _get_export_job(project_id: str, job_id: str, user: dict) -> dict:
+    job = export_worker.get_job(job_id)
+    if not job or job['project_id'] != project_id:
+        raise HTTPException(status_code=404, detail="Export job not found")
+    if job['user_id'] != user['uid']:
+        raise HTTPException(status_code=403, detail="Not authorized")
+    return job
+
+@router.get("/{project_id}/export/jobs/{job_id}")
+async def get_export_job(project_id: str, job_id: str, user: dict = Depends(get_current_user)):
+    return export_worker.job_status(_get_export_job(project_id, job_id, user))
+
+@router.get("/{project_id}/export/jobs/{job_id}/download")
+async def download_export_job(project_id: str, job_id: str, user: dict = Depends(get_current_user)):
+    job = _get_export_job(project_id, job_id, user)
+    if job['status'] != "done":
+        raise HTTPException(status_code=409, detail=f"Export job is {job['status']}")
+    if not await asyncio.to_thread(os.path.exists, job['path']):
+        # Only after a restart or manual cleanup: the job keeps its own link to the file
+        raise HTTPException(status_code=410, detail="Export file is no longer available, start a new export job")
+    return FileResponse(
+        job['path'],
+        media_type=job['media_type'],
+        filename=job['filename'],
+        headers={"ETag": f'"{job["revision"]}"', "Cache-Control": "private, no-cache"}
     )
 
 @router.post("/{project_id}/items", response_model=Project)
 async def add_item(project_id: str, title: str = "New Section", user: dict = Depends(get_current_user)):
-    db = get_db()
-    if db:
-        doc_ref = db.collection("projects").document(project_id)
-        doc = doc_ref.get()
-        if not doc.exists:
-            raise HTTPException(status_code=404, detail="Project not found")
-        project_data = doc.to_dict()
-    else:
-        project = MOCK_DB.get(project_id)
-        if not project:
-            raise HTTPException(status_code=404, detail="Project not found")
-        project_data = project.dict() # If it's a model
+    project_data = await get_async_repository().get_project(project_id)
+    if not project_data:
+        raise HTTPException(status_code=404, detail="Project not found")
 
     if project_data['user_id'] != user['uid']:
         raise HTTPException(status_code=403, detail="Not authorized")
@@ -139,59 +160,20 @@ async def add_item(project_id: str, title: str = "New Section", user: dict = Dep
         id=str(uuid.uuid4()),
         title=title,
         type="section" if project_data['type'] == "word" else "slide",
-        order=len(project_data['items']),
+        order=0, # Assigned by the repository
         content=""
     )
-    
-    # If project_data is dict (Firebase) or Pydantic (Mock)
-    if isinstance(project_data, dict):
-        items = project_data.get('items', [])
-        items.append(new_item.dict())
-        project_data['items'] = items
-        project_data['updated_at'] = datetime.now()
-        if db:
-            doc_ref.set(project_data)
-        else:
-            MOCK_DB[project_id] = Project(**project_data)
-    else:
-        # Mock DB Pydantic object
-        project_data.items.append(new_item)
-        project_data.updated_at = datetime.now()
-        MOCK_DB[project_id] = project_data
-        project_data = project_data.dict()
-
-    return project_data
+    await get_async_repository().add_item(project_id, new_item.dict())
+    return await get_async_repository().get_project(project_id)
 
 @router.delete("/{project_id}/items/{item_id}", response_model=Project)
 async def delete_item(project_id: str, item_id: str, user: dict = Depends(get_current_user)):
-    db = get_db()
-    if db:
-        doc_ref = db.collection("projects").document(project_id)
-        doc = doc_ref.get()
-        if not doc.exists:
-            raise HTTPException(status_code=404, detail="Project not found")
-        project_data = doc.to_dict()
-    else:
-        project = MOCK_DB.get(project_id)
-        if not project:
-            raise HTTPException(status_code=404, detail="Project not found")
-        project_data = project.dict()
+    project_data = await get_async_repository().get_project(project_id)
+    if not project_data:
+        raise HTTPException(status_code=404, detail="Project not found")
 
     if project_data['user_id'] != user['uid']:
         raise HTTPException(status_code=403, detail="Not authorized")
 
-    if isinstance(project_data, dict):
-        items = project_data.get('items', [])
-        project_data['items'] = [i for i in items if i['id'] != item_id]
-        project_data['updated_at'] = datetime.now()
-        if db:
-            doc_ref.set(project_data)
-        else:
-            MOCK_DB[project_id] = Project(**project_data)
-    else:
-        project_data.items = [i for i in project_data.items if i.id != item_id]
-        project_data.updated_at = datetime.now()
-        MOCK_DB[project_id] = project_data
-        project_data = project_data.dict()
-
-    return project_data
+    await get_async_repository().delete_item(project_id, item_id)
+    return await get_async_repository().get_project(project_id)
@@ -1,62 +1,314 @@
-import google.generativeai as genai
+import asyncio
 from config import settings
+from services.fake_ai import FakeModel
+from services.cache import ResponseCache, make_key
+from services import metrics, ai_scheduler, project_context
+from models import ChartData
+from pydantic import ValidationError, create_model
+from typing import List
 import json
+import threading
+import time
 
-if settings.GEMINI_API_KEY:
-    genai.configure(api_key=settings.GEMINI_API_KEY)
+# Built on first use: importing the Gemini SDK costs most of a second, which the
+# process shouldn't pay before it can serve /metrics or a project list. Preload it
+# with STARTUP_BACKGROUND_PRELOAD / POST /warmup (services/warmup.py) instead.
+model = None
+_model_lock = threading.Lock()
 
-model = genai.GenerativeModel('gemini-2.0-flash')
+def get_model():
+    global model
+    if model is None:
+        with _model_lock:
+            if model is None:
+                if settings.AI_BACKEND == "fake":
+                    model = FakeModel(latency=settings.AI_FAKE_LATENCY, failure_rate=settings.AI_FAKE_FAILURE_RATE, rpm=settings.AI_FAKE_RPM)
+                else:
+                    import google.generativeai as genai
+                    if settings.GEMINI_API_KEY:
+                        genai.configure(api_key=settings.GEMINI_API_KEY)
+                    model = genai.GenerativeModel(settings.GEMINI_MODEL)
+    return model
 
-async def generate_outline(topic: str, doc_type: str) -> list[str]:
+response_cache = None
+if settings.AI_CACHE_ENABLED:
+    response_cache = ResponseCache(
+        max_entries=settings.AI_CACHE_MAX_ENTRIES,
+        ttl_seconds=settings.AI_CACHE_TTL_SECONDS,
+        sqlite_path=settings.AI_CACHE_SQLITE_PATH
+    )
+
+def set_response_cache(cache):
+    # Any object with get(key) / set(key, value) works; None disables caching
+    global response_cache
+    response_cache = cache
+
+def _record_usage(operation: str, response) -> int:
+    # Returns the total tokens used, 0 when the response carries no usage
+    usage = getattr(response, "usage_metadata", None)
+    if usage is None:
+        return 0
+    prompt_tokens = getattr(usage, "prompt_token_count", 0) or 0
+    output_tokens = getattr(usage, "candidates_token_count", 0) or 0
+    metrics.inc("ai_tokens_total", prompt_tokens, operation=operation, kind="prompt")
+    metrics.inc("ai_tokens_total", output_tokens, operation=operation, kind="output")
+    # Part of the prompt tokens served from a context cache (see services/project_context.py)
+    cached_tokens = getattr(usage, "cached_content_token_count", 0) or 0
+    if cached_tokens:
+        metrics.inc("ai_tokens_total", cached_tokens, operation=operation, kind="cached")
+    return prompt_tokens + output_tokens
+
+def _cached(key: str, regenerate: bool):
+    if response_cache is None or regenerate:
+        return None
+    cached = response_cache.get(key)
+    metrics.cache_result("ai", cached is not None)
+    return cached
+
+def _context_key(prompt: str, context) -> str:
+    return make_key(settings.GEMINI_MODEL, f"{context.fingerprint}\n{prompt}" if context is not None else prompt)
+
+async def _resolve(prompt: str, context) -> tuple:
+    # -> (model, prompt to send); with a ProjectContext the shared part goes through its context cache
+    if context is None:
+        return get_model(), prompt
+    return await project_context.resolve(context, get_model(), prompt)
+
+async def _call_model(prompt: str, operation: str, context=None, **kwargs) -> str:
+    # Uses the SDK's async client so the event loop keeps serving other requests during the round trip.
+    # Admission (concurrency, RPM/TPM, priority) and retries are handled by ai_scheduler.
+    target, prompt = await _resolve(prompt, context)
+    estimate = ai_scheduler.estimate_tokens(prompt)
+    priority = ai_scheduler.priority_for(operation)
+
+    async def attempt():
+        async with ai_scheduler.scheduler.slot(estimate, priority) as ticket:
+            with metrics.span(f"ai.{operation}", model=settings.GEMINI_MODEL):
+                response = await asyncio.wait_for(
+                    target.generate_content_async(prompt, **kwargs),
+                    timeout=settings.AI_TIMEOUT_SECONDS
+                )
+            ticket.settle(_record_usage(operation, response))
+        return response
+
+    response = await ai_scheduler.with_retries(attempt, operation)
+    return response.text
+
+async def _generate(prompt: str, regenerate: bool = False, operation: str = "generate", context=None) -> str:
+    # regenerate skips the cache lookup but still stores the fresh answer
+    key = _context_key(prompt, context)
+    cached = _cached(key, regenerate)
+    if cached is not None:
+        return cached
+
+    text = await _call_model(prompt, operation, context)
+    if response_cache is not None:
+        response_cache.set(key, text)
+    return text
+
+def _validation_problems(error: ValidationError) -> str:
+    return "\n".join(f"- {'.'.join(str(p) for p in e['loc']) or '(root)'}: {e['msg']}" for e in error.errors()[:20])
+
+def _repair_prompt(prompt: str, output: str, problems: str) -> str:
+    # Targeted retry: point at the fields that failed validation instead of asking again from scratch
+    return f"""{prompt}
+
+Your previous answer was not valid for the required JSON schema:
+{output[:4000]}
+
+Problems:
+{problems}
+
+Return the complete corrected JSON only. Keep every valid field as it was and fix only the problems listed."""
+
+async def _generate_json(prompt: str, schema, regenerate: bool = False, operation: str = "json", check=None):
+    # Schema-constrained generation: Gemini is asked for JSON matching `schema` (a Pydantic model),
+    # the reply is validated, and invalid replies are retried with the validation errors attached.
+    # check(result) may return a problem description for rules the schema can't express.
+    key = make_key(settings.GEMINI_MODEL, f"{prompt}\n{json.dumps(schema.model_json_schema(), sort_keys=True)}")
+    cached = _cached(key, regenerate)
+    if cached is not None:
+        return schema.model_validate_json(cached)
+
+    generation_config = {"response_mime_type": "application/json", "response_schema": schema}
+    attempt_prompt = prompt
+    for attempt in range(settings.AI_JSON_MAX_RETRIES + 1):
+        text = await _call_model(attempt_prompt, operation, generation_config=generation_config)
+        try:
+            result = schema.model_validate_json(_strip_fences(text))
+            problem = check(result) if check else None
+            if problem:
+                raise ValueError(problem)
+        except (ValidationError, ValueError) as e:
+            metrics.inc("ai_json_invalid_total", operation=operation)
+            if attempt == settings.AI_JSON_MAX_RETRIES:
+                raise
+            problems = _validation_problems(e) if isinstance(e, ValidationError) else f"- {e}"
+            attempt_prompt = _repair_prompt(prompt, text, problems)
+            continue
+        if response_cache is not None:
+            response_cache.set(key, result.model_dump_json())
+        return result
+
+def _strip_fences(text: str) -> str:
+    return text.strip().removeprefix('```json').removeprefix('```').removesuffix('```').strip()
+
+async def _generate_stream(prompt: str, regenerate: bool = False, operation: str = "generate", context=None):
+    key = _context_key(prompt, context)
+    cached = _cached(key, regenerate)
+    if cached is not None:
+        yield cached
+        return
+
+    # Yields text chunks as Gemini produces them; the timeout applies to each chunk, not the whole reply.
+    # Someone is watching a stream, so it is admitted as interactive; only starting it is retried.
+    parts = []
+    chunk = None
+    target, prompt = await _resolve(prompt, context)
+    estimate = ai_scheduler.estimate_tokens(prompt)
+    ticket = None
+    started = None
+
+    async def start():
+        nonlocal ticket, started
+        ticket = await ai_scheduler.scheduler.acquire(estimate, ai_scheduler.priority_for(operation, "interactive"))
+        started = time.perf_counter()
+        try:
+            return await asyncio.wait_for(
+                target.generate_content_async(prompt, stream=True),
+                timeout=settings.AI_TIMEOUT_SECONDS
+            )
+        except BaseException:
+            ticket.release()
+            raise
+
+    response = await ai_scheduler.with_retries(start, operation)
+    first_chunk = True
+    try:
+        chunks = response.__aiter__()
+        while True:
+            try:
+                chunk = await asyncio.wait_for(chunks.__anext__(), timeout=settings.AI_TIMEOUT_SECONDS)
+            except StopAsyncIteration:
+                break
+            if first_chunk:
+                first_chunk = False
+                metrics.record_stage(f"ai.{operation}.first_chunk", time.perf_counter() - started)
+            try:
+                text = chunk.text
+            except ValueError:
+                # Chunks without text parts (e.g. the final finish_reason chunk)
+                continue
+            if text:
+                parts.append(text)
+                yield text
+    finally:
+        ticket.release()
+        metrics.record_stage(f"ai.{operation}.stream", time.perf_counter() - started)
+    if chunk is not None:
+        ticket.settle(_record_usage(operation, chunk)) # The last chunk carries the totals
+    if response_cache is not None:
+        response_cache.set(key, ''.join(parts))
+
+async def _strip_bold(chunks):
+    # Incremental equivalent of text.replace('**', ''): a trailing odd '*' is held back
+    # until the next chunk shows whether it starts a '**' pair
+    carry = ''
+    async for chunk in chunks:
+        buffer = carry + chunk
+        stars = len(buffer) - len(buffer.rstrip('*'))
+        if stars % 2:
+            buffer, carry = buffer[:-1], '*'
+        else:
+            carry = ''
+        cleaned = buffer.replace('**', '')
+        if cleaned:
+            yield cleaned
+    if carry:
+        yield carry
+
+def _content_prompt(topic: str, section_title: str, doc_type: str, with_context: bool = False) -> str:
+    context = "document section" if doc_type == "word" else "presentation slide"
+    prompt = f"Write the content for a {context} titled '{section_title}' for a project about '{topic}'. Keep it concise and relevant. Do not use placeholders like [**...**]. Write complete, plausible content. Do not use asterisks (**)."
+    if with_context:
+        prompt += " Fit it into the project context: follow the style guide, match the sections already written and do not repeat them."
+    return prompt
+
+def _refine_prompt(text: str, instruction: str) -> str:
+    return f"Refine the following text based on this instruction: '{instruction}'.\n\nText:\n{text}\n\nDo not use asterisks (**) or placeholders."
+
+def _refine_excerpt_prompt(text: str, instruction: str) -> str:
+    return (f"The following is an excerpt from a longer text. Refine it based on this instruction: '{instruction}'.\n\n"
+            f"Excerpt:\n{text}\n\nReturn only the rewritten excerpt, keeping its paragraph breaks. Do not add an introduction or a conclusion. "
+            "Do not use asterisks (**) or placeholders.")
+
+async def generate_outline(topic: str, doc_type: str, regenerate: bool = False) -> list[str]:
     prompt = f"Generate a structured outline for a {doc_type} about '{topic}'. Return only a list of section titles (for Word) or slide titles (for PowerPoint), one per line. Do not include numbering or bullets."
     try:
-        response = model.generate_content(prompt)
-        lines = response.text.strip().split('\n')
+        text = await _generate(prompt, regenerate, "outline")
+        lines = text.strip().split('\n')
         return [line.strip().lstrip('- ').lstrip('* ') for line in lines if line.strip()]
     except Exception as e:
         print(f"AI Error: {e}")
         return ["Introduction", "Main Body", "Conclusion"] # Fallback
 
-async def generate_content(topic: str, section_title: str, doc_type: str) -> str:
-    context = "document section" if doc_type == "word" else "presentation slide"
-    prompt = f"Write the content for a {context} titled '{section_title}' for a project about '{topic}'. Keep it concise and relevant. Do not use placeholders like [**...**]. Write complete, plausible content. Do not use asterisks (**)."
+async def generate_content(topic: str, section_title: str, doc_type: str, regenerate: bool = False, context=None, fallback: bool = True) -> str:
+    # context: a project_context.ProjectContext shared by every section of a batch.
+    # fallback=False lets errors propagate instead of returning placeholder text, for
+    # callers that save results in bulk and must not mistake a failure for content.
+    prompt = _content_prompt(topic, section_title, doc_type, context is not None)
     try:
-        response = model.generate_content(prompt)
-        return response.text.replace('**', '')
+        text = await _generate(prompt, regenerate, "content", context)
+        return text.replace('**', '')
     except Exception as e:
         print(f"AI Error: {e}")
+        if not fallback:
+            raise
         return f"Content generation failed for {section_title}."
 
-async def refine_content(text: str, instruction: str) -> str:
-    prompt = f"Refine the following text based on this instruction: '{instruction}'.\n\nText:\n{text}\n\nDo not use asterisks (**) or placeholders."
+async def stream_content(topic: str, section_title: str, doc_type: str, regenerate: bool = False, context=None):
+    # Errors propagate, also after some chunks were sent, so the caller can report them
+    # instead of saving a truncated (or placeholder) text
+    prompt = _content_prompt(topic, section_title, doc_type, context is not None)
     try:
-        response = model.generate_content(prompt)
-        return response.text.replace('**', '')
+        async for chunk in _strip_bold(_generate_stream(prompt, regenerate, "content", context)):
+            yield chunk
+    except Exception as e:
+        print(f"AI Error (Stream): {e}")
+        raise
+
+async def refine_content(text: str, instruction: str, regenerate: bool = False) -> str:
+    prompt = _refine_prompt(text, instruction)
+    try:
+        refined = await _generate(prompt, regenerate, "refine")
+        return refined.replace('**', '')
     except Exception as e:
         print(f"AI Error: {e}")
         return text
 
-async def generate_chart_data(topic: str, slide_title: str, user_prompt: str = None) -> dict:
-    base_prompt = f"Generate JSON data for a chart relevant to the slide '{slide_title}' for a presentation about '{topic}'."
+async def refine_excerpt(text: str, instruction: str, regenerate: bool = False) -> str:
+    # One chunk of a chunked refine (services/refine.py); errors propagate so the caller can keep the original
+    refined = await _generate(_refine_excerpt_prompt(text, instruction), regenerate, "refine")
+    return refined.replace('**', '').strip()
+
+async def stream_refine(text: str, instruction: str, regenerate: bool = False):
+    # Errors propagate like in stream_content
+    prompt = _refine_prompt(text, instruction)
+    try:
+        async for chunk in _strip_bold(_generate_stream(prompt, regenerate, "refine")):
+            yield chunk
+    except Exception as e:
+        print(f"AI Error (Stream): {e}")
+        raise
+
+async def generate_chart_data(topic: str, slide_title: str, user_prompt: str = None, regenerate: bool = False) -> dict:
+    prompt = f"Generate JSON data for a chart relevant to the slide '{slide_title}' for a presentation about '{topic}'."
     if user_prompt:
-        base_prompt = f"Generate JSON data for a chart based on this description: '{user_prompt}'. Context: slide '{slide_title}', topic '{topic}'."
-        
-    prompt = f"""{base_prompt}
-    The JSON must have this structure:
-    {{
-        "type": "bar", // or "pie" or "line"
-        "title": "Chart Title",
-        "categories": ["Cat1", "Cat2", "Cat3"],
-        "series": [
-            {{"name": "Series1", "values": [10, 20, 30]}}
-        ]
-    }}
-    Return ONLY valid JSON. Do not include markdown formatting like ```json.
-    """
+        prompt = f"Generate JSON data for a chart based on this description: '{user_prompt}'. Context: slide '{slide_title}', topic '{topic}'."
+    prompt += " Use type 'bar', 'pie' or 'line'; every series needs one value per category."
     try:
-        response = model.generate_content(prompt)
-        text = response.text.strip().replace('```json', '').replace('```', '')
-        return json.loads(text)
+        chart = await _generate_json(prompt, ChartData, regenerate, "chart")
+        return chart.model_dump()
     except Exception as e:
         print(f"AI Error (Chart): {e}")
         return {
@@ -66,24 +318,90 @@ async def generate_chart_data(topic: str, slide_title: str, user_prompt: str = N
             "series": [{"name": "Data", "values": [10, 20, 30]}]
         }
 
-async def generate_image_prompt(topic: str, slide_title: str) -> str:
+async def generate_image_prompt(topic: str, slide_title: str, regenerate: bool = False) -> str:
     prompt = f"Write a detailed, descriptive prompt for an AI image generator to create an image for a slide titled '{slide_title}' about '{topic}'. The image should be professional and visually appealing. Return only the prompt."
     try:
-        response = model.generate_content(prompt)
-        return response.text.strip()
+        text = await _generate(prompt, regenerate, "image_prompt")
+        return text.strip()
     except Exception as e:
         print(f"AI Error (Image): {e}")
         return f"An image representing {slide_title}"
 
-async def generate_image_keywords(topic: str, slide_title: str, user_prompt: str = None) -> str:
+async def generate_image_keywords(topic: str, slide_title: str, user_prompt: str = None, regenerate: bool = False) -> str:
     base_prompt = f"Extract 2-3 most relevant visual keywords for an image for a slide titled '{slide_title}' about '{topic}'."
     if user_prompt:
         base_prompt = f"Extract 2-3 most relevant visual keywords for an image based on this description: '{user_prompt}'. Context: slide '{slide_title}', topic '{topic}'."
     
     prompt = f"{base_prompt} Return ONLY the keywords separated by commas (e.g. 'city, neon, future'). Do not include any other text."
     try:
-        response = model.generate_content(prompt)
-        return response.text.strip()
+        text = await _generate(prompt, regenerate, "image_keywords")
+        return text.strip()
     except Exception as e:
         print(f"AI Error (Image Keywords): {e}")
         return "business, technology"
+
+# --- Multi-artifact generation ---
+
+_ARTIFACT_FIELDS = {
+    "content": (str, "the full text content, no asterisks or placeholders"),
+    "chart": (ChartData, "chart data relevant to the item; every series has one value per category"),
+    "image_prompt": (str, "a detailed, professional prompt for an AI image generator"),
+    "image_keywords": (str, "2-3 visual keywords separated by commas, e.g. 'city, neon, future'"),
+}
+_artifact_models = {}
+
+def _artifact_model(artifacts: tuple, with_title: bool):
+    # One Pydantic model per artifact combination, so the schema only asks for what is needed
+    key = (artifacts, with_title)
+    if key not in _artifact_models:
+        fields = {"title": (str, ...)} if with_title else {}
+        fields.update({name: (_ARTIFACT_FIELDS[name][0], ...) for name in artifacts})
+        item_model = create_model("ItemArtifacts", **fields)
+        _artifact_models[key] = create_model("OutlineArtifacts", items=(List[item_model], ...)) if with_title else item_model
+    return _artifact_models[key]
+
+def _artifact_instructions(artifacts: tuple) -> str:
+    return "\n".join(f"- {name}: {_ARTIFACT_FIELDS[name][1]}" for name in artifacts)
+
+def _clean_artifacts(data: dict) -> dict:
+    if 'content' in data:
+        data['content'] = data['content'].replace('**', '')
+    if 'image_keywords' in data:
+        data['image_keywords'] = data['image_keywords'].strip()
+    return data
+
+async def generate_item_artifacts(topic: str, section_title: str, doc_type: str, artifacts: tuple, user_prompt: str = None, regenerate: bool = False) -> dict:
+    # Everything one item needs (any of content, chart, image_prompt, image_keywords) from a single Gemini call
+    artifacts = tuple(artifacts)
+    context = "document section" if doc_type == "word" else "presentation slide"
+    prompt = f"For a {context} titled '{section_title}' in a project about '{topic}', produce:\n{_artifact_instructions(artifacts)}"
+    if user_prompt:
+        prompt += f"\nFollow this guidance: '{user_prompt}'."
+    result = await _generate_json(prompt, _artifact_model(artifacts, False), regenerate, "artifacts")
+    return _clean_artifacts(result.model_dump())
+
+async def generate_outline_artifacts(topic: str, doc_type: str, titles: list, artifacts: tuple, regenerate: bool = False) -> list:
+    # The same for a whole outline: one call per AI_JSON_BATCH_ITEMS titles, results in title order
+    artifacts = tuple(artifacts)
+    context = "document sections" if doc_type == "word" else "presentation slides"
+    model_cls = _artifact_model(artifacts, True)
+    batches = [titles[i:i + settings.AI_JSON_BATCH_ITEMS] for i in range(0, len(titles), settings.AI_JSON_BATCH_ITEMS)]
+
+    async def run(batch):
+        listed = "\n".join(f"{n + 1}. {title}" for n, title in enumerate(batch))
+        prompt = (f"For each of these {context} in a project about '{topic}':\n{listed}\n\n"
+                  f"Return one entry per title, in the same order, with the exact title and:\n{_artifact_instructions(artifacts)}")
+        def check(result):
+            if len(result.items) != len(batch):
+                return f"items must have exactly {len(batch)} entries, one per title, got {len(result.items)}"
+
+        result = await _generate_json(prompt, model_cls, regenerate, "outline_artifacts", check)
+        by_title = {entry.title: entry for entry in result.items}
+        # Match by title, or by position when the model rewrote a title
+        entries = [by_title[title] for title in batch] if all(title in by_title for title in batch) else result.items
+        return [_clean_artifacts(entry.model_dump()) for entry in entries]
+
+    results = []
+    for batch_result in await asyncio.gather(*(run(batch) for batch in batches)):
+        results.extend(batch_result)
+    return results
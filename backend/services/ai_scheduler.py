@@ -0,0 +1,248 @@
+import asyncio
+import contextvars
+import functools
+import random
+import time
+from collections import deque
+from contextlib import asynccontextmanager, contextmanager
+from config import settings
+from services.fake_ai import FakeAPIError, FakeRateLimitError
+from services import metrics
+
+# Admission control for Gemini calls. Every call waits here for a concurrency slot
+# (AI_MAX_CONCURRENCY) and for room in two token buckets: requests per minute
+# (AI_RPM_LIMIT) and tokens per minute (AI_TPM_LIMIT, estimated from the prompt and
+# corrected with the reported usage afterwards). Waiters are served by priority
+# class, FIFO within a class; a waiter older than AI_PRIORITY_MAX_WAIT_SECONDS is
+# served first whatever its class, so bulk work can't starve.
+#
+# with_retries() retries 429s, 5xx and timeouts with full-jitter exponential
+# backoff. A 429 also pauses admissions for the backoff delay, so queued calls
+# don't run into the same quota. Retries draw on a shared budget that refills by
+# AI_RETRY_BUDGET_RATIO per call, which caps retry traffic during an outage.
+
+PRIORITIES = ("interactive", "standard", "bulk") # Highest first
+_OPERATION_PRIORITY = {"refine": "interactive", "outline_artifacts": "bulk"}
+
+@functools.lru_cache(maxsize=None)
+def _error_classes() -> tuple:
+    # -> (rate limited, retryable). Built on the first failure: google.api_core is only
+    # worth importing at startup when the Gemini SDK (which imports it anyway) is in use.
+    from google.api_core import exceptions as google_exceptions
+    rate_limited = (google_exceptions.TooManyRequests, google_exceptions.ResourceExhausted, FakeRateLimitError)
+    retryable = rate_limited + (
+        google_exceptions.InternalServerError,
+        google_exceptions.ServiceUnavailable,
+        google_exceptions.DeadlineExceeded,
+        asyncio.TimeoutError,
+        FakeAPIError,
+    )
+    return rate_limited, retryable
+
+# Priority of the calls made in the current task, e.g. "bulk" for background fills
+_priority = contextvars.ContextVar("ai_priority", default=None)
+
+@contextmanager
+def priority(name: str):
+    token = _priority.set(name)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+def priority_for(operation: str, explicit: str = None) -> str:
+    return explicit or _priority.get() or _OPERATION_PRIORITY.get(operation, "standard")
+
+def estimate_tokens(prompt: str) -> int:
+    # ~4 characters per token plus a typical reply; reconciled with usage_metadata afterwards
+    return len(prompt) // 4 + settings.AI_TPM_OUTPUT_ESTIMATE
+
+class TokenBucket:
+    def __init__(self, per_minute: float):
+        self.capacity = per_minute # 0 disables the limit
+        self.rate = per_minute / 60
+        self.tokens = per_minute
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount: float) -> float:
+        if not self.capacity:
+            return 0.0
+        self._refill()
+        # A request bigger than the whole bucket runs once the bucket is full
+        missing = min(amount, self.capacity) - self.tokens
+        return max(0.0, missing / self.rate)
+
+    def take(self, amount: float):
+        if self.capacity:
+            self.tokens -= amount
+
+class Ticket:
+    # One admitted call: release() frees the slot, settle() corrects the token estimate
+    def __init__(self, scheduler, estimate: int):
+        self.scheduler = scheduler
+        self.estimate = estimate
+        self.released = False
+
+    def settle(self, actual_tokens: int):
+        if actual_tokens:
+            self.scheduler.tokens.take(actual_tokens - self.estimate)
+            self.estimate = actual_tokens
+
+    def release(self):
+        if not self.released:
+            self.released = True
+            self.scheduler._release()
+
+class Scheduler:
+    def __init__(self, max_concurrency: int, rpm: float, tpm: float):
+        self.max_concurrency = max(1, max_concurrency)
+        self.requests = TokenBucket(rpm)
+        self.tokens = TokenBucket(tpm)
+        self.in_flight = 0
+        self.paused_until = 0.0
+        self.retry_budget = float(settings.AI_RETRY_BUDGET_MIN)
+        self._queues = {name: deque() for name in PRIORITIES}
+        self._timer = None
+
+    def queue_depth(self) -> dict:
+        return {name: len(queue) for name, queue in self._queues.items()}
+
+    def _publish_depth(self, name: str):
+        metrics.set_gauge("ai_queue_depth", len(self._queues[name]), priority=name)
+
+    def _next(self):
+        # Head of the highest non-empty class, unless some head has waited past the aging limit
+        heads = [queue[0] for queue in self._queues.values() if queue]
+        if not heads:
+            return None
+        oldest = min(heads, key=lambda w: w['enqueued'])
+        if time.monotonic() - oldest['enqueued'] > settings.AI_PRIORITY_MAX_WAIT_SECONDS:
+            return oldest
+        return heads[0]
+
+    def _dispatch(self):
+        while self.in_flight < self.max_concurrency:
+            waiter = self._next()
+            if waiter is None:
+                return
+            delay = max(self.paused_until - time.monotonic(), self.requests.wait_time(1), self.tokens.wait_time(waiter['tokens']))
+            if delay > 0:
+                self._wake_in(delay)
+                return
+            self._queues[waiter['priority']].popleft()
+            self._publish_depth(waiter['priority'])
+            self.requests.take(1)
+            self.tokens.take(waiter['tokens'])
+            self.in_flight += 1
+            metrics.set_gauge("ai_in_flight", self.in_flight)
+            waiter['future'].set_result(None)
+
+    def _wake_in(self, delay: float):
+        loop = asyncio.get_running_loop()
+        when = loop.time() + delay
+        if self._timer is not None and not self._timer.cancelled() and self._timer.when() <= when:
+            return
+        if self._timer is not None:
+            self._timer.cancel()
+        self._timer = loop.call_at(when, self._on_timer)
+
+    def _on_timer(self):
+        self._timer = None
+        self._dispatch()
+
+    def _release(self):
+        self.in_flight -= 1
+        metrics.set_gauge("ai_in_flight", self.in_flight)
+        self._dispatch()
+
+    async def acquire(self, tokens: int, priority_name: str = "standard") -> Ticket:
+        waiter = {
+            "future": asyncio.get_running_loop().create_future(),
+            "priority": priority_name,
+            "tokens": tokens,
+            "enqueued": time.monotonic(),
+        }
+        self._queues[priority_name].append(waiter)
+        self._publish_depth(priority_name)
+        self._dispatch()
+        try:
+            with metrics.span("ai.queue_wait", priority=priority_name):
+                await waiter['future']
+        except asyncio.CancelledError:
+            if waiter['future'].done() and not waiter['future'].cancelled():
+                self._release() # Admitted just as the caller gave up
+            else:
+                self._queues[priority_name].remove(waiter)
+                self._publish_depth(priority_name)
+                self._dispatch()
+            raise
+        metrics.observe("ai_queue_wait_seconds", time.monotonic() - waiter['enqueued'], priority=priority_name)
+        return Ticket(self, tokens)
+
+    @asynccontextmanager
+    async def slot(self, tokens: int, priority_name: str = "standard"):
+        ticket = await self.acquire(tokens, priority_name)
+        try:
+            yield ticket
+        finally:
+            ticket.release()
+
+    def pause(self, seconds: float):
+        self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+    def note_call(self):
+        self.retry_budget = min(settings.AI_RETRY_BUDGET_MAX, self.retry_budget + settings.AI_RETRY_BUDGET_RATIO)
+
+    def take_retry(self) -> bool:
+        if self.retry_budget < 1:
+            return False
+        self.retry_budget -= 1
+        return True
+
+    def stats(self) -> dict:
+        return {
+            "in_flight": self.in_flight,
+            "queued": self.queue_depth(),
+            "requests_available": round(self.requests.tokens, 1) if self.requests.capacity else None,
+            "tokens_available": round(self.tokens.tokens) if self.tokens.capacity else None,
+            "paused_for": round(max(0.0, self.paused_until - time.monotonic()), 2),
+            "retry_budget": round(self.retry_budget, 2),
+        }
+
+scheduler = Scheduler(settings.AI_MAX_CONCURRENCY, settings.AI_RPM_LIMIT, settings.AI_TPM_LIMIT)
+
+def backoff_delay(attempt: int) -> float:
+    # Full jitter: uniform over [0, base * 2^attempt], capped
+    return random.uniform(0, min(settings.AI_RETRY_MAX_DELAY_SECONDS, settings.AI_RETRY_BASE_DELAY_SECONDS * 2 ** attempt))
+
+async def with_retries(attempt_fn, operation: str):
+    # attempt_fn() makes one admitted call; retryable failures are retried within the budget
+    scheduler.note_call()
+    attempt = 0
+    while True:
+        try:
+            return await attempt_fn()
+        except Exception as e:
+            rate_limited, retryable = _error_classes()
+            if not isinstance(e, retryable):
+                raise
+            reason = "rate_limited" if isinstance(e, rate_limited) else "timeout" if isinstance(e, asyncio.TimeoutError) else "error"
+            if reason == "rate_limited":
+                metrics.inc("ai_rate_limited_total", operation=operation)
+            if attempt >= settings.AI_MAX_RETRIES:
+                raise
+            if not scheduler.take_retry():
+                metrics.inc("ai_retry_budget_exhausted_total", operation=operation)
+                raise
+            delay = backoff_delay(attempt)
+            if reason == "rate_limited":
+                scheduler.pause(delay)
+            metrics.inc("ai_retries_total", operation=operation, reason=reason)
+            print(f"AI {operation} attempt {attempt + 1} failed ({e!r}); retrying in {delay:.2f}s")
+            attempt += 1
+            await asyncio.sleep(delay)
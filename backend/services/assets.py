@@ -0,0 +1,201 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+from typing import Optional
+from config import settings
+from services import metrics
+
+# Content-addressed store for slide images. Blobs are saved once per content hash
+# under ASSET_DIR/blobs and a small SQLite index maps source URLs to them, so every
+# export of a project (in any worker process) reads images from disk instead of
+# re-downloading them, and keeps working after upstream URLs expire.
+
+_session = None
+
+def _get_session():
+    # One keep-alive pool shared by every download on this worker. requests and
+    # Pillow are imported on first use, so importing the store stays cheap for the API.
+    global _session
+    if _session is None:
+        import requests
+        from requests.adapters import HTTPAdapter
+        _session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=settings.EXPORT_IMAGE_WORKERS, pool_maxsize=settings.EXPORT_IMAGE_WORKERS)
+        _session.mount("http://", adapter)
+        _session.mount("https://", adapter)
+    return _session
+
+@metrics.timed("export.image_download")
+def fetch_image(url: str):
+    # Returns the image bytes, or None on error, timeout or when the body exceeds EXPORT_IMAGE_MAX_BYTES
+    try:
+        with _get_session().get(url, stream=True, timeout=settings.EXPORT_IMAGE_TIMEOUT_SECONDS) as response:
+            response.raise_for_status()
+            declared = response.headers.get("Content-Length")
+            if declared and int(declared) > settings.EXPORT_IMAGE_MAX_BYTES:
+                print(f"Image too large ({declared} bytes): {url}")
+                return None
+            data = bytearray()
+            for chunk in response.iter_content(chunk_size=64 * 1024):
+                data.extend(chunk)
+                if len(data) > settings.EXPORT_IMAGE_MAX_BYTES:
+                    print(f"Image too large (>{settings.EXPORT_IMAGE_MAX_BYTES} bytes): {url}")
+                    return None
+            return bytes(data)
+    except Exception as e:
+        print(f"Error downloading image: {e}")
+        return None
+
+def downscale(data: bytes, max_dimension: int) -> bytes:
+    # Shrinks images larger than a slide needs; anything Pillow can't read is kept as-is
+    try:
+        from PIL import Image
+        image = Image.open(BytesIO(data))
+        if max(image.size) <= max_dimension:
+            return data
+        image_format = image.format or "PNG"
+        image.thumbnail((max_dimension, max_dimension))
+        if image_format == "JPEG" and image.mode not in ("RGB", "L"):
+            image = image.convert("RGB")
+        out = BytesIO()
+        image.save(out, format=image_format, **({"quality": 85} if image_format == "JPEG" else {}))
+        return out.getvalue()
+    except Exception as e:
+        print(f"Could not downscale image: {e}")
+        return data
+
+def _url_key(url: str) -> str:
+    return hashlib.sha256(url.encode("utf-8")).hexdigest()
+
+class AssetStore:
+    def __init__(self, root: str, max_bytes: int, max_dimension: int = 0):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.max_dimension = max_dimension
+        self.blob_dir = os.path.join(root, "blobs")
+        os.makedirs(self.blob_dir, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(os.path.join(root, "index.db"), check_same_thread=False, isolation_level=None, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS assets (
+                url_key TEXT PRIMARY KEY,
+                url TEXT NOT NULL,
+                content_hash TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                accessed_at REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS assets_accessed ON assets (accessed_at);
+        """)
+        self.hits = 0
+        self.misses = 0
+
+    def _blob_path(self, content_hash: str) -> str:
+        return os.path.join(self.blob_dir, content_hash)
+
+    def get(self, url: str) -> Optional[bytes]:
+        key = _url_key(url)
+        with self._lock:
+            row = self._conn.execute("SELECT content_hash FROM assets WHERE url_key = ?", (key,)).fetchone()
+            if row is not None:
+                self._conn.execute("UPDATE assets SET accessed_at = ? WHERE url_key = ?", (time.time(), key))
+        if row is not None:
+            try:
+                with open(self._blob_path(row[0]), "rb") as f:
+                    self.hits += 1
+                    metrics.cache_result("asset", True)
+                    return f.read()
+            except FileNotFoundError:
+                with self._lock:
+                    self._conn.execute("DELETE FROM assets WHERE url_key = ?", (key,))
+        self.misses += 1
+        metrics.cache_result("asset", False)
+        return None
+
+    def content_hash(self, url: str) -> Optional[str]:
+        # Hash of the stored bytes for a URL, without reading the blob
+        with self._lock:
+            row = self._conn.execute("SELECT content_hash FROM assets WHERE url_key = ?", (_url_key(url),)).fetchone()
+        return row[0] if row else None
+
+    def put(self, url: str, data: bytes) -> bytes:
+        if self.max_dimension:
+            data = downscale(data, self.max_dimension)
+        content_hash = hashlib.sha256(data).hexdigest()
+        path = self._blob_path(content_hash)
+        if not os.path.exists(path):
+            tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO assets (url_key, url, content_hash, size, accessed_at) VALUES (?, ?, ?, ?, ?)",
+                (_url_key(url), url, content_hash, len(data), time.time())
+            )
+            self._evict()
+        return data
+
+    def _evict(self):
+        # Least recently used URLs go first; a blob is deleted once no URL points at it
+        total = self._conn.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM (SELECT DISTINCT content_hash, size FROM assets)"
+        ).fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        rows = self._conn.execute("SELECT url_key, content_hash, size FROM assets ORDER BY accessed_at").fetchall()
+        for url_key, content_hash, size in rows:
+            if total <= self.max_bytes:
+                break
+            self._conn.execute("DELETE FROM assets WHERE url_key = ?", (url_key,))
+            still_used = self._conn.execute(
+                "SELECT 1 FROM assets WHERE content_hash = ? LIMIT 1", (content_hash,)
+            ).fetchone()
+            if not still_used:
+                try:
+                    os.remove(self._blob_path(content_hash))
+                except FileNotFoundError:
+                    pass
+                total -= size
+
+    def get_or_fetch(self, url: str) -> Optional[bytes]:
+        data = self.get(url)
+        if data is not None:
+            return data
+        data = fetch_image(url)
+        if data is None:
+            return None
+        return self.put(url, data)
+
+    def stats(self) -> dict:
+        with self._lock:
+            count = self._conn.execute("SELECT COUNT(*) FROM assets").fetchone()[0]
+            total = self._conn.execute(
+                "SELECT COALESCE(SUM(size), 0) FROM (SELECT DISTINCT content_hash, size FROM assets)"
+            ).fetchone()[0]
+        return {"hits": self.hits, "misses": self.misses, "urls": count, "bytes": total, "max_bytes": self.max_bytes}
+
+_store = None
+
+def get_asset_store() -> AssetStore:
+    global _store
+    if _store is None:
+        _store = AssetStore(settings.ASSET_DIR, settings.ASSET_CACHE_MAX_BYTES, settings.ASSET_MAX_DIMENSION)
+    return _store
+
+@metrics.timed("export.images")
+def prefetch_images(urls) -> dict:
+    # Resolves every distinct URL before slide assembly: url -> bytes or None. Images
+    # already in the asset store are read from disk; the rest are downloaded concurrently.
+    # Lives here rather than in services/export.py so the API can warm the store
+    # without importing python-docx/python-pptx.
+    unique = list(dict.fromkeys(u for u in urls if u))
+    if not unique:
+        return {}
+    store = get_asset_store()
+    with ThreadPoolExecutor(max_workers=min(settings.EXPORT_IMAGE_WORKERS, len(unique))) as pool:
+        return dict(zip(unique, pool.map(store.get_or_fetch, unique)))
@@ -0,0 +1,152 @@
+import hashlib
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+# Prompt/response cache for services/ai.py. An in-process LRU sits in front of an
+# optional SQLite tier so entries survive restarts and are shared between workers.
+
+def make_key(model_name: str, prompt: str) -> str:
+    normalized = re.sub(r'\s+', ' ', prompt).strip()
+    return hashlib.sha256(f"{model_name}\n{normalized}".encode("utf-8")).hexdigest()
+
+class LRUCache:
+    def __init__(self, max_entries: int, ttl_seconds: float):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict() # key -> (expires_at, value)
+        self._lock = threading.Lock()
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.time():
+                del self._entries[key]
+                self.expirations += 1
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: str, expires_at: float = None):
+        with self._lock:
+            self._entries[key] = (expires_at or time.time() + self.ttl_seconds, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+class SQLiteCache:
+    def __init__(self, path: str, max_entries: int, ttl_seconds: float):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed_at)")
+        self.evictions = 0
+
+    def get(self, key: str):
+        # Returns (value, expires_at) so the memory tier can be filled without extending the TTL
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, expires_at FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            if row[1] < now:
+                self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                return None
+            self._conn.execute("UPDATE responses SET accessed_at = ? WHERE key = ?", (now, key))
+            return row
+
+    def set(self, key: str, value: str, expires_at: float):
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, value, expires_at, accessed_at) VALUES (?, ?, ?, ?)",
+                (key, value, expires_at, now)
+            )
+            count = self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+            if count > self.max_entries:
+                self._conn.execute(
+                    "DELETE FROM responses WHERE key IN "
+                    "(SELECT key FROM responses ORDER BY accessed_at LIMIT ?)",
+                    (count - self.max_entries,)
+                )
+                self.evictions += count - self.max_entries
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM responses")
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+
+class ResponseCache:
+    def __init__(self, max_entries: int = 1024, ttl_seconds: float = 86400, sqlite_path: str = None, sqlite_max_entries: int = 50000):
+        self.ttl_seconds = ttl_seconds
+        self.memory = LRUCache(max_entries, ttl_seconds)
+        self.disk = SQLiteCache(sqlite_path, sqlite_max_entries, ttl_seconds) if sqlite_path else None
+        self.hits = 0
+        self.misses = 0
+        self.disk_hits = 0
+
+    def get(self, key: str) -> Optional[str]:
+        value = self.memory.get(key)
+        if value is None and self.disk is not None:
+            row = self.disk.get(key)
+            if row is not None:
+                value, expires_at = row
+                self.memory.set(key, value, expires_at)
+                self.disk_hits += 1
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    def set(self, key: str, value: str):
+        expires_at = time.time() + self.ttl_seconds
+        self.memory.set(key, value, expires_at)
+        if self.disk is not None:
+            self.disk.set(key, value, expires_at)
+
+    def clear(self):
+        self.memory.clear()
+        if self.disk is not None:
+            self.disk.clear()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+            "disk_hits": self.disk_hits,
+            "memory_entries": len(self.memory),
+            "memory_evictions": self.memory.evictions,
+            "memory_expirations": self.memory.expirations,
+            "disk_entries": len(self.disk) if self.disk is not None else None,
+            "disk_evictions": self.disk.evictions if self.disk is not None else None,
+        }
@@ -0,0 +1,107 @@
+import asyncio
+import time
+from config import settings
+from services.ai import generate_content
+from services.repository import get_async_repository
+from services import metrics, ai_scheduler, project_context
+
+# Background content fill for newly created projects. create_project returns the
+# outline right away and start_fill() drafts every empty section/slide with up to
+# FILL_MAX_PARALLEL generations in flight, saving each item as soon as it is done.
+# Progress can be polled (fill_status) or followed as events (subscribe). Jobs live
+# in this worker's memory; the saved items are the durable record.
+
+_jobs = {} # project_id -> job dict
+
+def _expire_jobs():
+    cutoff = time.time() - settings.FILL_JOB_TTL_SECONDS
+    for project_id in [p for p, job in _jobs.items() if job['finished_at'] and job['finished_at'] < cutoff]:
+        del _jobs[project_id]
+
+def _publish(job: dict, event: str, data: dict):
+    for queue in job['subscribers']:
+        queue.put_nowait((event, data))
+
+async def _fill_item(job: dict, project_data: dict, item: dict, semaphore: asyncio.Semaphore, context):
+    async with semaphore:
+        job['items'][item['id']] = "running"
+        try:
+            # fallback=False: a failed generation is left empty and counted, never saved as placeholder text
+            content = await generate_content(project_data['topic'], item['title'], project_data['type'], context=context, fallback=False)
+        except Exception:
+            job['items'][item['id']] = "failed"
+            job['failed'] += 1
+            _publish(job, "item", {"item_id": item['id'], "error": "Content generation failed", "completed": job['completed'], "total": job['total']})
+            return
+    await get_async_repository().update_item(project_data['id'], item['id'], {"content": content})
+    job['items'][item['id']] = "done"
+    job['completed'] += 1
+    _publish(job, "item", {"item_id": item['id'], "content": content, "completed": job['completed'], "total": job['total']})
+
+async def _run(job: dict, project_data: dict, items: list):
+    semaphore = asyncio.Semaphore(max(1, settings.FILL_MAX_PARALLEL))
+    context = project_context.build(project_data) # Outline, description and style guide, shared by every item
+    try:
+        with metrics.span("fill.project"), ai_scheduler.priority("bulk"):
+            results = await asyncio.gather(*(_fill_item(job, project_data, item, semaphore, context) for item in items), return_exceptions=True)
+        for item, result in zip(items, results):
+            if isinstance(result, Exception):
+                print(f"Fill failed for item {item['id']}: {result}")
+                job['items'][item['id']] = "failed"
+                job['failed'] += 1
+        job['status'] = "done" if not job['failed'] else "partial"
+    except asyncio.CancelledError:
+        job['status'] = "cancelled"
+        raise
+    finally:
+        job['finished_at'] = time.time()
+        job.pop('task', None)
+        _publish(job, "done", fill_status(job))
+
+def start_fill(project_data: dict) -> dict:
+    _expire_jobs()
+    items = [item for item in project_data['items'] if item['type'] in ("section", "slide") and not item.get('content')]
+    job = {
+        "project_id": project_data['id'],
+        "user_id": project_data['user_id'],
+        "status": "running",
+        "total": len(items),
+        "completed": 0,
+        "failed": 0,
+        "items": {item['id']: "queued" for item in items},
+        "started_at": time.time(),
+        "finished_at": None,
+        "subscribers": [],
+    }
+    _jobs[project_data['id']] = job
+    job['task'] = asyncio.create_task(_run(job, project_data, items))
+    return job
+
+def get_fill(project_id: str):
+    _expire_jobs()
+    return _jobs.get(project_id)
+
+def fill_status(job: dict) -> dict:
+    return {k: job[k] for k in ("project_id", "status", "total", "completed", "failed", "items", "started_at", "finished_at")}
+
+async def subscribe(job: dict):
+    # Yields (event, data): a "status" snapshot first, then "item" per finished item and a final "done"
+    queue = asyncio.Queue()
+    job['subscribers'].append(queue)
+    try:
+        yield "status", fill_status(job)
+        if job['finished_at']:
+            return
+        while True:
+            event, data = await queue.get()
+            yield event, data
+            if event == "done":
+                return
+    finally:
+        job['subscribers'].remove(queue)
+
+def shutdown():
+    for job in _jobs.values():
+        task = job.get('task')
+        if task:
+            task.cancel()
@@ -1,198 +1,148 @@
 from docx import Document
-from docx.shared import Pt
+from docx.shared import Pt, Inches
 from pptx import Presentation
 from pptx.util import Pt as PptPt
 from pptx.chart.data import CategoryChartData
 from pptx.enum.chart import XL_CHART_TYPE
 from io import BytesIO
-import re
-import requests
+from services.assets import prefetch_images
+from services import export_fragments as fragments
+from services import metrics, markdown_ir
 
-# ... (parse_markdown_to_docx and export_to_docx remain same)
+def _add_chart(shapes, chart_data_json: dict, x, y, cx, cy):
+    chart_data = CategoryChartData()
+    chart_data.categories = chart_data_json.get('categories', [])
+    for series in chart_data_json.get('series', []):
+        chart_data.add_series(series['name'], series['values'])
 
-def export_to_pptx(project_data: dict) -> BytesIO:
-    prs = Presentation()
-    
-    # Title Slide
-    title_slide_layout = prs.slide_layouts[0]
-    slide = prs.slides.add_slide(title_slide_layout)
-    title = slide.shapes.title
-    subtitle = slide.placeholders[1]
-    
-    title.text = project_data['title']
-    subtitle.text = project_data.get('topic', '')
+    chart_type = XL_CHART_TYPE.COLUMN_CLUSTERED
+    if chart_data_json.get('type') == 'pie':
+        chart_type = XL_CHART_TYPE.PIE
+    elif chart_data_json.get('type') == 'line':
+        chart_type = XL_CHART_TYPE.LINE
 
-    # Content Slides
+    return shapes.add_chart(chart_type, x, y, cx, cy, chart_data)
+
+def _render_slide(prs, item: dict, images: dict):
     bullet_slide_layout = prs.slide_layouts[1]
     title_only_layout = prs.slide_layouts[5] # Good for charts/images
-    
-    for item in sorted(project_data['items'], key=lambda x: x['order']):
-        if item.get('type') == 'chart':
-            slide = prs.slides.add_slide(title_only_layout)
-            title = slide.shapes.title
-            title.text = item['title']
-            
-            chart_data_json = item.get('chart_data')
-            if chart_data_json:
-                chart_data = CategoryChartData()
-                chart_data.categories = chart_data_json.get('categories', [])
-                for series in chart_data_json.get('series', []):
-                    chart_data.add_series(series['name'], series['values'])
-                
-                x, y, cx, cy = PptPt(50), PptPt(100), PptPt(600), PptPt(400)
-                chart_type = XL_CHART_TYPE.COLUMN_CLUSTERED
-                if chart_data_json.get('type') == 'pie':
-                    chart_type = XL_CHART_TYPE.PIE
-                elif chart_data_json.get('type') == 'line':
-                    chart_type = XL_CHART_TYPE.LINE
-                
-                slide.shapes.add_chart(chart_type, x, y, cx, cy, chart_data)
-                
-        elif item.get('type') == 'image_prompt':
-            slide = prs.slides.add_slide(title_only_layout)
-            title = slide.shapes.title
-            title.text = item['title']
-            
-            image_url = item.get('image_url')
-            if image_url:
-                try:
-                    response = requests.get(image_url)
-                    image_stream = BytesIO(response.content)
-                    
-                    left = PptPt(100)
-                    top = PptPt(100)
-                    width = PptPt(500)
-                    # height will be auto-calculated to preserve aspect ratio if not specified, 
-                    # but let's set a max height or width
-                    
-                    slide.shapes.add_picture(image_stream, left, top, width=width)
-                except Exception as e:
-                    print(f"Error downloading image: {e}")
-                    # Fallback to text placeholder
-                    left = top = width = height = PptPt(100)
-                    txBox = slide.shapes.add_textbox(left, top, PptPt(500), PptPt(300))
-                    tf = txBox.text_frame
-                    tf.text = f"[IMAGE DOWNLOAD FAILED]\n\nPrompt: {item.get('image_prompt')}"
-            else:
-                # Fallback to placeholder if no URL
+
+    if item.get('type') == 'chart':
+        slide = prs.slides.add_slide(title_only_layout)
+        title = slide.shapes.title
+        title.text = item['title']
+
+        chart_data_json = item.get('chart_data')
+        if chart_data_json:
+            _add_chart(slide.shapes, chart_data_json, PptPt(50), PptPt(100), PptPt(600), PptPt(400))
+
+    elif item.get('type') == 'image_prompt':
+        slide = prs.slides.add_slide(title_only_layout)
+        title = slide.shapes.title
+        title.text = item['title']
+
+        image_url = item.get('image_url')
+        if image_url:
+            try:
+                image_bytes = images.get(image_url)
+                if image_bytes is None:
+                    raise ValueError(f"no image data for {image_url}")
+                image_stream = BytesIO(image_bytes)
+
+                left = PptPt(100)
+                top = PptPt(100)
+                width = PptPt(500)
+                # height will be auto-calculated to preserve aspect ratio if not specified, 
+                # but let's set a max height or width
+
+                slide.shapes.add_picture(image_stream, left, top, width=width)
+            except Exception as e:
+                print(f"Error downloading image: {e}")
+                # Fallback to text placeholder
                 left = top = width = height = PptPt(100)
                 txBox = slide.shapes.add_textbox(left, top, PptPt(500), PptPt(300))
                 tf = txBox.text_frame
-                tf.text = f"[IMAGE PLACEHOLDER]\n\nPrompt: {item.get('image_prompt')}"
-            
+                tf.text = f"[IMAGE DOWNLOAD FAILED]\n\nPrompt: {item.get('image_prompt')}"
         else:
-            # Standard Slide (Text + Optional Image)
-            image_url = item.get('image_url')
-            
+            # Fallback to placeholder if no URL
+            left = top = width = height = PptPt(100)
+            txBox = slide.shapes.add_textbox(left, top, PptPt(500), PptPt(300))
+            tf = txBox.text_frame
+            tf.text = f"[IMAGE PLACEHOLDER]\n\nPrompt: {item.get('image_prompt')}"
+
+    else:
+        # Standard Slide (Text + Optional Chart and/or Image)
+        image_url = item.get('image_url')
+        chart_data_json = item.get('chart_data')
+
+        if image_url or chart_data_json:
+            # Use Two Content Layout (Index 3)
+            two_content_layout = prs.slide_layouts[3] 
+            slide = prs.slides.add_slide(two_content_layout)
+            shapes = slide.shapes
+            title_shape = shapes.title
+            title_shape.text = item['title']
+
+            # Left side: Text
+            left_body = shapes.placeholders[1]
+            tf = left_body.text_frame
+            tf.clear()
+            parse_markdown_to_pptx(tf, item['content'])
+
+            # Right side: chart and image, stacked when the item has both. The layout's
+            # right placeholder is a text body, so shapes go inside its bounds and it is dropped
+            right_body = shapes.placeholders[2]
+            left, top, width, height = right_body.left, right_body.top, right_body.width, right_body.height
+            right_body._element.getparent().remove(right_body._element)
+            if chart_data_json and image_url:
+                height //= 2
+            if chart_data_json:
+                _add_chart(shapes, chart_data_json, left, top, width, height)
+                top += height
             if image_url:
-                # Use Two Content Layout (Index 3)
-                two_content_layout = prs.slide_layouts[3] 
-                slide = prs.slides.add_slide(two_content_layout)
-                shapes = slide.shapes
-                title_shape = shapes.title
-                title_shape.text = item['title']
-                
-                # Left side: Text
-                left_body = shapes.placeholders[1]
-                tf = left_body.text_frame
-                tf.clear()
-                parse_markdown_to_pptx(tf, item['content'])
-                
-                # Right side: Image
-                right_body = shapes.placeholders[2]
                 try:
-                    response = requests.get(image_url)
-                    image_stream = BytesIO(response.content)
-                    right_body.insert_picture(image_stream)
+                    image_bytes = images.get(image_url)
+                    if image_bytes is None:
+                        raise ValueError(f"no image data for {image_url}")
+                    # Keep the aspect ratio, centred in the area
+                    picture = shapes.add_picture(BytesIO(image_bytes), left, top)
+                    scale = min(width / picture.width, height / picture.height)
+                    picture.width = int(picture.width * scale)
+                    picture.height = int(picture.height * scale)
+                    picture.left = left + (width - picture.width) // 2
+                    picture.top = top + (height - picture.height) // 2
                 except Exception as e:
                     print(f"Error downloading image for slide: {e}")
-                    right_body.text = f"[IMAGE FAILED]\n{item.get('image_prompt', '')}"
-            else:
-                # Standard Bullet Layout
-                slide = prs.slides.add_slide(bullet_slide_layout)
-                shapes = slide.shapes
-                title_shape = shapes.title
-                body_shape = shapes.placeholders[1]
-                
-                title_shape.text = item['title']
-                tf = body_shape.text_frame
-                tf.clear()
-                parse_markdown_to_pptx(tf, item['content'])
+                    shapes.add_textbox(left, top, width, height).text_frame.text = f"[IMAGE FAILED]\n{item.get('image_prompt', '')}"
+        else:
+            # Standard Bullet Layout
+            slide = prs.slides.add_slide(bullet_slide_layout)
+            shapes = slide.shapes
+            title_shape = shapes.title
+            body_shape = shapes.placeholders[1]
 
-    buffer = BytesIO()
-    prs.save(buffer)
-    buffer.seek(0)
-    return buffer
+            title_shape.text = item['title']
+            tf = body_shape.text_frame
+            tf.clear()
+            parse_markdown_to_pptx(tf, item['content'])
 
-def parse_markdown_to_docx(doc, text):
-    lines = text.split('\n')
-    for line in lines:
-        line = line.strip()
-        if not line:
-            continue
-            
-        if line.startswith('# '):
-            doc.add_heading(line[2:], level=1)
-        elif line.startswith('## '):
-            doc.add_heading(line[3:], level=2)
-        elif line.startswith('### '):
-            doc.add_heading(line[4:], level=3)
-        elif line.startswith('- ') or line.startswith('* '):
-            p = doc.add_paragraph(line[2:], style='List Bullet')
-        else:
-            p = doc.add_paragraph()
-            # Simple bold parsing **text**
-            parts = re.split(r'(\*\*.*?\*\*)', line)
-            for part in parts:
-                if part.startswith('**') and part.endswith('**'):
-                    run = p.add_run(part[2:-2])
-                    run.bold = True
-                else:
-                    p.add_run(part)
-
-def export_to_docx(project_data: dict) -> BytesIO:
-    doc = Document()
-    doc.add_heading(project_data['title'], 0)
-    
-    for item in sorted(project_data['items'], key=lambda x: x['order']):
-        doc.add_heading(item['title'], level=1)
-        parse_markdown_to_docx(doc, item['content'])
-        
+    return slide
+
+def _save(document, out):
+    # Writes into `out` (an open binary file) when given, so callers can spool straight
+    # to disk; otherwise returns an in-memory buffer as before
+    if out is not None:
+        document.save(out)
+        return out
     buffer = BytesIO()
-    doc.save(buffer)
+    document.save(buffer)
     buffer.seek(0)
     return buffer
 
-def parse_markdown_to_pptx(text_frame, text):
-    lines = text.split('\n')
-    for line in lines:
-        line = line.strip()
-        if not line:
-            continue
-            
-        p = text_frame.add_paragraph()
-        
-        # Handle bullets
-        clean_line = line
-        if line.startswith('- ') or line.startswith('* '):
-            clean_line = line[2:]
-            p.level = 0 # Top level bullet
-        elif line.startswith('  - ') or line.startswith('  * '):
-            clean_line = line[4:]
-            p.level = 1
-            
-        # Simple bold parsing
-        parts = re.split(r'(\*\*.*?\*\*)', clean_line)
-        for part in parts:
-            if part.startswith('**') and part.endswith('**'):
-                run = p.add_run()
-                run.text = part[2:-2]
-                run.font.bold = True
-            else:
-                run = p.add_run()
-                run.text = part
+def export_to_pptx(project_data: dict, images: dict = None, out=None):
+    if images is None:
+        images = prefetch_images(item.get('image_url') for item in project_data['items'])
 
-def export_to_pptx(project_data: dict) -> BytesIO:
     prs = Presentation()
     
     # Title Slide
@@ -204,22 +154,78 @@ def export_to_pptx(project_data: dict) -> BytesIO:
     title.text = project_data['title']
     subtitle.text = project_data.get('topic', '')
 
-    # Content Slides
-    bullet_slide_layout = prs.slide_layouts[1]
+    # Content Slides: unchanged items reuse their rendered fragment, only dirty ones are rebuilt
+    with metrics.span("export.build", format="pptx"):
+        for item in sorted(project_data['items'], key=lambda x: x['order']):
+            key = fragments.slide_key(item, images)
+            fragment = fragments.cache.get(key)
+            if fragment is not None:
+                fragments.apply_slide(prs, fragment, item, images)
+            else:
+                slide = _render_slide(prs, item, images)
+                fragments.cache.put(key, fragments.capture_slide(prs, slide))
+
+    with metrics.span("export.save", format="pptx"):
+        return _save(prs, out)
+
+# Both renderers consume the blocks from services/markdown_ir.py
+
+_DOCX_BULLET_STYLES = ("List Bullet", "List Bullet 2", "List Bullet 3")
+
+def _add_docx_runs(paragraph, runs):
+    for run in runs:
+        r = paragraph.add_run(run.text)
+        r.bold = run.bold or None
+        r.italic = run.italic or None
+
+def parse_markdown_to_docx(doc, text):
+    for block in markdown_ir.compile_markdown(text):
+        if block.kind == "heading":
+            p = doc.add_heading(level=block.level)
+        elif block.kind == "bullet":
+            p = doc.add_paragraph(style=_DOCX_BULLET_STYLES[min(block.level, len(_DOCX_BULLET_STYLES) - 1)])
+        elif block.kind == "numbered":
+            # The author's numbers are kept as text: Word's List Number style would
+            # continue one sequence across every list in the document
+            p = doc.add_paragraph()
+            p.paragraph_format.left_indent = Inches(0.25 * (block.level + 1))
+            p.add_run(f"{block.number}. ")
+        else:
+            p = doc.add_paragraph()
+        _add_docx_runs(p, block.runs)
+
+def export_to_docx(project_data: dict, out=None):
+    doc = Document()
+    doc.add_heading(project_data['title'], 0)
     
-    for item in sorted(project_data['items'], key=lambda x: x['order']):
-        slide = prs.slides.add_slide(bullet_slide_layout)
-        shapes = slide.shapes
-        title_shape = shapes.title
-        body_shape = shapes.placeholders[1]
-        
-        title_shape.text = item['title']
-        tf = body_shape.text_frame
-        tf.clear() # Clear default placeholder text
-        
-        parse_markdown_to_pptx(tf, item['content'])
+    with metrics.span("export.build", format="docx"):
+        for item in sorted(project_data['items'], key=lambda x: x['order']):
+            key = fragments.docx_key(item)
+            fragment = fragments.cache.get(key)
+            if fragment is not None:
+                fragments.apply_docx(doc, fragment)
+            else:
+                start = fragments.docx_mark(doc)
+                doc.add_heading(item['title'], level=1)
+                parse_markdown_to_docx(doc, item['content'])
+                fragments.cache.put(key, fragments.capture_docx(doc, start))
 
-    buffer = BytesIO()
-    prs.save(buffer)
-    buffer.seek(0)
-    return buffer
+    with metrics.span("export.save", format="docx"):
+        return _save(doc, out)
+
+def parse_markdown_to_pptx(text_frame, text):
+    # Each block is one paragraph; list nesting maps to paragraph levels and headings are bold
+    first = text_frame.paragraphs[0] if len(text_frame.paragraphs) == 1 and not text_frame.paragraphs[0].runs else None
+    for block in markdown_ir.compile_markdown(text):
+        p = first or text_frame.add_paragraph()
+        first = None
+        p.level = block.level if block.kind in ("bullet", "numbered") else 0
+        if block.kind == "numbered":
+            p.add_run().text = f"{block.number}. "
+        for run in block.runs:
+            r = p.add_run()
+            r.text = run.text
+            if run.bold or block.kind == "heading":
+                r.font.bold = True
+            if run.italic:
+                r.font.italic = True
@@ -0,0 +1,122 @@
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+import uuid
+from typing import Optional
+from config import settings
+
+# On-disk cache of rendered exports keyed by project revision: a hash of everything
+# the renderers read (type, title, topic and items, image URLs included). Any item
+# change yields a new revision, so stale files are never served; the project's previous
+# file is removed when a new one is stored, and the whole directory is kept under
+# EXPORT_CACHE_MAX_BYTES by evicting the least recently served files.
+
+# Bump when renderer output changes so old cached files stop matching
+RENDER_VERSION = "3"
+
+# Partial files older than this are leftovers from cancelled or crashed renders
+STALE_TMP_SECONDS = 3600
+
+# Files kept for export jobs (see keep()); not cache entries, so never evicted or replaced
+KEPT_PREFIX = "job-"
+
+_lock = threading.Lock()
+
+def revision(project_data: dict) -> str:
+    # Only from the project's own fields: the render stores images in the asset store, so
+    # anything read from there would differ between the first export and later ones. A URL
+    # identifies its image well enough, as the store keeps serving the bytes first fetched for it.
+    items = sorted(project_data['items'], key=lambda x: x['order'])
+    payload = {
+        "version": RENDER_VERSION,
+        "type": project_data['type'],
+        "title": project_data['title'],
+        "topic": project_data.get('topic', ''),
+        "items": items,
+    }
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+def _path(project_id: str, key: str) -> str:
+    return os.path.join(settings.EXPORT_CACHE_DIR, f"{project_id}.{key}")
+
+def get(project_id: str, key: str) -> Optional[str]:
+    path = _path(project_id, key)
+    try:
+        os.utime(path) # mtime doubles as last-served time for LRU eviction
+        return path
+    except FileNotFoundError:
+        return None
+
+def temp_path(project_id: str, key: str) -> str:
+    # Where a renderer should write; commit() moves it into place once complete
+    os.makedirs(settings.EXPORT_CACHE_DIR, exist_ok=True)
+    return f"{_path(project_id, key)}.{uuid.uuid4().hex}.tmp"
+
+def commit(project_id: str, key: str, tmp_path: str) -> str:
+    path = _path(project_id, key)
+    os.replace(tmp_path, path)
+    with _lock:
+        _drop_older_revisions(project_id, key)
+        _evict()
+    return path
+
+def keep(path: str, name: str) -> str:
+    # A second name for a rendered file that the next revision or eviction won't delete: an
+    # export job's download must keep working until the job expires, whatever happens to the
+    # project meanwhile. A hard link costs no space; remove it with discard() when done.
+    kept = os.path.join(settings.EXPORT_CACHE_DIR, f"{KEPT_PREFIX}{name}")
+    try:
+        os.link(path, kept)
+    except FileExistsError:
+        pass
+    except OSError:
+        shutil.copyfile(path, kept) # Filesystems without hard links
+    return kept
+
+def discard(tmp_path: str):
+    try:
+        os.remove(tmp_path)
+    except FileNotFoundError:
+        pass
+
+def _drop_older_revisions(project_id: str, keep_key: str):
+    prefix = f"{project_id}."
+    for name in os.listdir(settings.EXPORT_CACHE_DIR):
+        if name.startswith(prefix) and not name.endswith(".tmp") and name != f"{project_id}.{keep_key}":
+            try:
+                os.remove(os.path.join(settings.EXPORT_CACHE_DIR, name))
+            except FileNotFoundError:
+                pass
+
+def _evict():
+    entries = []
+    stale_before = time.time() - STALE_TMP_SECONDS
+    for name in os.listdir(settings.EXPORT_CACHE_DIR):
+        path = os.path.join(settings.EXPORT_CACHE_DIR, name)
+        try:
+            st = os.stat(path)
+        except FileNotFoundError:
+            continue
+        if name.endswith(".tmp"):
+            # A cancelled request can't stop its worker process, which may still finish writing here
+            if st.st_mtime < stale_before:
+                discard(path)
+            continue
+        if name.startswith(KEPT_PREFIX):
+            # Released when their job expires; these are leftovers from a restarted process
+            if st.st_ctime < stale_before - settings.EXPORT_JOB_TTL_SECONDS:
+                discard(path)
+            continue
+        entries.append((st.st_mtime, st.st_size, path))
+    total = sum(size for _, size, _ in entries)
+    for _, size, path in sorted(entries):
+        if total <= settings.EXPORT_CACHE_MAX_BYTES:
+            break
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        total -= size
@@ -0,0 +1,140 @@
+import hashlib
+import json
+import re
+import threading
+from collections import OrderedDict
+from io import BytesIO
+from lxml import etree
+from pptx.opc.constants import CONTENT_TYPE as CT, RELATIONSHIP_TYPE as RT
+from pptx.oxml import parse_xml as parse_pptx_xml
+from pptx.parts.chart import ChartPart
+from docx.oxml import parse_xml as parse_docx_xml
+from config import settings
+from services.export_cache import RENDER_VERSION
+from services import metrics
+
+# Per-item rendered fragments for incremental export. The first time an item is
+# rendered, the XML it produced (a slide's shape tree plus its chart/image parts,
+# or a DOCX item's body blocks) is captured under a hash of the item's content.
+# Later exports splice cached fragments straight into the new package and only
+# run python-pptx/python-docx for items whose hash changed. Fragments live in the
+# export worker process, so each pool process keeps its own bounded LRU.
+
+class FragmentCache:
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str):
+        with self._lock:
+            fragment = self._entries.get(key)
+            if fragment is None:
+                self.misses += 1
+            else:
+                self._entries.move_to_end(key)
+                self.hits += 1
+        metrics.cache_result("export_fragment", fragment is not None)
+        return fragment
+
+    def put(self, key: str, fragment):
+        if fragment is None:
+            return
+        with self._lock:
+            self._entries[key] = fragment
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+cache = FragmentCache(settings.EXPORT_FRAGMENT_CACHE_SIZE)
+
+def _hash(kind: str, payload: dict) -> str:
+    data = json.dumps({"kind": kind, "version": RENDER_VERSION, **payload}, sort_keys=True, default=str)
+    return hashlib.sha256(data.encode("utf-8")).hexdigest()
+
+# --- PPTX ---
+
+def slide_key(item: dict, images: dict) -> str:
+    image_url = item.get('image_url')
+    image_bytes = images.get(image_url) if image_url else None
+    return _hash("slide", {
+        "title": item['title'],
+        "content": item.get('content'),
+        "type": item.get('type'),
+        "chart_data": item.get('chart_data'),
+        "image_prompt": item.get('image_prompt'),
+        "image_url": image_url,
+        "image": hashlib.sha256(image_bytes).hexdigest() if image_bytes else None,
+    })
+
+_REL_ID = re.compile(rb'="(rId\d+)"')
+
+def _capture_chart(chart_part):
+    # The chart XML points at its embedded workbook by rId; drop that link so the
+    # workbook can be re-related to the new chart part when the fragment is applied
+    chart_space = parse_pptx_xml(chart_part.blob)
+    for external_data in chart_space.xpath("c:externalData"):
+        chart_space.remove(external_data)
+    return etree.tostring(chart_space), chart_part.chart_workbook.xlsx_part.blob
+
+def capture_slide(prs, slide) -> dict:
+    # Returns None (don't cache) if the slide relates to a part we don't know how to rebuild
+    rels = {}
+    for rId, rel in slide.part.rels.items():
+        if rel.reltype == RT.SLIDE_LAYOUT:
+            continue
+        if rel.reltype == RT.IMAGE:
+            rels[rId.encode()] = ("image",)
+        elif rel.reltype == RT.CHART:
+            rels[rId.encode()] = ("chart",) + _capture_chart(rel.target_part)
+        else:
+            return None
+    return {
+        "layout": prs.slide_layouts.index(slide.slide_layout),
+        "sp_tree": etree.tostring(slide.shapes._spTree),
+        "rels": rels,
+    }
+
+def apply_slide(prs, fragment: dict, item: dict, images: dict):
+    slide = prs.slides.add_slide(prs.slide_layouts[fragment['layout']])
+    package = slide.part.package
+    new_ids = {}
+    for old_id, rel in fragment['rels'].items():
+        if rel[0] == "image":
+            _, rId = slide.part.get_or_add_image_part(BytesIO(images[item['image_url']]))
+        else:
+            chart_part = ChartPart.load(package.next_partname(ChartPart.partname_template), CT.DML_CHART, package, rel[1])
+            chart_part.chart_workbook.update_from_xlsx_blob(rel[2])
+            rId = slide.part.relate_to(chart_part, RT.CHART)
+        new_ids[old_id] = rId.encode()
+
+    xml = _REL_ID.sub(lambda m: b'="' + new_ids.get(m.group(1), m.group(1)) + b'"', fragment['sp_tree'])
+    old_tree = slide.shapes._spTree
+    old_tree.getparent().replace(old_tree, parse_pptx_xml(xml))
+    return slide
+
+# --- DOCX ---
+
+def docx_key(item: dict) -> str:
+    return _hash("docx", {"title": item['title'], "content": item.get('content')})
+
+def _body(doc):
+    return doc.element.body
+
+def docx_mark(doc) -> int:
+    # Index where the next block will be inserted (python-docx keeps sectPr last)
+    return len(_body(doc)) - 1
+
+def capture_docx(doc, start: int) -> list:
+    body = _body(doc)
+    return [etree.tostring(el) for el in body[start:len(body) - 1]]
+
+def apply_docx(doc, fragment: list):
+    sect_pr = _body(doc)[-1]
+    for xml in fragment:
+        sect_pr.addprevious(parse_docx_xml(xml))
+
+def stats() -> dict:
+    return {"entries": len(cache._entries), "hits": cache.hits, "misses": cache.misses, "max_entries": cache.max_entries}
@@ -0,0 +1,218 @@
+import asyncio
+import multiprocessing
+import os
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from config import settings
+from services import export_cache, metrics
+
+# Runs DOCX/PPTX rendering in a process pool so python-docx/python-pptx work and
+# image downloads never block the API's event loop. EXPORT_MAX_CONCURRENCY bounds
+# renders in flight, EXPORT_MAX_QUEUE bounds how many more may wait; beyond that
+# callers get ExportQueueFull so bursts can't starve interactive endpoints.
+
+DOCX_MEDIA_TYPE = "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
+PPTX_MEDIA_TYPE = "application/vnd.openxmlformats-officedocument.presentationml.presentation"
+
+class ExportQueueFull(Exception):
+    pass
+
+def _render(project_data: dict, path: str):
+    # Executed in a worker process. The package is written straight to `path` so the
+    # rendered file never crosses the process boundary or sits in the API's memory.
+    # Returns (size, metric events) - the events are replayed into the API's metrics.
+    from services.export import export_to_docx, export_to_pptx
+    metrics.start_buffer()
+    with open(path, "wb") as f:
+        if project_data['type'] == 'word':
+            export_to_docx(project_data, out=f)
+        else:
+            export_to_pptx(project_data, out=f)
+        return f.tell(), metrics.drain()
+
+def export_metadata(project_data: dict):
+    # (filename, media_type) for a project
+    if project_data['type'] == 'word':
+        return f"{project_data['title']}.docx", DOCX_MEDIA_TYPE
+    return f"{project_data['title']}.pptx", PPTX_MEDIA_TYPE
+
+def _init_worker():
+    # Executed once per worker process: python-docx/python-pptx (and lxml) are imported
+    # as the process starts rather than inside the first render it picks up
+    import services.export
+
+def _worker_pid() -> int:
+    return os.getpid()
+
+_pool = None
+_semaphore = None
+_stats = {"queued": 0, "running": 0, "completed": 0, "failed": 0, "rejected": 0, "cache_hits": 0, "render_seconds_total": 0.0, "bytes_written": 0}
+_jobs = {} # job_id -> job dict
+_inflight = {} # (project_id, revision) -> {"task", "waiters"}, so identical concurrent exports render once
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        # spawn, not fork: the API process holds SQLite handles and an event loop that must not be copied
+        _pool = ProcessPoolExecutor(max_workers=settings.EXPORT_WORKERS, mp_context=multiprocessing.get_context("spawn"), initializer=_init_worker)
+    return _pool
+
+def warm_pool() -> int:
+    # Spawns the render processes ahead of the first export (services/warmup.py);
+    # -> number of distinct worker processes that answered
+    pool = _get_pool()
+    futures = [pool.submit(_worker_pid) for _ in range(settings.EXPORT_WORKERS)]
+    return len({f.result() for f in futures})
+
+def _get_semaphore() -> asyncio.Semaphore:
+    global _semaphore
+    if _semaphore is None:
+        _semaphore = asyncio.Semaphore(settings.EXPORT_MAX_CONCURRENCY)
+    return _semaphore
+
+async def render_export(project_data: dict, path: str, on_start=None) -> int:
+    # Renders into `path` and returns the file size
+    if _stats["queued"] >= settings.EXPORT_MAX_QUEUE:
+        _stats["rejected"] += 1
+        raise ExportQueueFull()
+
+    # Only what the renderers read crosses the process boundary
+    payload = {
+        "title": project_data['title'],
+        "topic": project_data.get('topic', ''),
+        "type": project_data['type'],
+        "items": project_data['items'],
+    }
+    semaphore = _get_semaphore()
+    _stats["queued"] += 1
+    metrics.add_gauge("export_queue_depth", 1)
+    try:
+        with metrics.span("export.queue_wait"):
+            await semaphore.acquire()
+    finally:
+        _stats["queued"] -= 1
+        metrics.add_gauge("export_queue_depth", -1)
+
+    _stats["running"] += 1
+    metrics.add_gauge("export_renders_in_flight", 1)
+    if on_start:
+        on_start()
+    started = time.perf_counter()
+    try:
+        with metrics.span("export.render"):
+            size, events = await asyncio.get_running_loop().run_in_executor(_get_pool(), _render, payload, path)
+        metrics.replay(events)
+        _stats["completed"] += 1
+        _stats["bytes_written"] += size
+        return size
+    except Exception:
+        _stats["failed"] += 1
+        raise
+    finally:
+        _stats["running"] -= 1
+        metrics.add_gauge("export_renders_in_flight", -1)
+        _stats["render_seconds_total"] += time.perf_counter() - started
+        semaphore.release()
+
+async def _render_to_cache(project_data: dict, key: str, on_start=None) -> str:
+    tmp_path = await asyncio.to_thread(export_cache.temp_path, project_data['id'], key)
+    try:
+        await render_export(project_data, tmp_path, on_start)
+        # Listing, stat-ing and evicting the cache directory is blocking file I/O
+        return await asyncio.to_thread(export_cache.commit, project_data['id'], key, tmp_path)
+    except BaseException:
+        export_cache.discard(tmp_path)
+        raise
+
+async def export_file(project_data: dict, key: str = None, on_start=None):
+    # Returns (path, revision) of the rendered file, reusing the cached render when the project is unchanged.
+    # Concurrent exports of one revision share a render task that no caller owns: a caller that goes
+    # away (e.g. a client disconnect) stops waiting, and the render is cancelled only with its last waiter.
+    key = key or await asyncio.to_thread(export_cache.revision, project_data)
+    path = await asyncio.to_thread(export_cache.get, project_data['id'], key)
+    metrics.cache_result("export", path is not None)
+    if path:
+        _stats["cache_hits"] += 1
+        return path, key
+
+    inflight_key = (project_data['id'], key)
+    entry = _inflight.get(inflight_key)
+    if entry is None:
+        entry = {"task": asyncio.create_task(_render_to_cache(project_data, key, on_start)), "waiters": 0}
+        _inflight[inflight_key] = entry
+        # A callback rather than a finally in the task: it also runs when the task is cancelled before it starts
+        entry['task'].add_done_callback(lambda _: _inflight.pop(inflight_key, None))
+    entry['waiters'] += 1
+    try:
+        return await asyncio.shield(entry['task']), key
+    finally:
+        entry['waiters'] -= 1
+        if entry['waiters'] == 0 and not entry['task'].done():
+            entry['task'].cancel()
+
+def _expire_jobs():
+    cutoff = time.time() - settings.EXPORT_JOB_TTL_SECONDS
+    for job_id in [j for j, job in _jobs.items() if job['finished_at'] and job['finished_at'] < cutoff]:
+        job = _jobs.pop(job_id)
+        if job['path']:
+            export_cache.discard(job['path'])
+
+async def _run_job(job: dict, project_data: dict):
+    try:
+        path, job['revision'] = await export_file(project_data, on_start=lambda: job.update(status="running"))
+        # The job's own link to the file: the next export of the project replaces the cache entry
+        job['path'] = await asyncio.to_thread(export_cache.keep, path, f"{job['id']}.{job['revision']}")
+        job['status'] = "done"
+    except Exception as e:
+        print(f"Export job {job['id']} failed: {e}")
+        job['status'] = "failed"
+        job['error'] = str(e) or type(e).__name__
+    finally:
+        job['finished_at'] = time.time()
+        job.pop('task', None)
+
+def submit_export_job(project_data: dict, user_id: str) -> dict:
+    _expire_jobs()
+    if _stats["queued"] >= settings.EXPORT_MAX_QUEUE:
+        _stats["rejected"] += 1
+        raise ExportQueueFull()
+    filename, media_type = export_metadata(project_data)
+    job = {
+        "id": str(uuid.uuid4()),
+        "project_id": project_data['id'],
+        "user_id": user_id,
+        "status": "queued",
+        "filename": filename,
+        "media_type": media_type,
+        "created_at": time.time(),
+        "finished_at": None,
+        "error": None,
+        "path": None,
+        "revision": None,
+    }
+    _jobs[job['id']] = job
+    job['task'] = asyncio.create_task(_run_job(job, project_data))
+    return job
+
+def get_job(job_id: str):
+    _expire_jobs()
+    return _jobs.get(job_id)
+
+def job_status(job: dict) -> dict:
+    return {k: job[k] for k in ("id", "project_id", "status", "filename", "created_at", "finished_at", "error")}
+
+def stats() -> dict:
+    return {
+        **_stats,
+        "max_concurrency": settings.EXPORT_MAX_CONCURRENCY,
+        "max_queue": settings.EXPORT_MAX_QUEUE,
+        "workers": settings.EXPORT_WORKERS,
+        "jobs": len(_jobs),
+    }
+
+def shutdown():
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
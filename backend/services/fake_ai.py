@@ -0,0 +1,130 @@
+import asyncio
+import json
+import random
+import re
+import time
+from collections import deque
+from typing import Literal, get_args, get_origin
+from pydantic import BaseModel
+
+# Offline stand-in for genai.GenerativeModel. Selected with AI_BACKEND=fake so the
+# API can run in tests and local load runs without a Gemini key.
+
+class FakeAPIError(Exception):
+    pass
+
+class FakeRateLimitError(FakeAPIError):
+    # Stands in for a 429 ResourceExhausted
+    pass
+
+class FakeUsage:
+    # Word counts stand in for token counts; like Gemini, prompt_token_count includes the cached part
+    def __init__(self, prompt: str, reply: str, cached: str = None):
+        self.cached_content_token_count = len(cached.split()) if cached else 0
+        self.prompt_token_count = len(prompt.split()) + self.cached_content_token_count
+        self.candidates_token_count = len(reply.split())
+
+class FakeResponse:
+    def __init__(self, text: str, usage_metadata: FakeUsage = None):
+        self.text = text
+        self.usage_metadata = usage_metadata
+
+class FakeModel:
+    def __init__(self, latency: float = 0.0, failure_rate: float = 0.0, rpm: int = 0):
+        self.latency = latency
+        self.failure_rate = failure_rate # Fraction of calls that raise, to exercise error paths under load
+        self.rpm = rpm # Simulated per-minute quota; calls over it raise FakeRateLimitError (0 = unlimited)
+        self.calls = 0
+        self._recent = deque() # Call times within the last minute
+        self.cached_content = None
+
+    def with_cached_content(self, text: str):
+        # Local stand-in for GenerativeModel.from_cached_content: same behaviour, and usage
+        # reports the context as cached tokens. Shares the quota window with its parent.
+        model = FakeModel(self.latency, self.failure_rate, self.rpm)
+        model._recent = self._recent
+        model.cached_content = text
+        return model
+
+    def _reply(self, prompt: str) -> str:
+        if "Generate JSON data for a chart" in prompt:
+            return json.dumps({
+                "type": "bar",
+                "title": "Fake Chart",
+                "categories": ["A", "B", "C"],
+                "series": [{"name": "Data", "values": [1, 2, 3]}]
+            })
+        if "structured outline" in prompt:
+            return "Introduction\nBackground\nAnalysis\nConclusion"
+        if "visual keywords" in prompt:
+            return "business, technology"
+        return f"Fake response for: {prompt[:80]}"
+
+    async def generate_content_async(self, prompt, stream: bool = False, generation_config: dict = None, **kwargs):
+        self.calls += 1
+        self._check_quota()
+        schema = (generation_config or {}).get("response_schema")
+        reply = json.dumps(_fake_object(schema, _numbered_titles(prompt))) if schema else self._reply(prompt)
+        if stream:
+            self._maybe_fail()
+            return FakeStream(reply, self.latency, usage_metadata=FakeUsage(prompt, reply, self.cached_content))
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        self._maybe_fail()
+        return FakeResponse(reply, FakeUsage(prompt, reply, self.cached_content))
+
+    def _check_quota(self):
+        if not self.rpm:
+            return
+        now = time.monotonic()
+        while self._recent and now - self._recent[0] >= 60:
+            self._recent.popleft()
+        if len(self._recent) >= self.rpm:
+            raise FakeRateLimitError("429 Resource has been exhausted (fake quota)")
+        self._recent.append(now)
+
+    def _maybe_fail(self):
+        if self.failure_rate and random.random() < self.failure_rate:
+            raise FakeAPIError("Injected fake Gemini failure")
+
+class FakeStream:
+    # Mimics AsyncGenerateContentResponse with stream=True: the reply arrives word by word
+    def __init__(self, text: str, latency: float = 0.0, chunk_words: int = 3, usage_metadata: FakeUsage = None):
+        words = text.split(' ')
+        self.chunks = [' '.join(words[i:i + chunk_words]) + ' ' for i in range(0, len(words), chunk_words)]
+        self.chunks[-1] = self.chunks[-1].rstrip(' ')
+        self.delay = latency / max(len(self.chunks), 1)
+        self.usage_metadata = usage_metadata
+
+    async def __aiter__(self):
+        for i, chunk in enumerate(self.chunks):
+            if self.delay:
+                await asyncio.sleep(self.delay)
+            yield FakeResponse(chunk, self.usage_metadata if i == len(self.chunks) - 1 else None)
+
+# JSON mode: build a schema-valid object from the Pydantic model passed as response_schema
+
+def _numbered_titles(prompt: str) -> list:
+    return re.findall(r'(?m)^\d+\. (.+)$', prompt)
+
+def _fake_value(name: str, annotation, title: str, titles: list):
+    origin = get_origin(annotation)
+    if isinstance(annotation, type) and issubclass(annotation, BaseModel):
+        return _fake_object(annotation, titles, title)
+    if origin is Literal:
+        return get_args(annotation)[0]
+    if origin is list:
+        inner = get_args(annotation)[0]
+        if name == "items" and titles:
+            return [_fake_object(inner, [], t) for t in titles]
+        return [_fake_value(name, inner, f"{title} {i}".strip(), []) for i in range(1, 4)]
+    if annotation is float or annotation is int:
+        return 10.0
+    if name == "title":
+        return title or "Fake Title"
+    if name == "image_keywords":
+        return "business, technology"
+    return f"Fake {name} for {title}" if title else f"Fake {name}"
+
+def _fake_object(model, titles: list, title: str = ""):
+    return {name: _fake_value(name, field.annotation, title, titles) for name, field in model.model_fields.items()}
@@ -0,0 +1,21 @@
+import asyncio
+import random
+from config import settings
+
+# Offline stand-in for the Freepik search API. Selected with FREEPIK_BACKEND=fake;
+# waits FREEPIK_FAKE_LATENCY and fails at FREEPIK_FAKE_FAILURE_RATE.
+
+calls = 0
+
+async def search_images(query: str, limit: int):
+    # Candidate URLs derived from FREEPIK_FAKE_IMAGE_URL (unset means "no results"), or None on failure
+    global calls
+    calls += 1
+    if settings.FREEPIK_FAKE_LATENCY:
+        await asyncio.sleep(settings.FREEPIK_FAKE_LATENCY)
+    if settings.FREEPIK_FAKE_FAILURE_RATE and random.random() < settings.FREEPIK_FAKE_FAILURE_RATE:
+        print("Freepik API Error: injected fake failure")
+        return None
+    if not settings.FREEPIK_FAKE_IMAGE_URL:
+        return []
+    return [settings.FREEPIK_FAKE_IMAGE_URL] + [f"{settings.FREEPIK_FAKE_IMAGE_URL}?candidate={i}" for i in range(1, limit)]
@@ -1,20 +1,42 @@
-import firebase_admin
-from firebase_admin import credentials, firestore, auth
+import asyncio
+import hashlib
+import threading
+import time
 from config import settings
+from services import metrics
 import os
 
+# firebase_admin (and the Firestore client under it) is imported on first use
+# rather than at module import; the API's startup hook initializes it in the
+# background (STARTUP_BACKGROUND_PRELOAD), so requests rarely pay for it.
+
 db = None
+_init_lock = threading.Lock() # The startup preload thread and the first requests may initialize at once
+
+# sha256(token) -> (expires_at, decoded claims). Entries never outlive the token's own exp.
+_token_cache = {}
 
 def initialize_firebase():
     global db
-    if not firebase_admin._apps:
-        if os.path.exists(settings.FIREBASE_CREDENTIALS_PATH):
+    if not os.path.exists(settings.FIREBASE_CREDENTIALS_PATH):
+        print(f"Warning: Firebase credentials not found at {settings.FIREBASE_CREDENTIALS_PATH}. Firebase features will fail.")
+        return
+    import firebase_admin
+    from firebase_admin import credentials, firestore
+    with _init_lock:
+        if not firebase_admin._apps:
             cred = credentials.Certificate(settings.FIREBASE_CREDENTIALS_PATH)
             firebase_admin.initialize_app(cred)
             db = firestore.client()
             print("Firebase initialized successfully.")
-        else:
-            print(f"Warning: Firebase credentials not found at {settings.FIREBASE_CREDENTIALS_PATH}. Firebase features will fail.")
+
+def _initialized() -> bool:
+    if not os.path.exists(settings.FIREBASE_CREDENTIALS_PATH):
+        return False
+    import firebase_admin
+    if not firebase_admin._apps:
+        initialize_firebase()
+    return bool(firebase_admin._apps)
 
 def get_db():
     if db is None:
@@ -22,11 +44,51 @@ def get_db():
     return db
 
 def verify_token(token: str):
-    if not firebase_admin._apps:
-        initialize_firebase()
+    _initialized()
     try:
+        from firebase_admin import auth
         decoded_token = auth.verify_id_token(token)
         return decoded_token
     except Exception as e:
         print(f"Error verifying token: {e}")
         return None
+
+async def verify_token_cached(token: str):
+    # JWT signature checks (and any cold public-key fetch) run on a worker thread,
+    # and repeat requests with the same token skip verification entirely
+    key = hashlib.sha256(token.encode("utf-8")).hexdigest()
+    now = time.time()
+    entry = _token_cache.get(key)
+    if entry is not None:
+        if entry[0] > now:
+            metrics.cache_result("auth", True)
+            return entry[1]
+        _token_cache.pop(key, None)
+
+    metrics.cache_result("auth", False)
+    with metrics.span("auth.verify"):
+        decoded = await asyncio.to_thread(verify_token, token)
+    if decoded:
+        expires_at = min(decoded.get('exp', now), now + settings.AUTH_CACHE_TTL_SECONDS)
+        if len(_token_cache) >= settings.AUTH_CACHE_MAX_ENTRIES:
+            # Drop expired entries first, then the oldest insertions
+            for k in [k for k, (exp, _) in _token_cache.items() if exp <= now]:
+                del _token_cache[k]
+            while len(_token_cache) >= settings.AUTH_CACHE_MAX_ENTRIES:
+                del _token_cache[next(iter(_token_cache))]
+        _token_cache[key] = (expires_at, decoded)
+    return decoded
+
+def prewarm_auth_keys():
+    # Fetch Google's ID-token signing certificates once at startup so the first
+    # authenticated request doesn't pay for it. The verifier's HTTP session honours
+    # the certificates' cache-control headers, so later verifications reuse them.
+    if not _initialized():
+        return
+    try:
+        from firebase_admin import auth, _token_gen
+        verifier = auth._get_client(None)._token_verifier
+        verifier.request(_token_gen.ID_TOKEN_CERT_URI)
+        print("Firebase auth signing keys pre-fetched.")
+    except Exception as e:
+        print(f"Could not pre-fetch Firebase auth keys: {e}")
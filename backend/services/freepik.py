@@ -1,32 +1,100 @@
-import requests
+import asyncio
+import re
+from typing import Optional
 from config import settings
+from services.cache import LRUCache
+from services import fake_freepik, metrics
+
+# Async Freepik search. One keep-alive client is shared by all requests on this
+# worker, every call has a timeout, and results are cached per normalized query
+# for FREEPIK_CACHE_TTL_SECONDS. Each search asks for FREEPIK_CANDIDATES results,
+# so picking another image for the same query (e.g. on regenerate) needs no call.
+# Concurrent searches for the same query share one request.
+
+_client = None
+_cache = LRUCache(settings.FREEPIK_CACHE_MAX_ENTRIES, settings.FREEPIK_CACHE_TTL_SECONDS)
+_inflight = {} # query key -> Future of the candidate list
+
+def _get_client():
+    global _client
+    if _client is None:
+        import httpx # imported with the first search rather than at API startup
+        _client = httpx.AsyncClient(
+            timeout=settings.FREEPIK_TIMEOUT_SECONDS,
+            limits=httpx.Limits(max_connections=settings.FREEPIK_MAX_CONNECTIONS, max_keepalive_connections=settings.FREEPIK_MAX_CONNECTIONS),
+            headers={"x-freepik-api-key": settings.FREEPIK_API_KEY or ""},
+        )
+    return _client
+
+async def close():
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+def _query_key(query: str) -> str:
+    return re.sub(r'\s+', ' ', query).strip().lower()
+
+async def _fetch_candidates(query: str) -> Optional[list]:
+    # Returns candidate URLs ([] when Freepik has no results), or None on error so failures aren't cached
+    if settings.FREEPIK_BACKEND == "fake":
+        with metrics.span("freepik.search"):
+            return await fake_freepik.search_images(query, settings.FREEPIK_CANDIDATES)
 
-def search_image(query: str) -> str:
-    if not settings.FREEPIK_API_KEY:
-        print("Freepik API Key not found.")
-        return None
-        
-    url = "https://api.freepik.com/v1/resources"
-    headers = {
-        "x-freepik-api-key": settings.FREEPIK_API_KEY
-    }
     params = {
         "locale": "en-US",
         "page": 1,
-        "limit": 1,
+        "limit": settings.FREEPIK_CANDIDATES,
         "order": "latest",
         "term": query
     }
-    
     try:
-        response = requests.get(url, headers=headers, params=params)
+        with metrics.span("freepik.search"):
+            response = await _get_client().get(settings.FREEPIK_API_URL, params=params)
         response.raise_for_status()
         data = response.json()
-        
-        if data and 'data' in data and len(data['data']) > 0:
-            # Return the preview URL (medium size usually good for slides)
-            return data['data'][0]['image']['source']['url']
-        return None
+        # Preview URLs (medium size usually good for slides)
+        return [r['image']['source']['url'] for r in (data or {}).get('data', []) if r.get('image', {}).get('source', {}).get('url')]
     except Exception as e:
-        print(f"Freepik API Error: {e}")
+        print(f"Freepik API Error: {e!r}")
         return None
+
+async def search_images(query: str) -> list:
+    if settings.FREEPIK_BACKEND != "fake" and not settings.FREEPIK_API_KEY:
+        print("Freepik API Key not found.")
+        return []
+
+    key = _query_key(query)
+    cached = _cache.get(key)
+    metrics.cache_result("freepik", cached is not None)
+    if cached is not None:
+        return cached
+
+    pending = _inflight.get(key)
+    if pending is not None:
+        return await asyncio.shield(pending) or []
+
+    future = asyncio.get_running_loop().create_future()
+    _inflight[key] = future
+    try:
+        candidates = await _fetch_candidates(query)
+        if candidates is not None:
+            _cache.set(key, candidates)
+        future.set_result(candidates)
+        return candidates or []
+    except BaseException:
+        future.set_result(None)
+        raise
+    finally:
+        del _inflight[key]
+
+async def search_image(query: str, exclude=()) -> Optional[str]:
+    # First candidate not in `exclude`, so a regenerate can move on to the next result
+    candidates = await search_images(query)
+    for url in candidates:
+        if url not in exclude:
+            return url
+    return candidates[0] if candidates else None
+
+def stats() -> dict:
+    return {"entries": len(_cache), "evictions": _cache.evictions, "expirations": _cache.expirations, "inflight": len(_inflight)}
@@ -0,0 +1,79 @@
+import asyncio
+from typing import Optional
+from config import settings
+from services.ai import generate_image_keywords
+from services.freepik import search_image
+from services import metrics
+
+# Image selection for a slide. Keywords are extracted once and shared by every
+# provider; providers run concurrently in preference order (Freepik, then the
+# Unsplash keyword URL). The most preferred provider that returns a URL wins; a
+# less preferred result is taken once everything ahead of it has failed, or when
+# IMAGE_PROVIDER_GRACE_SECONDS have passed since that result arrived (not since the
+# race started: keyword extraction delays every provider alike). Losers are cancelled.
+
+def _unsplash_url(keywords: str) -> str:
+    return f"https://source.unsplash.com/1600x900/?{keywords.replace(' ', ',')}"
+
+async def _first_good(providers: list, grace: float):
+    # providers: [(name, coroutine)] in preference order -> (name, result) or (None, None)
+    tasks = [asyncio.create_task(coro) for _, coro in providers]
+    results = [None] * len(tasks)
+    loop = asyncio.get_running_loop()
+    deadline = None # Set when the first result arrives that has to wait for better providers
+    try:
+        pending = set(tasks)
+        while pending:
+            # Without any result yet there is nothing to settle for, so wait without a deadline
+            timeout = max(0.0, deadline - loop.time()) if deadline is not None else None
+            done, pending = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if not task.cancelled() and task.exception() is None:
+                    results[tasks.index(task)] = task.result()
+                elif not task.cancelled():
+                    print(f"Image provider {providers[tasks.index(task)][0]} failed: {task.exception()!r}")
+            # The best finished result wins once every provider ahead of it has finished
+            for i, task in enumerate(tasks):
+                if results[i]:
+                    return providers[i][0], results[i]
+                if not task.done():
+                    break
+            if deadline is None and any(results):
+                deadline = loop.time() + grace
+            if not done:
+                break # Grace period over: settle for the best result so far
+        for i, result in enumerate(results):
+            if result:
+                return providers[i][0], result
+        return None, None
+    finally:
+        for task in tasks:
+            task.cancel()
+
+async def select_image(topic: str, slide_title: str, prompt: str = None, regenerate: bool = False, exclude=(), keywords: str = None) -> dict:
+    # Returns {"image_url", "provider", "query"}; query is what the image was searched by.
+    # Pass keywords when they are already known (e.g. from a multi-artifact call) to skip extraction.
+    if keywords:
+        keywords_task = asyncio.get_running_loop().create_future()
+        keywords_task.set_result(keywords)
+    else:
+        keywords_task = asyncio.create_task(generate_image_keywords(topic, slide_title, prompt, regenerate))
+
+    async def shared_keywords() -> str:
+        # shield: a cancelled provider must not cancel the extraction the others share
+        return await asyncio.shield(keywords_task)
+
+    async def freepik() -> Optional[str]:
+        return await search_image(prompt or await shared_keywords(), exclude)
+
+    async def unsplash() -> str:
+        return _unsplash_url(await shared_keywords())
+
+    try:
+        with metrics.span("image.select"):
+            provider, image_url = await _first_good([("freepik", freepik()), ("unsplash", unsplash())], settings.IMAGE_PROVIDER_GRACE_SECONDS)
+        metrics.inc("image_provider_wins_total", provider=provider or "none")
+        query = prompt or (keywords_task.result() if keywords_task.done() and not keywords_task.cancelled() else None)
+        return {"image_url": image_url, "provider": provider, "query": query}
+    finally:
+        keywords_task.cancel()
@@ -0,0 +1,109 @@
+import hashlib
+import math
+import re
+from typing import NamedTuple, Optional
+from config import settings
+from services.cache import LRUCache
+from services import metrics
+
+# Markdown subset shared by the DOCX and PPTX exporters. compile_markdown() turns
+# item content into a tuple of Blocks once; both renderers walk the same blocks,
+# so they support the same syntax:
+#
+#   # / ## / ### headings, paragraphs
+#   - / * / + bullets and 1. / 1) numbered items, nested by indentation (2 spaces or a tab per level)
+#   **bold** / __bold__, *italic* / _italic_, ***both***, nesting inside bold or italic
+#
+# Compiled blocks are immutable and cached per content hash, so a section is
+# parsed once per export process however many times (or formats) it is exported.
+
+MAX_LEVEL = 8 # Deepest list level PowerPoint supports
+
+class Run(NamedTuple):
+    text: str
+    bold: bool = False
+    italic: bool = False
+
+class Block(NamedTuple):
+    kind: str # "heading", "paragraph", "bullet" or "numbered"
+    runs: tuple
+    level: int = 0 # Heading level (1-6) or list nesting depth (0 = top)
+    number: Optional[int] = None # The author's number for numbered items
+
+_HEADING = re.compile(r'(#{1,6})\s+(.*)')
+_LIST_ITEM = re.compile(r'([ \t]*)(?:([-*+])|(\d+)[.)])\s+(.*)')
+# Earliest emphasis span; the longest marker wins so ***x*** is not read as *(**x**)*
+_EMPHASIS = re.compile(
+    r'\*\*\*(?=\S)(.+?)(?<=\S)\*\*\*'
+    r'|\*\*(?=\S)(.+?)(?<=\S)\*\*'
+    r'|__(?=\S)(.+?)(?<=\S)__'
+    r'|(?<![*\w])\*(?=[^\s*])(.+?)(?<=[^\s*])\*(?![*\w])'
+    r'|(?<!\w)_(?=[^\s_])(.+?)(?<=[^\s_])_(?!\w)'
+)
+
+_cache = LRUCache(settings.MARKDOWN_IR_CACHE_SIZE, math.inf)
+
+def _runs(text: str, bold: bool = False, italic: bool = False) -> list:
+    runs = []
+    position = 0
+    for match in _EMPHASIS.finditer(text):
+        if match.start() > position:
+            runs.append(Run(text[position:match.start()], bold, italic))
+        both, strong, strong_alt, em, em_alt = match.groups()
+        if both is not None:
+            runs.extend(_runs(both, True, True))
+        elif strong is not None or strong_alt is not None:
+            runs.extend(_runs(strong if strong is not None else strong_alt, True, italic))
+        else:
+            runs.extend(_runs(em if em is not None else em_alt, bold, True))
+        position = match.end()
+    if position < len(text):
+        runs.append(Run(text[position:], bold, italic))
+    return runs
+
+def _merge(runs: list) -> tuple:
+    # Adjacent runs with the same formatting become one run (fewer XML elements per paragraph)
+    merged = []
+    for run in runs:
+        if merged and (merged[-1].bold, merged[-1].italic) == (run.bold, run.italic):
+            merged[-1] = Run(merged[-1].text + run.text, run.bold, run.italic)
+        elif run.text:
+            merged.append(run)
+    return tuple(merged)
+
+def _indent_level(indent: str) -> int:
+    width = len(indent.replace('\t', '  '))
+    return min(width // 2, MAX_LEVEL)
+
+def _compile(text: str) -> tuple:
+    blocks = []
+    for raw in text.split('\n'):
+        line = raw.rstrip()
+        if not line.strip():
+            continue
+        heading = _HEADING.match(line.lstrip())
+        if heading:
+            blocks.append(Block("heading", _merge(_runs(heading.group(2))), len(heading.group(1))))
+            continue
+        item = _LIST_ITEM.match(line)
+        if item:
+            indent, bullet, number, body = item.groups()
+            runs = _merge(_runs(body))
+            if bullet:
+                blocks.append(Block("bullet", runs, _indent_level(indent)))
+            else:
+                blocks.append(Block("numbered", runs, _indent_level(indent), int(number)))
+            continue
+        blocks.append(Block("paragraph", _merge(_runs(line.strip()))))
+    return tuple(blocks)
+
+def compile_markdown(text: str) -> tuple:
+    if not text:
+        return ()
+    key = hashlib.sha1(text.encode("utf-8")).hexdigest()
+    blocks = _cache.get(key)
+    metrics.cache_result("markdown_ir", blocks is not None)
+    if blocks is None:
+        blocks = _compile(text)
+        _cache.set(key, blocks)
+    return blocks
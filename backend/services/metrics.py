@@ -0,0 +1,224 @@
+import contextvars
+import functools
+import inspect
+import threading
+import time
+from contextlib import contextmanager
+from config import settings
+
+# In-process metrics: counters and latency histograms rendered in the Prometheus
+# text format at /metrics, plus per-request stage timings surfaced as a
+# Server-Timing header. span("stage") times a block; when METRICS_OTEL_ENABLED is
+# set and opentelemetry is installed, each span is also emitted as an OTel span
+# (exporters are configured the usual OTel way, e.g. OTEL_EXPORTER_OTLP_ENDPOINT).
+
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+_lock = threading.Lock()
+_counters = {} # (name, labels) -> value
+_gauges = {} # (name, labels) -> value
+_histograms = {} # (name, labels) -> [bucket counts..., sum, count]
+_help = {}
+
+# Stage timings of the current request: list of (stage, seconds), set by the HTTP middleware
+_request_spans = contextvars.ContextVar("request_spans", default=None)
+
+# Set inside export worker processes: observations are buffered and replayed by the API process
+_buffer = None
+
+_tracer = None
+if settings.METRICS_OTEL_ENABLED:
+    try:
+        from opentelemetry import trace
+        _tracer = trace.get_tracer("docai")
+    except ImportError:
+        print("METRICS_OTEL_ENABLED is set but opentelemetry is not installed; spans are recorded locally only")
+
+def _key(name: str, labels: dict):
+    return name, tuple(sorted(labels.items()))
+
+def describe(name: str, help_text: str):
+    _help[name] = help_text
+
+def inc(name: str, value: float = 1, **labels):
+    if not settings.METRICS_ENABLED:
+        return
+    if _buffer is not None:
+        _buffer.append(("inc", name, labels, value))
+        return
+    key = _key(name, labels)
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + value
+
+def set_gauge(name: str, value: float, **labels):
+    if not settings.METRICS_ENABLED:
+        return
+    with _lock:
+        _gauges[_key(name, labels)] = value
+
+def add_gauge(name: str, delta: float, **labels):
+    if not settings.METRICS_ENABLED:
+        return
+    key = _key(name, labels)
+    with _lock:
+        _gauges[key] = _gauges.get(key, 0) + delta
+
+def observe(name: str, value: float, **labels):
+    if not settings.METRICS_ENABLED:
+        return
+    if _buffer is not None:
+        _buffer.append(("observe", name, labels, value))
+        return
+    key = _key(name, labels)
+    with _lock:
+        hist = _histograms.get(key)
+        if hist is None:
+            hist = _histograms[key] = [0] * (len(BUCKETS) + 2)
+        for i, bound in enumerate(BUCKETS):
+            if value <= bound:
+                hist[i] += 1
+        hist[-2] += value
+        hist[-1] += 1
+
+def cache_result(cache: str, hit: bool):
+    inc("cache_requests_total", cache=cache, result="hit" if hit else "miss")
+
+def record_stage(stage: str, seconds: float, error: bool = False):
+    observe("stage_duration_seconds", seconds, stage=stage)
+    if error:
+        inc("stage_errors_total", stage=stage)
+    spans = _request_spans.get()
+    if spans is not None:
+        spans.append((stage, seconds))
+
+@contextmanager
+def span(stage: str, **attributes):
+    # Times the enclosed block as `stage`; works in sync and async code
+    otel = _tracer.start_as_current_span(stage, attributes=attributes) if _tracer else None
+    if otel:
+        otel.__enter__()
+    started = time.perf_counter()
+    error = False
+    try:
+        yield
+    except BaseException:
+        error = True
+        raise
+    finally:
+        record_stage(stage, time.perf_counter() - started, error)
+        if otel:
+            otel.__exit__(None, None, None)
+
+def timed(stage: str):
+    # Decorator form of span() for plain and async functions
+    def decorator(fn):
+        if inspect.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                with span(stage):
+                    return await fn(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(stage):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+# --- Request scope ---
+
+def start_request():
+    return _request_spans.set([])
+
+def request_spans() -> list:
+    # Stages recorded so far in the current request
+    return _request_spans.get() or []
+
+def finish_request(token) -> list:
+    spans = _request_spans.get() or []
+    _request_spans.reset(token)
+    return spans
+
+def server_timing(spans: list) -> str:
+    # Aggregates repeated stages, e.g. "db.get_project;dur=3.1, ai.content;dur=812.0"
+    totals = {}
+    for stage, seconds in spans:
+        totals[stage] = totals.get(stage, 0.0) + seconds
+    return ", ".join(f"{stage};dur={seconds * 1000:.1f}" for stage, seconds in totals.items())
+
+# --- Worker processes ---
+
+def start_buffer():
+    global _buffer
+    _buffer = []
+
+def drain() -> list:
+    global _buffer
+    events, _buffer = _buffer or [], []
+    return events
+
+def replay(events: list):
+    for kind, name, labels, value in events:
+        if kind == "inc":
+            inc(name, value, **labels)
+        elif name == "stage_duration_seconds":
+            record_stage(labels["stage"], value)
+        else:
+            observe(name, value, **labels)
+
+# --- Exposition ---
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _labels(labels, extra: str = "") -> str:
+    parts = [f'{k}="{_escape(v)}"' for k, v in labels]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+def render() -> str:
+    lines = []
+    seen = set()
+
+    def header(name: str, kind: str):
+        if name not in seen:
+            seen.add(name)
+            if name in _help:
+                lines.append(f"# HELP {name} {_help[name]}")
+            lines.append(f"# TYPE {name} {kind}")
+
+    with _lock:
+        for (name, labels), value in sorted(_counters.items()):
+            header(name, "counter")
+            lines.append(f"{name}{_labels(labels)} {value}")
+        for (name, labels), value in sorted(_gauges.items()):
+            header(name, "gauge")
+            lines.append(f"{name}{_labels(labels)} {value}")
+        for (name, labels), hist in sorted(_histograms.items()):
+            header(name, "histogram")
+            for i, bound in enumerate(BUCKETS):
+                le = f'le="{bound}"'
+                lines.append(f"{name}_bucket{_labels(labels, le)} {hist[i]}")
+            le = 'le="+Inf"'
+            lines.append(f"{name}_bucket{_labels(labels, le)} {hist[-1]}")
+            lines.append(f"{name}_sum{_labels(labels)} {hist[-2]}")
+            lines.append(f"{name}_count{_labels(labels)} {hist[-1]}")
+    return "\n".join(lines) + "\n"
+
+def reset():
+    with _lock:
+        _counters.clear()
+        _gauges.clear()
+        _histograms.clear()
+
+describe("http_requests_total", "HTTP requests by route and status")
+describe("http_request_duration_seconds", "HTTP request latency by route")
+describe("http_requests_in_flight", "HTTP requests currently being handled")
+describe("stage_duration_seconds", "Latency of internal stages (AI calls, Freepik, storage, export)")
+describe("stage_errors_total", "Stages that raised")
+describe("cache_requests_total", "Cache lookups by cache and result")
+describe("ai_tokens_total", "Gemini tokens by operation and kind (prompt/output)")
+describe("export_queue_depth", "Exports waiting for a render slot")
+describe("export_renders_in_flight", "Exports being rendered in the process pool")
@@ -0,0 +1,119 @@
+import asyncio
+import datetime
+import hashlib
+import time
+from config import settings
+from services import metrics
+
+# Shared context for per-section generation: outline, description, style guide
+# and the sections written so far, rendered once per project snapshot. Section
+# prompts then carry only the section-specific task. The context itself is sent
+# through the model's cached-content facility (a Gemini CachedContent, or the fake
+# model's local stand-in under AI_BACKEND=fake), so the uncached input per section
+# stays flat however long the context gets. When caching is off, unavailable or
+# the context is below PROJECT_CONTEXT_MIN_TOKENS (Gemini rejects small caches),
+# the context is sent inline as a stable prompt prefix instead.
+
+class ProjectContext:
+    def __init__(self, text: str, shared: bool = True):
+        self.text = text
+        self.shared = shared # False: one call only, not worth creating a cache for
+        self.fingerprint = hashlib.sha256(f"{settings.GEMINI_MODEL}\n{text}".encode("utf-8")).hexdigest()
+
+def _clip(text: str, limit: int) -> str:
+    text = text.strip()
+    return text if len(text) <= limit else text[:limit].rstrip() + " [...]"
+
+def build(project_data: dict, shared: bool = True, exclude_item_id: str = None) -> ProjectContext:
+    # Build once per batch and pass the same object to every section call; a new snapshot
+    # (e.g. after more sections were written) gets a new fingerprint and a new cache.
+    # Single-section calls pass shared=False and send the context inline: its stable
+    # order (outline first, then sections in order) still lets implicit prefix caching apply.
+    # exclude_item_id leaves out the current text of the section being written (the
+    # prompt says not to repeat written sections).
+    kind = "Word document" if project_data['type'] == "word" else "PowerPoint presentation"
+    items = [item for item in sorted(project_data['items'], key=lambda x: x['order']) if item['type'] in ("section", "slide")]
+    lines = [f"Project: {project_data['title']}", f"Format: {kind}", f"Topic: {project_data['topic']}"]
+    if project_data.get('description'):
+        lines.append(f"Description: {project_data['description']}")
+    if project_data.get('style_guide'):
+        lines.append(f"Style guide: {project_data['style_guide']}")
+    lines.append("Outline:")
+    lines.extend(f"{n + 1}. {item['title']}" for n, item in enumerate(items))
+
+    written = []
+    budget = settings.PROJECT_CONTEXT_MAX_CHARS
+    for item in items:
+        if not item.get('content') or item['id'] == exclude_item_id or budget <= 0:
+            continue
+        excerpt = _clip(item['content'], min(settings.PROJECT_CONTEXT_SECTION_CHARS, budget))
+        written.append(f"## {item['title']}\n{excerpt}")
+        budget -= len(excerpt)
+    if written:
+        lines.append("\nSections written so far:")
+        lines.extend(written)
+    return ProjectContext("\n".join(lines), shared)
+
+# fingerprint -> {"future": Future of (cached model or None), "expires_at": float}
+_handles = {}
+
+def _expire():
+    now = time.time()
+    for fingerprint in [f for f, h in _handles.items() if h['expires_at'] < now]:
+        del _handles[fingerprint]
+
+def _estimate_tokens(text: str) -> int:
+    return len(text) // 4
+
+def _create_gemini_cache(context: ProjectContext):
+    import google.generativeai as genai
+    from google.generativeai import caching
+    model_name = settings.GEMINI_MODEL if settings.GEMINI_MODEL.startswith("models/") else f"models/{settings.GEMINI_MODEL}"
+    cache = caching.CachedContent.create(
+        model=model_name,
+        display_name=f"project-context-{context.fingerprint[:12]}",
+        system_instruction="You write sections of the project described in the context. Stay consistent with its outline, style guide and the sections already written, without repeating them.",
+        contents=[context.text],
+        ttl=datetime.timedelta(seconds=settings.PROJECT_CONTEXT_TTL_SECONDS),
+    )
+    return genai.GenerativeModel.from_cached_content(cached_content=cache)
+
+async def _create(context: ProjectContext, base_model):
+    # -> a model bound to the cached context, or None to send the context inline
+    if settings.PROJECT_CONTEXT_CACHE == "off":
+        return None
+    if settings.AI_BACKEND == "fake":
+        return base_model.with_cached_content(context.text)
+    if _estimate_tokens(context.text) < settings.PROJECT_CONTEXT_MIN_TOKENS:
+        return None
+    try:
+        with metrics.span("ai.context_cache.create"):
+            return await asyncio.to_thread(_create_gemini_cache, context)
+    except Exception as e:
+        # Unsupported model, quota, too few tokens...: fall back to the inline prefix for this snapshot
+        print(f"Context cache unavailable, sending context inline: {e!r}")
+        return None
+
+def _inline(context: ProjectContext, prompt: str) -> str:
+    return f"Project context:\n{context.text}\n\n{prompt}"
+
+async def resolve(context: ProjectContext, base_model, prompt: str) -> tuple:
+    # -> (model to call, prompt to send). Concurrent sections of one snapshot share one cache creation.
+    if not context.shared:
+        return base_model, _inline(context, prompt)
+    _expire()
+    handle = _handles.get(context.fingerprint)
+    metrics.cache_result("project_context", handle is not None)
+    if handle is None:
+        # Expire a little before the server-side TTL so a cache is never used as it lapses
+        handle = {"future": asyncio.ensure_future(_create(context, base_model)), "expires_at": time.time() + settings.PROJECT_CONTEXT_TTL_SECONDS * 0.9}
+        _handles[context.fingerprint] = handle
+    cached_model = await asyncio.shield(handle['future'])
+    handle['cached'] = cached_model is not None
+    if cached_model is not None:
+        return cached_model, prompt
+    return base_model, _inline(context, prompt)
+
+def stats() -> dict:
+    _expire()
+    return {"contexts": len(_handles), "cached": sum(1 for h in _handles.values() if h.get('cached'))}
@@ -0,0 +1,75 @@
+import asyncio
+import re
+from config import settings
+from services.ai import refine_excerpt
+from services import metrics
+
+# Chunked refine for long text. Only the selected range is rewritten (the whole
+# text when there is no selection); it is split at paragraph boundaries into
+# chunks of up to REFINE_CHUNK_CHARS, which are refined concurrently and put back
+# between the original separators, so text outside the range or between chunks
+# is returned byte for byte. A chunk whose call fails keeps its original text.
+# The diff lists each chunk that changed, with its offsets in the original text.
+
+_PARAGRAPH_BREAK = re.compile(r'\n[ \t]*\n\s*')
+
+def split_chunks(text: str, start: int, end: int, max_chars: int) -> list:
+    # -> [(start, end)] spans in `text` covering the non-blank paragraphs of text[start:end];
+    # consecutive paragraphs are grouped while the group stays within max_chars
+    paragraphs = []
+    position = start
+    for match in _PARAGRAPH_BREAK.finditer(text, start, end):
+        paragraphs.append((position, match.start()))
+        position = match.end()
+    paragraphs.append((position, end))
+
+    chunks = []
+    for p_start, p_end in paragraphs:
+        # Leading/trailing whitespace stays outside the chunk so it is preserved as-is
+        segment = text[p_start:p_end]
+        p_start += len(segment) - len(segment.lstrip())
+        p_end -= len(segment) - len(segment.rstrip())
+        if p_start >= p_end:
+            continue
+        if chunks and p_end - chunks[-1][0] <= max_chars:
+            chunks[-1] = (chunks[-1][0], p_end)
+        else:
+            chunks.append((p_start, p_end))
+    return chunks
+
+async def refine_range(text: str, instruction: str, start: int = None, end: int = None, regenerate: bool = False) -> dict:
+    # -> {"refined", "diff": [{"start", "end", "original", "refined"}], "chunks", "failed"}
+    start = 0 if start is None else max(0, min(start, len(text)))
+    end = len(text) if end is None else max(start, min(end, len(text)))
+    chunks = split_chunks(text, start, end, settings.REFINE_CHUNK_CHARS)
+    semaphore = asyncio.Semaphore(max(1, settings.REFINE_MAX_PARALLEL))
+
+    async def refine_chunk(span):
+        original = text[span[0]:span[1]]
+        async with semaphore:
+            try:
+                return await refine_excerpt(original, instruction, regenerate) or original, False
+            except Exception as e:
+                print(f"AI Error (Refine chunk {span[0]}-{span[1]}): {e}")
+                return original, True
+
+    with metrics.span("refine.chunks"):
+        results = await asyncio.gather(*(refine_chunk(span) for span in chunks))
+
+    parts = []
+    diff = []
+    position = 0
+    for (c_start, c_end), (refined, _) in zip(chunks, results):
+        parts.append(text[position:c_start])
+        parts.append(refined)
+        position = c_end
+        if refined != text[c_start:c_end]:
+            diff.append({"start": c_start, "end": c_end, "original": text[c_start:c_end], "refined": refined})
+    parts.append(text[position:])
+    metrics.inc("refine_chunks_total", len(chunks))
+    return {
+        "refined": "".join(parts),
+        "diff": diff,
+        "chunks": len(chunks),
+        "failed": sum(failed for _, failed in results),
+    }
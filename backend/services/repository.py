@@ -0,0 +1,495 @@
+import asyncio
+import base64
+import json
+import os
+import sqlite3
+import threading
+from abc import ABC, abstractmethod
+from datetime import datetime
+from typing import Optional
+from config import settings
+from services.firebase import get_db
+from services import metrics
+
+# Project storage behind one interface. Items are addressed individually in both
+# backends, so generating one slide writes only that slide (plus the project's
+# updated_at) and parallel generations never clobber each other.
+
+class ProjectRepository(ABC):
+    @abstractmethod
+    def get_project(self, project_id: str) -> Optional[dict]:
+        ...
+
+    @abstractmethod
+    def get_projects(self, project_ids: list) -> dict:
+        # Batched get: project_id -> project dict, missing ids are omitted
+        ...
+
+    @abstractmethod
+    def list_projects(self, user_id: str, limit: int, cursor: str = None) -> tuple:
+        # Most recently updated first: ([summary dicts], next cursor or None). Summaries carry
+        # id, title, type, topic, item_count and updated_at, never the items themselves.
+        ...
+
+    @abstractmethod
+    def create_project(self, project_data: dict):
+        ...
+
+    @abstractmethod
+    def update_items(self, project_id: str, updates: dict) -> int:
+        # updates: item_id -> fields to set. Returns how many items were updated.
+        ...
+
+    @abstractmethod
+    def add_item(self, project_id: str, item: dict) -> dict:
+        # Assigns the next free order slot and returns the stored item
+        ...
+
+    @abstractmethod
+    def delete_item(self, project_id: str, item_id: str):
+        ...
+
+    def update_item(self, project_id: str, item_id: str, fields: dict) -> bool:
+        return self.update_items(project_id, {item_id: fields}) == 1
+
+def _sorted_items(items) -> list:
+    return sorted(items, key=lambda x: x['order'])
+
+SUMMARY_FIELDS = ("title", "type", "topic", "updated_at")
+
+# Listing cursors are opaque to clients: the (updated_at, id) of the last project on the page
+
+def encode_cursor(updated_at, project_id: str) -> str:
+    updated_at = updated_at.isoformat() if isinstance(updated_at, datetime) else updated_at
+    return base64.urlsafe_b64encode(json.dumps([updated_at, project_id]).encode()).decode()
+
+def decode_cursor(cursor: str) -> tuple:
+    # Raises ValueError for anything that isn't a cursor we issued
+    try:
+        updated_at, project_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return datetime.fromisoformat(updated_at), str(project_id)
+    except Exception as e:
+        raise ValueError(f"Invalid cursor: {cursor!r}") from e
+
+def _page(summaries: list, limit: int) -> tuple:
+    # summaries holds up to limit + 1 rows; the extra one only tells us another page exists
+    if len(summaries) <= limit:
+        return summaries, None
+    summaries = summaries[:limit]
+    return summaries, encode_cursor(summaries[-1]['updated_at'], summaries[-1]['id'])
+
+class FirestoreProjectRepository(ProjectRepository):
+    # Items live in projects/{project_id}/items/{item_id}
+
+    def __init__(self, db):
+        self.db = db
+
+    def _project_ref(self, project_id: str):
+        return self.db.collection("projects").document(project_id)
+
+    def _migrate_embedded_items(self, project_id: str, project_data: dict) -> list:
+        # Projects written before the items subcollection keep their items inline; move them once
+        from firebase_admin import firestore
+        items = project_data.pop('items', [])
+        project_ref = self._project_ref(project_id)
+        batch = self.db.batch()
+        for item in items:
+            batch.set(project_ref.collection("items").document(item['id']), item)
+        batch.update(project_ref, {
+            "items": firestore.DELETE_FIELD,
+            "next_order": max([i['order'] for i in items], default=-1) + 1,
+            "item_count": len(items)
+        })
+        batch.commit()
+        return items
+
+    def _with_items(self, snapshot) -> dict:
+        project_data = snapshot.to_dict()
+        if isinstance(project_data.get('items'), list):
+            items = self._migrate_embedded_items(snapshot.id, project_data)
+        else:
+            items = [doc.to_dict() for doc in snapshot.reference.collection("items").stream()]
+        project_data.pop('next_order', None)
+        project_data.pop('item_count', None)
+        project_data['items'] = _sorted_items(items)
+        return project_data
+
+    def get_project(self, project_id: str) -> Optional[dict]:
+        snapshot = self._project_ref(project_id).get()
+        if not snapshot.exists:
+            return None
+        return self._with_items(snapshot)
+
+    def get_projects(self, project_ids: list) -> dict:
+        refs = [self._project_ref(pid) for pid in project_ids]
+        return {
+            snapshot.id: self._with_items(snapshot)
+            for snapshot in self.db.get_all(refs) if snapshot.exists
+        }
+
+    def list_projects(self, user_id: str, limit: int, cursor: str = None) -> tuple:
+        # Needs the composite index in firestore.indexes.json (user_id, updated_at desc, __name__ desc)
+        from firebase_admin import firestore
+        query = (
+            self.db.collection("projects")
+            .where("user_id", "==", user_id)
+            .order_by("updated_at", direction=firestore.Query.DESCENDING)
+            .order_by("__name__", direction=firestore.Query.DESCENDING)
+            .select(list(SUMMARY_FIELDS) + ["item_count"])
+        )
+        if cursor:
+            updated_at, project_id = decode_cursor(cursor)
+            query = query.start_after({"updated_at": updated_at, "__name__": project_id})
+        summaries = []
+        for doc in query.limit(limit + 1).stream():
+            data = doc.to_dict()
+            if 'item_count' not in data:
+                data['item_count'] = self._backfill_item_count(doc.id)
+            summaries.append({"id": doc.id, **data})
+        return _page(summaries, limit)
+
+    def _backfill_item_count(self, project_id: str) -> int:
+        # Projects created before item_count was tracked: count once (migrating inline items) and store it
+        snapshot = self._project_ref(project_id).get()
+        count = len(self._with_items(snapshot)['items'])
+        self._project_ref(project_id).update({"item_count": count})
+        return count
+
+    def create_project(self, project_data: dict):
+        project_data = dict(project_data)
+        items = project_data.pop('items', [])
+        project_data['next_order'] = len(items)
+        project_data['item_count'] = len(items)
+        project_ref = self._project_ref(project_data['id'])
+        batch = self.db.batch()
+        batch.set(project_ref, project_data)
+        for item in items:
+            batch.set(project_ref.collection("items").document(item['id']), item)
+        batch.commit()
+
+    def update_items(self, project_id: str, updates: dict) -> int:
+        if not updates:
+            return 0
+        from google.api_core.exceptions import NotFound
+        project_ref = self._project_ref(project_id)
+        batch = self.db.batch()
+        for item_id, fields in updates.items():
+            batch.update(project_ref.collection("items").document(item_id), fields)
+        batch.update(project_ref, {"updated_at": datetime.now()})
+        try:
+            batch.commit()
+            return len(updates)
+        except NotFound:
+            # An item was deleted meanwhile; the batch is all-or-nothing, so apply the rest one by one
+            updated = 0
+            for item_id, fields in updates.items():
+                try:
+                    project_ref.collection("items").document(item_id).update(fields)
+                    updated += 1
+                except NotFound:
+                    pass
+            return updated
+
+    def add_item(self, project_id: str, item: dict) -> dict:
+        from firebase_admin import firestore
+        project_ref = self._project_ref(project_id)
+
+        @firestore.transactional
+        def allocate(transaction):
+            snapshot = project_ref.get(transaction=transaction)
+            order = (snapshot.to_dict() or {}).get("next_order", 0)
+            new_item = {**item, "order": order}
+            transaction.set(project_ref.collection("items").document(item['id']), new_item)
+            transaction.update(project_ref, {"next_order": order + 1, "item_count": firestore.Increment(1), "updated_at": datetime.now()})
+            return new_item
+
+        return allocate(self.db.transaction())
+
+    def delete_item(self, project_id: str, item_id: str):
+        from firebase_admin import firestore
+        project_ref = self._project_ref(project_id)
+        item_ref = project_ref.collection("items").document(item_id)
+
+        @firestore.transactional
+        def remove(transaction):
+            # Read first so deleting a missing item doesn't decrement item_count
+            if not item_ref.get(transaction=transaction).exists:
+                return
+            transaction.delete(item_ref)
+            transaction.update(project_ref, {"item_count": firestore.Increment(-1), "updated_at": datetime.now()})
+
+        remove(self.db.transaction())
+
+def _json_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"Cannot serialize {type(value).__name__}")
+
+def _dumps(data: dict) -> str:
+    return json.dumps(data, default=_json_default)
+
+class SQLiteProjectRepository(ProjectRepository):
+    # Embedded local backend for development, tests and offline load runs. WAL mode
+    # lets readers proceed during writes, and busy_timeout makes several uvicorn
+    # workers on the same file wait for each other instead of failing.
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS projects (
+                id TEXT PRIMARY KEY,
+                user_id TEXT NOT NULL,
+                data TEXT NOT NULL,
+                next_order INTEGER NOT NULL DEFAULT 0,
+                updated_at TEXT NOT NULL
+            );
+            DROP INDEX IF EXISTS projects_user_updated;
+            CREATE INDEX IF NOT EXISTS projects_user_recent ON projects (user_id, updated_at DESC, id DESC);
+            CREATE TABLE IF NOT EXISTS items (
+                project_id TEXT NOT NULL,
+                id TEXT NOT NULL,
+                data TEXT NOT NULL,
+                PRIMARY KEY (project_id, id)
+            );
+        """)
+
+    def _transaction(self):
+        # BEGIN IMMEDIATE takes the write lock up front so concurrent read-modify-writes serialize
+        return _SQLiteTransaction(self._conn, self._lock)
+
+    def _load(self, rows) -> dict:
+        projects = {}
+        for project_id, data in rows:
+            project_data = json.loads(data)
+            project_data['items'] = []
+            projects[project_id] = project_data
+        if projects:
+            placeholders = ",".join("?" * len(projects))
+            item_rows = self._conn.execute(
+                f"SELECT project_id, data FROM items WHERE project_id IN ({placeholders})",
+                list(projects)
+            ).fetchall()
+            for project_id, data in item_rows:
+                projects[project_id]['items'].append(json.loads(data))
+            for project_data in projects.values():
+                project_data['items'] = _sorted_items(project_data['items'])
+        return projects
+
+    def get_project(self, project_id: str) -> Optional[dict]:
+        return self.get_projects([project_id]).get(project_id)
+
+    def get_projects(self, project_ids: list) -> dict:
+        if not project_ids:
+            return {}
+        placeholders = ",".join("?" * len(project_ids))
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT id, data FROM projects WHERE id IN ({placeholders})", list(project_ids)
+            ).fetchall()
+            return self._load(rows)
+
+    def list_projects(self, user_id: str, limit: int, cursor: str = None) -> tuple:
+        # Keyset pagination over projects_user_recent; item counts come from the items primary key
+        where, params = "user_id = ?", [user_id]
+        if cursor:
+            updated_at, project_id = decode_cursor(cursor)
+            where += " AND (updated_at < ? OR (updated_at = ? AND id < ?))"
+            params += [updated_at.isoformat(), updated_at.isoformat(), project_id]
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id, json_extract(data, '$.title'), json_extract(data, '$.type'), json_extract(data, '$.topic'), updated_at, "
+                "(SELECT COUNT(*) FROM items WHERE items.project_id = projects.id) "
+                f"FROM projects WHERE {where} ORDER BY updated_at DESC, id DESC LIMIT ?",
+                params + [limit + 1]
+            ).fetchall()
+        summaries = [
+            {"id": row[0], "title": row[1], "type": row[2], "topic": row[3], "updated_at": row[4], "item_count": row[5]}
+            for row in rows
+        ]
+        return _page(summaries, limit)
+
+    def create_project(self, project_data: dict):
+        project_data = dict(project_data)
+        items = project_data.pop('items', [])
+        with self._transaction() as conn:
+            conn.execute(
+                "INSERT INTO projects (id, user_id, data, next_order, updated_at) VALUES (?, ?, ?, ?, ?)",
+                (project_data['id'], project_data['user_id'], _dumps(project_data), len(items),
+                 _json_default(project_data['updated_at']))
+            )
+            conn.executemany(
+                "INSERT INTO items (project_id, id, data) VALUES (?, ?, ?)",
+                [(project_data['id'], item['id'], _dumps(item)) for item in items]
+            )
+
+    def _touch(self, conn, project_id: str, next_order: int = None):
+        now = datetime.now()
+        row = conn.execute("SELECT data FROM projects WHERE id = ?", (project_id,)).fetchone()
+        project_data = json.loads(row[0])
+        project_data['updated_at'] = now
+        if next_order is None:
+            conn.execute(
+                "UPDATE projects SET data = ?, updated_at = ? WHERE id = ?",
+                (_dumps(project_data), now.isoformat(), project_id)
+            )
+        else:
+            conn.execute(
+                "UPDATE projects SET data = ?, updated_at = ?, next_order = ? WHERE id = ?",
+                (_dumps(project_data), now.isoformat(), next_order, project_id)
+            )
+
+    def update_items(self, project_id: str, updates: dict) -> int:
+        if not updates:
+            return 0
+        updated = 0
+        with self._transaction() as conn:
+            for item_id, fields in updates.items():
+                row = conn.execute(
+                    "SELECT data FROM items WHERE project_id = ? AND id = ?", (project_id, item_id)
+                ).fetchone()
+                if row is None:
+                    continue
+                item = {**json.loads(row[0]), **fields}
+                conn.execute(
+                    "UPDATE items SET data = ? WHERE project_id = ? AND id = ?",
+                    (_dumps(item), project_id, item_id)
+                )
+                updated += 1
+            if updated:
+                self._touch(conn, project_id)
+        return updated
+
+    def add_item(self, project_id: str, item: dict) -> dict:
+        with self._transaction() as conn:
+            order = conn.execute("SELECT next_order FROM projects WHERE id = ?", (project_id,)).fetchone()[0]
+            new_item = {**item, "order": order}
+            conn.execute(
+                "INSERT INTO items (project_id, id, data) VALUES (?, ?, ?)",
+                (project_id, item['id'], _dumps(new_item))
+            )
+            self._touch(conn, project_id, next_order=order + 1)
+        return new_item
+
+    def delete_item(self, project_id: str, item_id: str):
+        with self._transaction() as conn:
+            conn.execute("DELETE FROM items WHERE project_id = ? AND id = ?", (project_id, item_id))
+            self._touch(conn, project_id)
+
+class _SQLiteTransaction:
+    def __init__(self, conn, lock):
+        self.conn = conn
+        self.lock = lock
+
+    def __enter__(self):
+        self.lock.acquire()
+        self.conn.execute("BEGIN IMMEDIATE")
+        return self.conn
+
+    def __exit__(self, exc_type, exc, tb):
+        try:
+            self.conn.execute("ROLLBACK" if exc_type else "COMMIT")
+        finally:
+            self.lock.release()
+
+class InstrumentedRepository(ProjectRepository):
+    # Records a db.<method> stage for every storage call of the wrapped backend
+
+    def __init__(self, inner: ProjectRepository):
+        self.inner = inner
+
+    def get_project(self, project_id):
+        with metrics.span("db.get_project"):
+            return self.inner.get_project(project_id)
+
+    def get_projects(self, project_ids):
+        with metrics.span("db.get_projects"):
+            return self.inner.get_projects(project_ids)
+
+    def list_projects(self, user_id, limit, cursor=None):
+        with metrics.span("db.list_projects"):
+            return self.inner.list_projects(user_id, limit, cursor)
+
+    def create_project(self, project_data):
+        with metrics.span("db.create_project"):
+            return self.inner.create_project(project_data)
+
+    def update_items(self, project_id, updates):
+        with metrics.span("db.update_items"):
+            return self.inner.update_items(project_id, updates)
+
+    def add_item(self, project_id, item):
+        with metrics.span("db.add_item"):
+            return self.inner.add_item(project_id, item)
+
+    def delete_item(self, project_id, item_id):
+        with metrics.span("db.delete_item"):
+            return self.inner.delete_item(project_id, item_id)
+
+_repository = None
+_repository_lock = threading.Lock() # Worker threads (AsyncRepository, startup preload) may race to create it
+
+def get_repository() -> ProjectRepository:
+    # STORAGE_BACKEND=auto uses Firestore when credentials are present, the local SQLite file otherwise
+    global _repository
+    if _repository is not None:
+        return _repository
+    with _repository_lock:
+        if _repository is not None:
+            return _repository
+        backend = settings.STORAGE_BACKEND
+        db = get_db() if backend in ("auto", "firestore") else None
+        if db is not None:
+            repository = FirestoreProjectRepository(db)
+        elif backend == "firestore":
+            raise RuntimeError("STORAGE_BACKEND=firestore but Firebase is not configured")
+        else:
+            repository = SQLiteProjectRepository(settings.LOCAL_DB_PATH)
+            print(f"Using local SQLite project store at {os.path.abspath(settings.LOCAL_DB_PATH)}")
+        # Published only once fully wrapped: other threads read _repository without the lock
+        _repository = InstrumentedRepository(repository) if settings.METRICS_ENABLED else repository
+        return _repository
+
+class AsyncRepository:
+    # Awaitable view of the configured repository for async handlers, streaming generators and
+    # background tasks. Every call runs on a worker thread (including the first get_repository(),
+    # which may connect to Firestore), so storage round trips never block the event loop.
+
+    async def _call(self, method: str, *args):
+        return await asyncio.to_thread(lambda: getattr(get_repository(), method)(*args))
+
+    async def get_project(self, project_id: str) -> Optional[dict]:
+        return await self._call("get_project", project_id)
+
+    async def get_projects(self, project_ids: list) -> dict:
+        return await self._call("get_projects", project_ids)
+
+    async def list_projects(self, user_id: str, limit: int, cursor: str = None) -> tuple:
+        return await self._call("list_projects", user_id, limit, cursor)
+
+    async def create_project(self, project_data: dict):
+        return await self._call("create_project", project_data)
+
+    async def update_items(self, project_id: str, updates: dict) -> int:
+        return await self._call("update_items", project_id, updates)
+
+    async def update_item(self, project_id: str, item_id: str, fields: dict) -> bool:
+        return await self._call("update_item", project_id, item_id, fields)
+
+    async def add_item(self, project_id: str, item: dict) -> dict:
+        return await self._call("add_item", project_id, item)
+
+    async def delete_item(self, project_id: str, item_id: str):
+        return await self._call("delete_item", project_id, item_id)
+
+_async_repository = AsyncRepository()
+
+def get_async_repository() -> AsyncRepository:
+    return _async_repository
+
+def set_repository(repository: ProjectRepository):
+    global _repository
+    _repository = repository
@@ -0,0 +1,100 @@
+import threading
+import time
+from services import metrics
+
+# Selective preload for the parts of the process that are imported or connected on
+# first use (the Gemini SDK, firebase_admin, the export renderers...). The startup
+# hook loads STARTUP_PRELOAD before the app accepts requests and
+# STARTUP_BACKGROUND_PRELOAD on a worker thread right after; POST /warmup loads more
+# on demand, e.g. from a readiness probe before a new instance takes traffic. Each
+# component loads once per process and its load time is kept for GET /warmup.
+
+def _firebase():
+    from services.firebase import initialize_firebase
+    initialize_firebase()
+
+def _auth():
+    from services.firebase import prewarm_auth_keys
+    prewarm_auth_keys()
+
+def _storage():
+    from services.repository import get_repository
+    get_repository()
+
+def _ai():
+    from services.ai import get_model
+    get_model()
+
+def _images():
+    # Download session (requests), Pillow for downscaling, the Freepik client's httpx
+    from services.assets import get_asset_store, _get_session
+    from PIL import Image
+    import httpx
+    get_asset_store()
+    _get_session()
+
+def _export():
+    # Render processes with python-docx/python-pptx already imported
+    from services import export_worker
+    export_worker.warm_pool()
+
+# In load order: cheap, request-path components first
+COMPONENTS = {
+    "firebase": _firebase,
+    "storage": _storage,
+    "auth": _auth,
+    "ai": _ai,
+    "images": _images,
+    "export": _export,
+}
+
+_lock = threading.Lock()
+import_seconds = None # From the start of `import main` to the app being built; set by main.py
+_loaded = {} # name -> seconds the load took
+_errors = {} # name -> repr of the last failure; retried on the next preload
+
+def parse(names) -> list:
+    # "ai, export" or ["ai", "export"] -> known component names in COMPONENTS order; "all" selects every one
+    if isinstance(names, str):
+        names = names.split(",")
+    names = {n.strip().lower() for n in names if n and n.strip()}
+    unknown = names - set(COMPONENTS) - {"all"}
+    if unknown:
+        raise ValueError(f"Unknown warm-up components: {', '.join(sorted(unknown))}")
+    return [n for n in COMPONENTS if "all" in names or n in names]
+
+def preload(names) -> dict:
+    # Blocking; -> {name: seconds} for what this call loaded (0 when it already was)
+    timings = {}
+    for name in parse(names):
+        with _lock:
+            if name in _loaded:
+                timings[name] = 0.0
+                continue
+            started = time.perf_counter()
+            try:
+                COMPONENTS[name]()
+            except Exception as e:
+                print(f"Warm-up of {name} failed: {e!r}")
+                _errors[name] = repr(e)
+                metrics.inc("warmup_errors_total", component=name)
+                continue
+            elapsed = time.perf_counter() - started
+            _loaded[name] = elapsed
+            _errors.pop(name, None)
+        metrics.set_gauge("warmup_component_seconds", elapsed, component=name)
+        timings[name] = round(elapsed, 4)
+    return timings
+
+def status() -> dict:
+    return {
+        "import_seconds": round(import_seconds, 4) if import_seconds is not None else None,
+        "loaded": {name: round(seconds, 4) for name, seconds in _loaded.items()},
+        "pending": [name for name in COMPONENTS if name not in _loaded],
+        "errors": dict(_errors),
+    }
+
+def record_import_time(seconds: float):
+    global import_seconds
+    import_seconds = seconds
+    metrics.set_gauge("startup_import_seconds", seconds)
@@ -0,0 +1,42 @@
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Settings are read at import time, so the local fakes are configured before anything
+# from the app is imported: no Gemini, Freepik or Firebase credentials needed.
+_tmp = tempfile.mkdtemp(prefix="docai-tests-")
+os.environ.update({
+    "AI_BACKEND": "fake",
+    "AI_FAKE_LATENCY": "0",
+    "FREEPIK_BACKEND": "fake",
+    "STORAGE_BACKEND": "sqlite",
+    "LOCAL_DB_PATH": os.path.join(_tmp, "projects.db"),
+    "FIREBASE_CREDENTIALS_PATH": os.path.join(_tmp, "no-credentials.json"),
+    "EXPORT_CACHE_DIR": os.path.join(_tmp, "exports"),
+    "ASSET_DIR": os.path.join(_tmp, "assets"),
+    "AI_CACHE_ENABLED": "false",
+    "STARTUP_BACKGROUND_PRELOAD": "",
+})
+
+import pytest
+from fastapi.testclient import TestClient
+
+@pytest.fixture
+def client():
+    # client.user is the signed-in user; change its uid to act as someone else
+    import main
+    from routers.projects import get_current_user
+    user = {"uid": "owner"}
+    main.app.dependency_overrides[get_current_user] = lambda: user
+    with TestClient(main.app) as test_client:
+        test_client.user = user
+        yield test_client
+    main.app.dependency_overrides.clear()
+
+@pytest.fixture
+def project(client):
+    # A PowerPoint project owned by client.user, with its generated outline
+    project_id = client.post("/projects/", json={"title": "Deck", "type": "powerpoint", "topic": "Cats"}).json()['id']
+    return client.get(f"/projects/{project_id}").json()
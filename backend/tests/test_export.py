@@ -0,0 +1,67 @@
+def test_export_reports_queue_gauges(client, project):
+    response = client.get(f"/projects/{project['id']}/export")
+    assert response.status_code == 200
+    metrics = client.get("/metrics").text
+    assert "export_queue_depth 0" in metrics
+    assert "export_renders_in_flight 0" in metrics
+
+def _serve_png():
+    # A local image host for the export's downloads (the render runs in a worker process)
+    import io
+    import threading
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+    from PIL import Image
+    buffer = io.BytesIO()
+    Image.new("RGB", (4, 4), "red").save(buffer, format="PNG")
+    body = buffer.getvalue()
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            self.send_response(200)
+            self.send_header("Content-Type", "image/png")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+def test_unchanged_project_with_image_keeps_its_etag(client, project):
+    from services.repository import get_repository
+    server = _serve_png()
+    try:
+        url = f"http://127.0.0.1:{server.server_port}/slide.png"
+        get_repository().update_item(project['id'], project['items'][0]['id'], {"image_url": url})
+
+        first = client.get(f"/projects/{project['id']}/export")
+        assert first.status_code == 200
+        etag = first.headers['etag']
+        # The first render stored the image in the asset store; the revision must not change with it
+        again = client.get(f"/projects/{project['id']}/export", headers={"If-None-Match": etag})
+        assert again.status_code == 304
+        assert again.headers['etag'] == etag
+    finally:
+        server.shutdown()
+
+def test_item_with_content_and_chart_exports_both(client, project):
+    import io
+    from pptx import Presentation
+    item = project['items'][0]
+    response = client.post("/generate/artifacts", json={"project_id": project['id'], "item_id": item['id'], "artifacts": ["content", "chart"]})
+    assert response.status_code == 200
+
+    saved = client.get(f"/projects/{project['id']}").json()['items'][0]
+    assert saved['type'] == "slide"
+    assert saved['content'] and saved['chart_data']
+
+    response = client.get(f"/projects/{project['id']}/export")
+    assert response.status_code == 200
+    slide = Presentation(io.BytesIO(response.content)).slides[1]
+    assert slide.shapes.title.text == saved['title']
+    assert any(shape.has_chart for shape in slide.shapes)
+    text = "\n".join(shape.text_frame.text for shape in slide.shapes if shape.has_text_frame and shape != slide.shapes.title)
+    assert text.strip()
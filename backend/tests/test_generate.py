@@ -0,0 +1,30 @@
+import pytest
+
+@pytest.mark.parametrize("path", ["/generate/content", "/generate/content/stream", "/generate/chart", "/generate/image-prompt", "/generate/refine/stream"])
+def test_item_endpoints_reject_other_users_projects(client, project, path):
+    item = project['items'][0]
+    before = item.get('content')
+    client.user['uid'] = "intruder"
+    response = client.post(path, json={"project_id": project['id'], "item_id": item['id'], "text": "overwritten", "instruction": "x", "prompt": "x"})
+    assert response.status_code == 403
+
+    client.user['uid'] = "owner"
+    assert client.get(f"/projects/{project['id']}").json()['items'][0].get('content') == before
+
+def test_item_endpoints_404_for_missing_project(client):
+    response = client.post("/generate/content", json={"project_id": "missing", "item_id": "missing"})
+    assert response.status_code == 404
+
+def test_single_section_call_sends_context_inline(client, project):
+    from services import project_context
+    project_context._handles.clear()
+    item = project['items'][0]
+    response = client.post("/generate/content", json={"project_id": project['id'], "item_id": item['id']})
+    assert response.status_code == 200
+    assert project_context.stats()['contexts'] == 0
+
+    # A batch reuses its context across sections, so it is worth a cache
+    response = client.post("/generate/content/all", json={"project_id": project['id']})
+    assert response.status_code == 200
+    assert project_context.stats()['contexts'] == 1
+    project_context._handles.clear()
@@ -0,0 +1,34 @@
+import asyncio
+import re
+from fastapi import FastAPI
+from fastapi.responses import StreamingResponse
+from fastapi.testclient import TestClient
+from main import RequestMetricsMiddleware
+from services import metrics
+
+def _duration_sum(route: str) -> float:
+    match = re.search(rf'http_request_duration_seconds_sum{{method="GET",route="{re.escape(route)}"}} ([0-9.e-]+)', metrics.render())
+    return float(match.group(1))
+
+def test_streaming_response_is_timed_to_its_last_chunk():
+    app = FastAPI()
+    app.add_middleware(RequestMetricsMiddleware)
+
+    @app.get("/slow-stream")
+    async def slow_stream():
+        async def chunks():
+            for i in range(3):
+                await asyncio.sleep(0.1)
+                yield f"chunk {i}\n"
+        return StreamingResponse(chunks(), media_type="application/x-ndjson")
+
+    with TestClient(app) as client:
+        response = client.get("/slow-stream")
+    assert response.text.count("chunk") == 3
+    # Headers go out before the first chunk; the recorded latency must cover the whole body
+    assert _duration_sum("/slow-stream") >= 0.3
+    assert 'http_requests_total{method="GET",route="/slow-stream",status="200"} 1' in metrics.render()
+
+def test_server_timing_header_lists_request_stages(client, project):
+    response = client.get(f"/projects/{project['id']}")
+    assert "db.get_project" in response.headers['server-timing']
@@ -3,26 +3,46 @@ import { Link } from 'react-router-dom';
 import { Plus, FileText, Presentation, Clock, Search, Grid, List as ListIcon } from 'lucide-react';
 import client from '../api/client';
 
+const PAGE_SIZE = 24;
+
+function formatEdited(updatedAt) {
+    return new Date(updatedAt).toLocaleDateString(undefined, { month: 'short', day: 'numeric', year: 'numeric' });
+}
+
 export default function Dashboard() {
     const [projects, setProjects] = useState([]);
+    const [nextCursor, setNextCursor] = useState(null);
     const [loading, setLoading] = useState(true);
+    const [loadingMore, setLoadingMore] = useState(false);
     const [viewMode, setViewMode] = useState('grid'); // 'grid' or 'list'
     const [searchQuery, setSearchQuery] = useState('');
 
+    // The list endpoint returns summaries (no items), newest first, one page at a time
+    async function fetchPage(cursor) {
+        const params = { limit: PAGE_SIZE };
+        if (cursor) params.cursor = cursor;
+        const res = await client.get('/projects/', { params });
+        setProjects(prev => cursor ? [...prev, ...res.data.projects] : res.data.projects);
+        setNextCursor(res.data.next_cursor);
+    }
+
     useEffect(() => {
-        async function fetchProjects() {
-            try {
-                const res = await client.get('/projects/');
-                setProjects(res.data);
-            } catch (error) {
-                console.error("Failed to fetch projects", error);
-            } finally {
-                setLoading(false);
-            }
-        }
-        fetchProjects();
+        fetchPage(null)
+            .catch(error => console.error("Failed to fetch projects", error))
+            .finally(() => setLoading(false));
     }, []);
 
+    async function loadMore() {
+        setLoadingMore(true);
+        try {
+            await fetchPage(nextCursor);
+        } catch (error) {
+            console.error("Failed to fetch projects", error);
+        } finally {
+            setLoadingMore(false);
+        }
+    }
+
     const filteredProjects = projects.filter(p =>
         p.title.toLowerCase().includes(searchQuery.toLowerCase()) ||
         p.topic.toLowerCase().includes(searchQuery.toLowerCase())
@@ -122,7 +142,8 @@ export default function Dashboard() {
 
                                     <div className="flex items-center text-slate-400 text-xs border-t border-slate-100 dark:border-slate-700 pt-4 mt-auto">
                                         <Clock size={14} className="mr-1" />
-                                        <span>Last edited recently</span>
+                                        <span>Last edited {formatEdited(project.updated_at)}</span>
+                                        <span className="ml-auto">{project.item_count} {project.type === 'word' ? 'sections' : 'slides'}</span>
                                     </div>
                                 </Link>
                             ))}
@@ -169,7 +190,7 @@ export default function Dashboard() {
                                                 {project.topic}
                                             </td>
                                             <td className="px-6 py-4 whitespace-nowrap text-sm text-slate-500 dark:text-slate-400">
-                                                Recently
+                                                {formatEdited(project.updated_at)}
                                             </td>
                                             <td className="px-6 py-4 whitespace-nowrap text-right text-sm font-medium">
                                                 <Link to={`/editor/${project.id}`} className="text-blue-600 dark:text-blue-400 hover:text-blue-900 dark:hover:text-blue-300">
@@ -183,6 +204,18 @@ export default function Dashboard() {
                         </div>
                     )
                 )}
+
+                {nextCursor && (
+                    <div className="flex justify-center mt-8">
+                        <button
+                            onClick={loadMore}
+                            disabled={loadingMore}
+                            className="px-4 py-2 rounded-lg border border-slate-200 dark:border-slate-700 bg-white dark:bg-slate-800 text-slate-700 dark:text-slate-200 font-medium hover:border-blue-500/50 disabled:opacity-50 transition-colors"
+                        >
+                            {loadingMore ? 'Loading...' : 'Load more'}
+                        </button>
+                    </div>
+                )}
             </div>
         </div>
     );
@@ -1,4 +1,4 @@
-import React, { useState, useEffect } from 'react';
+import React, { useState, useEffect, useRef } from 'react';
 import { useParams, Link } from 'react-router-dom';
 import client from '../api/client';
 import {
@@ -8,6 +8,12 @@ import {
     PieChart, Image as ImageIcon
 } from 'lucide-react';
 
+// Textarea selection offsets count UTF-16 code units; the backend slices by code point,
+// so characters outside the BMP (e.g. emoji) before the selection would shift the range
+function codePointOffset(text, utf16Offset) {
+    return Array.from(text.slice(0, utf16Offset)).length;
+}
+
 export default function Editor() {
     const { id } = useParams();
     const [project, setProject] = useState(null);
@@ -17,6 +23,7 @@ export default function Editor() {
     const [refining, setRefining] = useState(false);
     const [refineInstruction, setRefineInstruction] = useState("");
     const [showPreview, setShowPreview] = useState(false);
+    const contentRef = useRef(null);
 
     useEffect(() => {
         fetchProject();
@@ -40,9 +47,11 @@ export default function Editor() {
         if (!selectedItem) return;
         setGenerating(true);
         try {
+            // Generating again must bypass the server's AI response cache, or the same text comes back
             const res = await client.post('/generate/content', {
                 project_id: id,
-                item_id: selectedItem.id
+                item_id: selectedItem.id,
+                regenerate: Boolean(selectedItem.content)
             });
 
             updateItemContent(selectedItem.id, res.data.content);
@@ -59,9 +68,17 @@ export default function Editor() {
 
         setRefining(true);
         try {
+            // With text selected in the editor only that range is rewritten; the rest comes back unchanged
+            const editor = contentRef.current;
+            const hasSelection = editor && editor.selectionStart !== editor.selectionEnd;
+            const text = selectedItem.content;
             const res = await client.post('/generate/refine', {
-                text: selectedItem.content,
-                instruction: instr
+                text,
+                instruction: instr,
+                ...(hasSelection && {
+                    selection_start: codePointOffset(text, editor.selectionStart),
+                    selection_end: codePointOffset(text, editor.selectionEnd)
+                })
             });
 
             updateItemContent(selectedItem.id, res.data.refined);
@@ -139,18 +156,22 @@ export default function Editor() {
         try {
             // If selected item is a slide, add image to it. If not, create new image item.
             let itemId = selectedItem?.id;
+            let regenerate = Boolean(selectedItem?.image_url);
 
             if (!selectedItem || (selectedItem.type !== 'slide' && selectedItem.type !== 'image_prompt')) {
                 const res = await client.post(`/projects/${id}/items`, {}, {
                     params: { title: "New Image" }
                 });
                 itemId = res.data.items[res.data.items.length - 1].id;
+                regenerate = false;
             }
 
+            // Picking again for an item that has an image skips cached answers and the current picture
             const imgRes = await client.post('/generate/image-prompt', {
                 project_id: id,
                 item_id: itemId,
-                prompt: prompt
+                prompt: prompt,
+                regenerate
             });
 
             // Refresh project
@@ -360,6 +381,7 @@ export default function Editor() {
                                             </div>
                                         )}
                                         <textarea
+                                            ref={contentRef}
                                             className="flex-1 w-full p-8 outline-none resize-none text-slate-700 leading-relaxed font-sans text-lg"
                                             value={selectedItem.content || ""}
                                             onChange={(e) => {